@@ -5,6 +5,7 @@ from pathlib import Path
 
 import environ
 from celery.schedules import crontab
+from kombu import Queue
 
 ROOT_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
 # rcs_back/
@@ -64,6 +65,22 @@ CACHES = {
         },
     }
 }
+# Accumulate fullness reports in Redis and write them to the database
+# in batches (rcs_back.containers_app.tasks.flush_buffered_reports)
+FULLNESS_REPORTS_BUFFERED = env.bool("FULLNESS_REPORTS_BUFFERED", default=False)
+# Seconds between flushes of buffered fullness reports
+FULLNESS_REPORTS_FLUSH_INTERVAL = env.int("FULLNESS_REPORTS_FLUSH_INTERVAL", default=30)
+# Seconds during which repeated fullness reports of a container from the
+# same client are dropped (0 - accept every report)
+FULLNESS_REPORT_DEDUP_WINDOW = env.int("FULLNESS_REPORT_DEDUP_WINDOW", default=0)
+# Per-request query count, SQL time, latency and response size
+# (rcs_back.utils.middleware.RequestMetricsMiddleware): Server-Timing
+# header with DEBUG, histograms in Redis otherwise
+REQUEST_METRICS = env.bool("DJANGO_REQUEST_METRICS", default=False)
+# Bearer token for scraping Celery task metrics in Prometheus format
+# (rcs_back.stats_app.views.CeleryMetricsView); empty - endpoint disabled.
+# Client addresses are not checked: behind the proxy they are all the same
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
 
 # MIGRATIONS
 # ------------------------------------------------------------------------------
@@ -97,13 +114,13 @@ THIRD_PARTY_APPS = [
     "django_filters",
     "rest_framework",
     "corsheaders",
-    "djcelery_email",
     "djoser",
     "drf_spectacular"
 ]
 
 LOCAL_APPS = [
     "rcs_back.containers_app",
+    "rcs_back.notifications_app",
     "rcs_back.stats_app",
     "rcs_back.takeouts_app"
 ]
@@ -143,6 +160,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "rcs_back.utils.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -227,9 +245,26 @@ X_FRAME_OPTIONS = "DENY"
 # EMAIL
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#email-backend
-EMAIL_BACKEND = 'djcelery_email.backends.CeleryEmailBackend'
+# Emails are written to the outbox table in the current transaction and
+# sent by rcs_back.notifications_app.tasks.send_outbox_emails
+EMAIL_BACKEND = "rcs_back.notifications_app.backends.OutboxEmailBackend"
+# Backend the outbox worker sends emails with
+OUTBOX_EMAIL_BACKEND = env(
+    "OUTBOX_EMAIL_BACKEND",
+    default="django.core.mail.backends.smtp.EmailBackend"
+)
 # https://docs.djangoproject.com/en/dev/ref/settings/#email-timeout
 EMAIL_TIMEOUT = 5
+# Notifications are passed to the email backend in batches of this size
+# (rcs_back.utils.mail.EmailDispatcher); the outbox worker sends each batch
+# over one SMTP connection
+EMAIL_BATCH_SIZE = env.int("EMAIL_BATCH_SIZE", default=50)
+# Mail provider limit: emails sent by the outbox worker per minute
+EMAIL_RATE_LIMIT = env.int("EMAIL_RATE_LIMIT", default=60)
+# Messages with more "to" addresses are split into several messages
+EMAIL_MAX_RECIPIENTS = env.int("EMAIL_MAX_RECIPIENTS", default=50)
+# Days sent emails (with attachments) are kept in the outbox table
+EMAIL_OUTBOX_RETENTION_DAYS = env.int("EMAIL_OUTBOX_RETENTION_DAYS", default=30)
 DEFAULT_FROM_EMAIL = env(
     "DJANGO_DEFAULT_FROM_EMAIL",
     default="RecycleStarter <noreply@recycle.itmo.ru>"
@@ -292,8 +327,46 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_TASK_TIME_LIMIT = 5 * 60
 # http://docs.celeryproject.org/en/latest/userguide/configuration.html#task-soft-time-limit
 CELERY_TASK_SOFT_TIME_LIMIT = 60
+# Separate queues so that slow PDF renders and reports do not delay
+# fullness reports, and PDF renders do not delay sending emails.
+# Each queue has its own worker pool
+# (compose/production/django/celery/worker-*/start); unrouted tasks
+# go to the default "celery" queue served by the notifications pool.
+# http://docs.celeryproject.org/en/latest/userguide/routing.html
+CELERY_TASK_QUEUES = (
+    Queue("fullness"),
+    Queue("notifications"),
+    Queue("pdf"),
+    Queue("reports"),
+    Queue("celery"),
+)
+CELERY_TASK_ROUTES = {
+    "rcs_back.containers_app.tasks.container_add_report": {"queue": "fullness"},
+    "rcs_back.containers_app.tasks.flush_buffered_reports": {"queue": "fullness"},
+    "rcs_back.containers_app.tasks.handle_empty_container": {"queue": "fullness"},
+    "rcs_back.containers_app.tasks.container_correct_fullness": {"queue": "fullness"},
+    "rcs_back.containers_app.tasks.building_check_conditions": {"queue": "pdf"},
+    "rcs_back.containers_app.tasks.public_container_add_notify": {"queue": "notifications"},
+    "rcs_back.takeouts_app.tasks.check_time_conditions": {"queue": "pdf"},
+    "rcs_back.notifications_app.tasks.send_outbox_emails": {"queue": "notifications"},
+    "rcs_back.notifications_app.tasks.prune_sent_emails": {"queue": "notifications"},
+    "rcs_back.takeouts_app.tasks.collected_mass_mailing": {"queue": "reports"},
+    "rcs_back.stats_app.tasks.build_stats_report": {"queue": "reports"},
+}
+# A worker consuming several queues (local development) takes tasks
+# from them in the order given in -Q, so fullness tasks go first
+# http://docs.celeryproject.org/en/latest/userguide/configuration.html#broker-transport-options
+CELERY_BROKER_TRANSPORT_OPTIONS = {"queue_order_strategy": "priority"}
 
 CELERY_BEAT_SCHEDULE = {
+    "send-outbox-emails": {
+        "task": "rcs_back.notifications_app.tasks.send_outbox_emails",
+        "schedule": 60
+    },
+    "prune-sent-emails": {
+        "task": "rcs_back.notifications_app.tasks.prune_sent_emails",
+        "schedule": crontab(minute=30, hour=3)
+    },
     "check-time-conditions": {
         "task": "rcs_back.takeouts_app.tasks.check_time_conditions",
         "schedule": crontab(minute=0, hour=0)
@@ -308,6 +381,13 @@ CELERY_BEAT_SCHEDULE = {
         )
     }
 }
+# Buffered reports are written only while buffering is on (reports left
+# after switching it off are written by one manual flush_buffered_reports)
+if FULLNESS_REPORTS_BUFFERED:
+    CELERY_BEAT_SCHEDULE["flush-buffered-reports"] = {
+        "task": "rcs_back.containers_app.tasks.flush_buffered_reports",
+        "schedule": FULLNESS_REPORTS_FLUSH_INTERVAL
+    }
 
 # django-rest-framework
 
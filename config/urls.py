@@ -23,6 +23,7 @@ from rcs_back.containers_app.views import (
     BuildingUsersView,
     ContainerCountView,
     FullContainerReportView,
+    BulkFullContainerReportView,
     PublicFeedbackView,
 
 )
@@ -75,6 +76,8 @@ urlpatterns = [
     path("api/takeout-conditions/<int:pk>",
          TakeoutConditionDetailView.as_view()),
     path("api/full-container-reports", FullContainerReportView.as_view()),
+    path("api/full-container-reports/bulk",
+         BulkFullContainerReportView.as_view()),
     path("api/collected-mass", CollectedMassView.as_view()),
     path("api/container-count", ContainerCountView.as_view())
 ]
@@ -24,11 +24,26 @@ class ContainerAdmin(admin.ModelAdmin):
         "ignore_reports_count",
         "is_full",
         "check_time_conditions",
-        "requested_activation"
+        "requested_activation",
+        # Текущее состояние меняется только сообщениями и выносами
+        "_is_full",
+        "open_report",
+        "open_report_count",
+        "filled_at",
+        "emptied_at",
+        "fill_time_sum",
+        "fill_time_count",
+        "takeout_wait_time_sum",
+        "takeout_wait_time_count",
     ]
 
 
 class BuildingPartAdmin(admin.ModelAdmin):
+    list_display = [
+        "__str__",
+        "current_mass",
+        "meets_mass_takeout_condition",
+    ]
     readonly_fields = [
         "current_mass",
         "meets_mass_takeout_condition",
@@ -38,8 +53,16 @@ class BuildingPartAdmin(admin.ModelAdmin):
         "container_count"
     ]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_mass_condition()
+
 
 class BuildingAdmin(admin.ModelAdmin):
+    list_display = [
+        "__str__",
+        "current_mass",
+        "meets_mass_takeout_condition",
+    ]
     readonly_fields = [
         "current_mass",
         "meets_mass_takeout_condition",
@@ -52,11 +75,38 @@ class BuildingAdmin(admin.ModelAdmin):
         "avg_fill_speed"
     ]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_mass_condition()
+
 
 class FullContainerReportAdmin(admin.ModelAdmin):
     readonly_fields = [
         "takeout_wait_time"
     ]
+    list_select_related = ["container"]
+
+    # После правки сообщений вручную текущее
+    # состояние контейнеров пересчитывается
+
+    def save_model(self, request, obj, form, change):
+        previous_container = form.initial.get("container")
+        super().save_model(request, obj, form, change)
+        obj.container.refresh_current_state()
+        if previous_container and previous_container != obj.container_id:
+            Container.objects.get(pk=previous_container).refresh_current_state()
+
+    def delete_model(self, request, obj):
+        container = obj.container
+        super().delete_model(request, obj)
+        container.refresh_current_state()
+
+    def delete_queryset(self, request, queryset):
+        containers = list(Container.objects.filter(
+            pk__in=queryset.values("container")
+        ))
+        super().delete_queryset(request, queryset)
+        for container in containers:
+            container.refresh_current_state()
 
 
 admin.site.register(Container, ContainerAdmin)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from rcs_back.containers_app.models import Container, FullContainerReport
+from rcs_back.containers_app.utils.container_state import (
+    backfill_container_state,
+)
+
+
+class Command(BaseCommand):
+    help = ("Заполняет текущее состояние контейнеров "
+            "(open_report, filled_at, emptied_at, open_report_count) "
+            "по истории FullContainerReport. При деплое выполняется "
+            "миграцией 0058_backfill_container_state")
+
+    BATCH_SIZE = 1000
+
+    def handle(self, *args, **options):
+        updated = backfill_container_state(
+            Container, FullContainerReport, batch_size=self.BATCH_SIZE
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Обновлено контейнеров: {updated}"
+        ))
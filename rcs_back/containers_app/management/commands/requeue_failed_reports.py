@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from rcs_back.containers_app.utils.report_buffer import (
+    flush_lock,
+    requeue_failed_reports,
+)
+
+
+class Command(BaseCommand):
+    help = ("Возвращает сообщения о заполненности, отложенные после "
+            "MAX_FLUSH_ATTEMPTS неудачных записей (FAILED_KEY), в очередь. "
+            "Их запишет следующий запуск flush_buffered_reports")
+
+    def handle(self, *args, **options):
+        # Ждём, пока закончится текущая запись
+        with flush_lock():
+            reports = requeue_failed_reports()
+        self.stdout.write(self.style.SUCCESS(
+            f"Возвращено в очередь сообщений: {sum(reports.values())}"
+        ))
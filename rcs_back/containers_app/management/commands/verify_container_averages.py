@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rcs_back.containers_app.models import Container
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает средние времена заполнения и ожидания выноса "
+            "контейнеров по всей истории FullContainerReport и сравнивает "
+            "с накопленными суммами. С --fix исправляет расхождения")
+
+    BATCH_SIZE = 1000
+
+    FIELDS = [
+        "fill_time_sum",
+        "fill_time_count",
+        "avg_fill_time",
+        "takeout_wait_time_sum",
+        "takeout_wait_time_count",
+        "avg_takeout_wait_time",
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Записать пересчитанные значения"
+        )
+
+    def handle(self, *args, **options):
+        mismatched = []
+        # С --fix заодно записываются ещё не посчитанные суммы
+        to_update = []
+        checked = 0
+        container: Container
+        for container in Container.objects.only(
+            "pk", "activated_at", *self.FIELDS
+        ).iterator():
+            checked += 1
+            fill_time_sum, fill_time_count = container.fill_time_totals()
+            wait_time_sum, wait_time_count = container.takeout_wait_time_totals()
+            expected = {
+                "fill_time_sum": fill_time_sum,
+                "fill_time_count": fill_time_count,
+                "avg_fill_time": (fill_time_sum / fill_time_count
+                                  if fill_time_count else None),
+                "takeout_wait_time_sum": wait_time_sum,
+                "takeout_wait_time_count": wait_time_count,
+                "avg_takeout_wait_time": (wait_time_sum / wait_time_count
+                                          if wait_time_count else None),
+            }
+            # Суммы ещё не посчитаны - сравниваем только средние
+            skipped = set()
+            if container.fill_time_count is None:
+                skipped.update(("fill_time_sum", "fill_time_count"))
+            if container.takeout_wait_time_count is None:
+                skipped.update(("takeout_wait_time_sum",
+                                "takeout_wait_time_count"))
+            diff = [
+                field for field, value in expected.items()
+                if field not in skipped and getattr(container, field) != value
+            ]
+            if diff:
+                self.stdout.write(
+                    f"Контейнер №{container.pk}: расходятся {', '.join(diff)}"
+                )
+                mismatched.append(container)
+            if diff or skipped:
+                for field, value in expected.items():
+                    setattr(container, field, value)
+                to_update.append(container)
+
+        if options["fix"] and to_update:
+            with transaction.atomic():
+                Container.objects.bulk_update(
+                    to_update, self.FIELDS, batch_size=self.BATCH_SIZE
+                )
+
+        style = self.style.WARNING if mismatched else self.style.SUCCESS
+        message = (f"Проверено контейнеров: {checked}, "
+                   f"с расхождениями: {len(mismatched)}")
+        if options["fix"] and mismatched:
+            message += " (исправлено)"
+        self.stdout.write(style(message))
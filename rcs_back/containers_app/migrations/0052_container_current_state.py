@@ -0,0 +1,34 @@
+# Generated by Django 3.2.5 on 2026-10-18 09:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('containers_app', '0051_alter_container_building'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='container',
+            name='emptied_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='последний раз вынесен'),
+        ),
+        migrations.AddField(
+            model_name='container',
+            name='filled_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='заполнен в'),
+        ),
+        migrations.AddField(
+            model_name='container',
+            name='open_report',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='containers_app.fullcontainerreport', verbose_name='незакрытое сообщение о заполненности'),
+        ),
+        migrations.AddField(
+            model_name='container',
+            name='open_report_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='кол-во сообщений о заполненности'),
+        ),
+    ]
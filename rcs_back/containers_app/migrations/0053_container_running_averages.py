@@ -0,0 +1,57 @@
+# Generated by Django 3.2.5 on 2026-10-18 09:38
+
+import datetime
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('containers_app', '0052_container_current_state'),
+    ]
+
+    # Поля добавляются пустыми: суммы существующих контейнеров считаются
+    # при первом изменении по истории сообщений. Новые начинают с нуля
+    operations = [
+        migrations.AddField(
+            model_name='container',
+            name='fill_time_count',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='кол-во заполнений'),
+        ),
+        migrations.AddField(
+            model_name='container',
+            name='fill_time_sum',
+            field=models.DurationField(blank=True, null=True, verbose_name='суммарное время заполнения'),
+        ),
+        migrations.AddField(
+            model_name='container',
+            name='takeout_wait_time_count',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='кол-во выносов'),
+        ),
+        migrations.AddField(
+            model_name='container',
+            name='takeout_wait_time_sum',
+            field=models.DurationField(blank=True, null=True, verbose_name='суммарное время ожидания выноса'),
+        ),
+        migrations.AlterField(
+            model_name='container',
+            name='fill_time_count',
+            field=models.PositiveIntegerField(blank=True, default=0, null=True, verbose_name='кол-во заполнений'),
+        ),
+        migrations.AlterField(
+            model_name='container',
+            name='fill_time_sum',
+            field=models.DurationField(blank=True, default=datetime.timedelta, null=True, verbose_name='суммарное время заполнения'),
+        ),
+        migrations.AlterField(
+            model_name='container',
+            name='takeout_wait_time_count',
+            field=models.PositiveIntegerField(blank=True, default=0, null=True, verbose_name='кол-во выносов'),
+        ),
+        migrations.AlterField(
+            model_name='container',
+            name='takeout_wait_time_sum',
+            field=models.DurationField(blank=True, default=datetime.timedelta, null=True, verbose_name='суммарное время ожидания выноса'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 3.2.5 on 2026-10-18 09:41
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def close_stale_reports(FullContainerReport):
+    """До этого закрывалось только самое новое сообщение контейнера,
+    поэтому могли остаться незакрытые сообщения старше последнего
+    выноса. Они считаются закрытыми этим выносом"""
+    last_emptied_at = Subquery(
+        FullContainerReport.objects.filter(
+            container=OuterRef("container"),
+            emptied_at__isnull=False
+        ).order_by("-emptied_at").values("emptied_at")[:1]
+    )
+    FullContainerReport.objects.filter(
+        emptied_at__isnull=True,
+        reported_full_at__lt=last_emptied_at
+    ).update(emptied_at=last_emptied_at)
+
+
+def merge_concurrent_reports(Container, FullContainerReport):
+    """Параллельные сообщения могли создать несколько незакрытых
+    сообщений у одного контейнера после последнего выноса.
+    Они объединяются в то, на которое ссылается контейнер
+    (или самое новое), время заполнения остаётся от него"""
+    duplicated = FullContainerReport.objects.filter(
+        emptied_at__isnull=True
+    ).values("container").annotate(
+        reports=Count("pk")
+    ).filter(reports__gt=1).values_list("container", flat=True)
+    for container in Container.objects.filter(pk__in=list(duplicated)):
+        reports = list(FullContainerReport.objects.filter(
+            container=container,
+            emptied_at__isnull=True
+        ).order_by("reported_full_at", "pk"))
+        kept = next(
+            (report for report in reports if report.pk == container.open_report_id),
+            reports[-1]
+        )
+        others = [report for report in reports if report.pk != kept.pk]
+        kept.count += sum(report.count for report in others)
+        kept.by_staff = kept.by_staff or any(report.by_staff for report in others)
+        kept.save(update_fields=["count", "by_staff"])
+        FullContainerReport.objects.filter(
+            pk__in=[report.pk for report in others]
+        ).delete()
+        container.open_report = kept
+        container.open_report_count = kept.count
+        container.filled_at = kept.filled_at
+        container.save(update_fields=["open_report", "open_report_count",
+                                      "filled_at"])
+
+
+def one_open_report(apps, schema_editor):
+    Container = apps.get_model("containers_app", "Container")
+    FullContainerReport = apps.get_model("containers_app", "FullContainerReport")
+    close_stale_reports(FullContainerReport)
+    merge_concurrent_reports(Container, FullContainerReport)
+    # Контейнеры, ссылающиеся на закрытое сообщение, не заполнены
+    Container.objects.filter(
+        open_report__emptied_at__isnull=False
+    ).update(open_report=None, open_report_count=0, filled_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('containers_app', '0053_container_running_averages'),
+    ]
+
+    operations = [
+        migrations.RunPython(one_open_report, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='fullcontainerreport',
+            constraint=models.UniqueConstraint(condition=models.Q(('emptied_at__isnull', True)), fields=('container',), name='one_open_report_per_container'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.5 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('containers_app', '0055_one_open_report_per_container'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='container',
+            index=models.Index(fields=['building', 'status', '_is_full'], name='container_bld_status_full_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='container',
+            index=models.Index(fields=['building', 'floor', 'id'], name='container_bld_floor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='container',
+            index=models.Index(fields=['building_part', 'floor'], name='container_bpart_floor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='container',
+            index=models.Index(fields=['status', 'id'], name='container_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='container',
+            index=models.Index(fields=['_is_full', 'id'], name='container_is_full_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.5 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('containers_app', '0056_container_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fullcontainerreport',
+            index=models.Index(fields=['container', 'reported_full_at'], name='report_container_reported_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fullcontainerreport',
+            index=models.Index(condition=models.Q(('filled_at__isnull', False)), fields=['container', 'filled_at'], name='report_container_filled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fullcontainerreport',
+            index=models.Index(condition=models.Q(('emptied_at__isnull', False)), fields=['container', 'emptied_at'], name='report_container_emptied_idx'),
+        ),
+    ]
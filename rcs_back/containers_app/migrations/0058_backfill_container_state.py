@@ -0,0 +1,27 @@
+# Generated by Django 3.2.5 on 2026-10-18 14:20
+
+from django.db import migrations
+
+from rcs_back.containers_app.utils.container_state import (
+    backfill_container_state,
+)
+
+
+def backfill(apps, schema_editor):
+    """Текущее состояние контейнеров, добавленное в 0052,
+    заполняется по истории сообщений (как backfill_container_state)"""
+    backfill_container_state(
+        apps.get_model("containers_app", "Container"),
+        apps.get_model("containers_app", "FullContainerReport")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('containers_app', '0057_report_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.5 on 2026-10-18 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('containers_app', '0058_backfill_container_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='container',
+            index=models.Index(fields=['building', 'id'], name='container_bld_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='container',
+            index=models.Index(fields=['building_part', 'id'], name='container_bpart_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='container',
+            index=models.Index(fields=['floor', 'id'], name='container_floor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='container',
+            index=models.Index(fields=['description', 'id'], name='container_description_idx'),
+        ),
+    ]
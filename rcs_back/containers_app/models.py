@@ -1,22 +1,40 @@
 import datetime
-import time
+from collections import defaultdict
 from secrets import choice
 from string import ascii_letters, digits
 from tempfile import NamedTemporaryFile
-from typing import List, Union
+from typing import Dict, Iterable, List, Tuple, Union
 
 import pdfkit
+from django.apps import apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.mail import EmailMessage
-from django.db import models
-from django.db.models import Sum
-from django.db.models.functions import Coalesce
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, NullIf
 from django.db.models.query import QuerySet
 from django.template.loader import render_to_string
 from django.utils import timezone
 
 from rcs_back.containers_app.utils.qr import generate_sticker
+from rcs_back.containers_app.utils.takeout_conditions import (
+    EffectiveCondition,
+    resolve_condition,
+    resolve_conditions,
+)
+from rcs_back.utils.mail import send_email
 from rcs_back.utils.model import get_eco_emails
 
 tz = timezone.get_default_timezone()
@@ -72,31 +90,127 @@ class EmailToken(models.Model):
         verbose_name_plural = "токены для email"
 
 
+class BaseBuildingQuerySet(models.QuerySet):
+    """QuerySet зданий/корпусов"""
+
+    def with_current_mass(self) -> "BaseBuildingQuerySet":
+        """Добавляет накопившуюся массу бумаги (full_containers_mass),
+        посчитанную на стороне БД для всех зданий/корпусов сразу"""
+        if "full_containers_mass" in self.query.annotations:
+            return self
+        # Поле контейнера, ссылающееся на здание/корпус
+        container_field = self.model.containers.field.name
+        full_containers_mass = Container.objects.filter(
+            **{container_field: OuterRef("pk")},
+            _is_full=True
+        ).order_by().values(container_field).annotate(
+            mass=Sum(Container.mass_expression())
+        ).values("mass")
+        return self.annotate(
+            full_containers_mass=Coalesce(Subquery(full_containers_mass), 0)
+        )
+
+    def with_container_count(self) -> "BaseBuildingQuerySet":
+        """Добавляет кол-во активных контейнеров (active_container_count),
+        посчитанное на стороне БД для всех зданий/корпусов сразу"""
+        if "active_container_count" in self.query.annotations:
+            return self
+        container_field = self.model.containers.field.name
+        active_containers = Container.objects.filter(
+            **{container_field: OuterRef("pk")},
+            status=Container.ACTIVE
+        ).order_by().values(container_field).annotate(
+            count=Count("pk")
+        ).values("count")
+        return self.annotate(
+            active_container_count=Coalesce(Subquery(active_containers), 0)
+        )
+
+    def with_mass_condition(self) -> "BaseBuildingQuerySet":
+        """Добавляет накопившуюся массу и то, выполняется ли
+        условие для сбора по общей массе (mass_condition_met)"""
+        return self.with_current_mass().annotate(
+            mass_condition_met=Case(
+                When(takeout_condition__mass__gt=0,
+                     full_containers_mass__gte=F("takeout_condition__mass"),
+                     then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField()
+            )
+        )
+
+
+class BuildingQuerySet(BaseBuildingQuerySet):
+    """QuerySet зданий"""
+
+    def with_tank_takeout_stats(self) -> "BuildingQuerySet":
+        """Добавляет подтверждённую массу вывозов бака
+        (confirmed_tank_mass) и первый вывоз (first_tank_takeout_mass,
+        first_tank_takeout_confirmed_at), посчитанные на стороне БД
+        для всех зданий сразу"""
+        if "confirmed_tank_mass" in self.query.annotations:
+            return self
+        tank_takeout = apps.get_model("takeouts_app", "TankTakeoutRequest")
+        confirmed_mass = tank_takeout.objects.filter(
+            building=OuterRef("pk"),
+            confirmed_mass__isnull=False
+        ).order_by().values("building").annotate(
+            mass=Sum("confirmed_mass")
+        ).values("mass")
+        first_takeout = tank_takeout.objects.filter(
+            building=OuterRef("pk")
+        ).order_by("created_at")
+        return self.annotate(
+            confirmed_tank_mass=Coalesce(Subquery(confirmed_mass), 0),
+            first_tank_takeout_mass=Subquery(
+                first_takeout.values("confirmed_mass")[:1]
+            ),
+            first_tank_takeout_confirmed_at=Subquery(
+                first_takeout.values("confirmed_at")[:1]
+            ),
+        )
+
+    def with_stats(self) -> "BuildingQuerySet":
+        """Всё, что нужно для статистики по зданиям
+        (container_count, confirmed_collected_mass, avg_fill_speed,
+        current_mass), чтобы число запросов не зависело от числа зданий"""
+        return self.with_container_count().with_current_mass(
+        ).with_tank_takeout_stats()
+
+
 class BaseBuilding(models.Model):
     """Абстрактный класс для общих методов
     здания и корпуса"""
 
+    objects = BaseBuildingQuerySet.as_manager()
+
     def current_mass(self) -> int:
         """Возвращает накопившуюся массу бумаги
         по зданию/корпусу"""
-        current_mass = 0
-        container: Container
-        for container in self.containers.filter(
+        if hasattr(self, "full_containers_mass"):
+            # Посчитано в BaseBuildingQuerySet.with_current_mass
+            return self.full_containers_mass
+        return self.containers.filter(
             _is_full=True
-        ):
-            current_mass += container.mass()
-        return current_mass
+        ).aggregate(
+            mass=Coalesce(Sum(Container.mass_expression()), 0)
+        )["mass"]
 
     def meets_mass_takeout_condition(self) -> bool:
         """Выполняются ли в здании/корпусе условия для сбора по общей массе"""
+        if hasattr(self, "mass_condition_met"):
+            # Посчитано в BaseBuildingQuerySet.with_mass_condition
+            return self.mass_condition_met
         return bool(self.takeout_condition.mass and
                     self.current_mass() >= self.takeout_condition.mass)
 
     def meets_time_takeout_condition(self) -> bool:
         """Выполняются ли в здании/корпусе условия для сбора
         по времени."""
+        containers = list(self.containers.select_related("open_report"))
+        Container.prefetch_conditions(containers)
         container: Container
-        for container in self.containers.all():
+        for container in containers:
             if container.check_time_conditions():
                 return True
         return False
@@ -111,6 +225,9 @@ class BaseBuilding(models.Model):
 
     def container_count(self) -> int:
         """Кол-во активных контейнеров"""
+        if hasattr(self, "active_container_count"):
+            # Посчитано в BaseBuildingQuerySet.with_container_count
+            return self.active_container_count
         return self.containers.filter(status=Container.ACTIVE).count()
 
     class Meta:
@@ -120,6 +237,8 @@ class BaseBuilding(models.Model):
 class Building(BaseBuilding):
     """ Модель здания """
 
+    objects = BuildingQuerySet.as_manager()
+
     address = models.CharField(
         max_length=2048,
         verbose_name="адрес"
@@ -174,7 +293,7 @@ class Building(BaseBuilding):
     def needs_takeout(self) -> bool:
         """Нужно ли вынести бумагу?"""
         if hasattr(self, "building_parts"):
-            for bpart in self.building_parts.all():
+            for bpart in self.building_parts.with_mass_condition():
                 if bpart.needs_takeout():
                     return True
         return (self.meets_mass_takeout_condition() or
@@ -184,11 +303,15 @@ class Building(BaseBuilding):
         """Проверяет условия на вынос и если нужно,
         отправляет email-Оповещение о необходимости сбора"""
         if not self._takeout_notified and self.needs_takeout():
+            self.takeout_needed_notify()
 
-            self._takeout_notified = True
-            self.save()
+    def takeout_needed_notify(self) -> None:
+        """Запоминает, что оповещение о необходимости сбора
+        отправлено, и отправляет его"""
+        self._takeout_notified = True
+        self.save()
 
-            self.takeout_condition_met_notify()
+        self.takeout_condition_met_notify()
 
     def takeout_condition_met_notify(self) -> None:
         """Оповещение о необходимости сбора"""
@@ -230,7 +353,7 @@ class Building(BaseBuilding):
                          pdf,
                          "application/pdf"
                          )
-            email.send()
+            send_email(email)
 
     def tank_takeout_notify(self) -> None:
         """Отправляет запрос на вывоз накопительного бака"""
@@ -269,7 +392,7 @@ class Building(BaseBuilding):
                              self.passage_scheme.read(),
                              "image/png"
                              )
-            email.send()
+            send_email(email)
 
     def get_hoz_workers(self) -> QuerySet["User"]:
         """QuerySet из сотрудников хоз отдела"""
@@ -309,6 +432,9 @@ class Building(BaseBuilding):
         собранную за месяц после start_date.
         При указании yearly=True, возвращает массу
         макулатуры, собранную за год после start_date"""
+        if hasattr(self, "confirmed_tank_mass") and not start_date:
+            # Посчитано в BuildingQuerySet.with_tank_takeout_stats
+            return self.confirmed_tank_mass + self.precollected_mass
         confirmed_requests = self.tank_takeout_requests.filter(
             confirmed_mass__isnull=False
         )
@@ -345,16 +471,24 @@ class Building(BaseBuilding):
 
     def avg_fill_speed(self) -> Union[float, None]:
         """Средняя скорость сбора макулатуры (кг/месяц)"""
-        if self.tank_takeout_requests.exists():
-            if self.tank_takeout_requests.order_by(
-                    "created_at")[0].confirmed_mass:
-                start_date = self.tank_takeout_requests.order_by("created_at")[
-                    0].confirmed_at
-                month_count = (timezone.now().year - start_date.year) * \
-                    12 + (timezone.now().month - start_date.month)
-                if not month_count:
-                    month_count = 1
-                return self.confirmed_collected_mass() / month_count
+        if hasattr(self, "first_tank_takeout_confirmed_at"):
+            # Посчитано в BuildingQuerySet.with_tank_takeout_stats
+            first_mass = self.first_tank_takeout_mass
+            start_date = self.first_tank_takeout_confirmed_at
+        else:
+            first_takeout = self.tank_takeout_requests.order_by(
+                "created_at"
+            ).first()
+            if not first_takeout:
+                return None
+            first_mass = first_takeout.confirmed_mass
+            start_date = first_takeout.confirmed_at
+        if first_mass:
+            month_count = (timezone.now().year - start_date.year) * \
+                12 + (timezone.now().month - start_date.month)
+            if not month_count:
+                month_count = 1
+            return self.confirmed_collected_mass() / month_count
 
         return None
 
@@ -394,6 +528,104 @@ class BuildingPart(BaseBuilding):
         verbose_name_plural = "корпусы зданий"
 
 
+def condition_field(field: str) -> Coalesce:
+    """Значение поля условия для сбора: у корпуса,
+    если задано (не 0), иначе у здания"""
+    return Coalesce(
+        NullIf(F(f"building_part__takeout_condition__{field}"), 0),
+        F(f"building__takeout_condition__{field}"),
+        0
+    )
+
+
+class ContainerQuerySet(models.QuerySet):
+    """QuerySet контейнеров"""
+
+    def with_current_state(self) -> "ContainerQuerySet":
+        """Подгружает всё, что нужно для вывода состояния контейнера
+        (здание, корпус, незакрытое сообщение и условия для сбора),
+        чтобы число запросов не зависело от числа контейнеров"""
+        return self.select_related(
+            "building",
+            "building_part",
+            "open_report",
+        ).with_conditions()
+
+    def with_conditions(self) -> "ContainerQuerySet":
+        """Добавляет действующие для контейнера условия для сбора
+        (condition_ignore_reports, condition_days)"""
+        if "condition_days" in self.query.annotations:
+            return self
+        return self.annotate(
+            condition_ignore_reports=Case(
+                When(kind=Container.PUBLIC_ECOBOX,
+                     then=condition_field("ignore_reports")),
+                default=0
+            ),
+            condition_days=Case(
+                When(kind=Container.PUBLIC_ECOBOX,
+                     then=condition_field("public_days")),
+                default=condition_field("office_days")
+            )
+        )
+
+    def full(self) -> "ContainerQuerySet":
+        """Полные контейнеры, как в Container.is_full"""
+        return self.with_conditions().filter(
+            Q(kind=Container.PUBLIC_ECOBOX, open_report__by_staff=True) |
+            Q(kind=Container.PUBLIC_ECOBOX,
+              open_report_count__gt=F("condition_ignore_reports")) |
+            ~Q(kind=Container.PUBLIC_ECOBOX),
+            status=Container.ACTIVE,
+            open_report__isnull=False
+        )
+
+    def overdue(self) -> "ContainerQuerySet":
+        """Полные контейнеры, которые ждут сбора не меньше
+        дней, чем позволяет условие для сбора по времени
+        (как в Container.check_time_conditions).
+        Разных значений дней в условиях немного, поэтому
+        граница времени заполнения для каждого из них
+        считается заранее и подставляется в запрос через CASE:
+        так запрос не зависит от арифметики дат в конкретной БД"""
+        takeout_condition = apps.get_model("takeouts_app", "TakeoutCondition")
+        days = set()
+        for office_days, public_days in takeout_condition.objects.values_list(
+            "office_days", "public_days"
+        ):
+            days.update((office_days, public_days))
+        days.discard(None)
+        days.discard(0)
+        if not days:
+            return self.none()
+
+        now = timezone.now()
+        return self.full().alias(
+            filled_before=Case(
+                *[When(condition_days=day,
+                       then=Value(now - datetime.timedelta(days=day)))
+                  for day in sorted(days)],
+                default=None,
+                output_field=models.DateTimeField()
+            )
+        ).filter(
+            filled_at__lte=F("filled_before")
+        )
+
+    def with_emptied_reports_count(self) -> "ContainerQuerySet":
+        """Добавляет кол-во выносов контейнера
+        (для collected_mass без запроса на каждый контейнер)"""
+        emptied_reports = FullContainerReport.objects.filter(
+            container=OuterRef("pk"),
+            emptied_at__isnull=False
+        ).order_by().values("container").annotate(
+            emptied_count=Count("pk")
+        ).values("emptied_count")
+        return self.annotate(
+            emptied_reports_count=Coalesce(Subquery(emptied_reports), 0)
+        )
+
+
 class Container(models.Model):  # pylint: disable=too-many-public-methods
     """ Модель контейнера """
 
@@ -501,11 +733,105 @@ class Container(models.Model):  # pylint: disable=too-many-public-methods
         verbose_name="cреднее время заполнения контейнера"
     )
 
+    # Суммы и кол-ва для средних времён, обновляются при каждом
+    # заполнении/выносе. None (у контейнеров, созданных до их
+    # появления) - ещё не посчитаны, тогда при следующем
+    # событии они считаются по всей истории сообщений
+    fill_time_sum = models.DurationField(
+        blank=True,
+        null=True,
+        default=datetime.timedelta,
+        verbose_name="суммарное время заполнения"
+    )
+
+    fill_time_count = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        default=0,
+        verbose_name="кол-во заполнений"
+    )
+
+    takeout_wait_time_sum = models.DurationField(
+        blank=True,
+        null=True,
+        default=datetime.timedelta,
+        verbose_name="суммарное время ожидания выноса"
+    )
+
+    takeout_wait_time_count = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        default=0,
+        verbose_name="кол-во выносов"
+    )
+
     requested_activation = models.BooleanField(
         default=False,
         verbose_name="запрошена активация"
     )
 
+    # Текущее состояние контейнера, чтобы не искать
+    # последние FullContainerReport при каждом чтении.
+    # Обновляется в add_report, handle_empty и correct_fullness
+    open_report = models.ForeignKey(
+        to="FullContainerReport",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        blank=True,
+        null=True,
+        verbose_name="незакрытое сообщение о заполненности"
+    )
+
+    open_report_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="кол-во сообщений о заполненности"
+    )
+
+    filled_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="заполнен в"
+    )
+
+    emptied_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="последний раз вынесен"
+    )
+
+    objects = ContainerQuerySet.as_manager()
+
+    # Текущее состояние, которое меняется при
+    # сообщениях о заполненности и выносах
+    STATE_FIELDS = [
+        "_is_full",
+        "open_report",
+        "open_report_count",
+        "filled_at",
+        "emptied_at",
+        "avg_fill_time",
+        "fill_time_sum",
+        "fill_time_count",
+        "avg_takeout_wait_time",
+        "takeout_wait_time_sum",
+        "takeout_wait_time_count",
+    ]
+
+    @classmethod
+    def mass_expression(cls, prefix: str = "") -> Case:
+        """Масса контейнера по его виду на стороне БД.
+        prefix - путь до контейнера (например, "emptied_containers__")"""
+        return Case(
+            When(**{f"{prefix}kind": cls.ECOBOX},
+                 then=Value(cls.ECOBOX_MASS)),
+            When(**{f"{prefix}kind": cls.PUBLIC_ECOBOX},
+                 then=Value(cls.PUBLIC_ECOBOX_MASS)),
+            When(**{f"{prefix}kind": cls.OFFICE_BOX},
+                 then=Value(cls.OFFICE_BOX_MASS)),
+            default=Value(0),
+            output_field=models.PositiveIntegerField()
+        )
+
     def mass(self) -> int:
         """Возвращает массу контейнера по его виду"""
         mass_dict = {
@@ -523,6 +849,9 @@ class Container(models.Model):  # pylint: disable=too-many-public-methods
                        start_date: datetime.date = None,
                        end_date: datetime.date = None) -> int:
         """Рассчитанная суммарная масса, собранная из этого контейнера"""
+        if hasattr(self, "emptied_reports_count") and not start_date:
+            # Посчитано в ContainerQuerySet.with_emptied_reports_count
+            return self.emptied_reports_count * self.mass()
         reports = self.full_reports.filter(
             emptied_at__isnull=False
         )
@@ -546,11 +875,8 @@ class Container(models.Model):  # pylint: disable=too-many-public-methods
         """Возвращает самый новый и
         незакрытый FullContainerReport
         для этого контейнера"""
-        report = self.full_reports.order_by(
-            "-reported_full_at"
-        ).first()
-        if report and not report.emptied_at:
-            return report
+        if self.open_report_id:
+            return self.open_report
         else:
             return None
 
@@ -573,110 +899,283 @@ class Container(models.Model):  # pylint: disable=too-many-public-methods
     def empty_from(self) -> Union[datetime.datetime, None]:
         """Возвращает, с какого момента контейнер является пустым"""
         if not self.is_full():
-            if self.last_emptied_report():
-                return self.last_emptied_report().emptied_at
-            else:
-                return self.activated_at
+            return self.emptied_at or self.activated_at
         else:
             return None
 
+    def effective_condition(self) -> EffectiveCondition:
+        """Условия для сбора, действующие для контейнера
+        (корпуса, если заданы, иначе здания). Кэшируются"""
+        return resolve_condition(self.building_id, self.building_part_id)
+
+    @classmethod
+    def prefetch_conditions(cls, containers: List["Container"]) -> None:
+        """Подставляет действующие условия для сбора нескольким
+        контейнерам сразу (как ContainerQuerySet.with_conditions),
+        не больше одного запроса к БД на все контейнеры"""
+        conditions = resolve_conditions(
+            (c.building_id, c.building_part_id) for c in containers
+        )
+        for container in containers:
+            condition = conditions[
+                (container.building_id, container.building_part_id)
+            ]
+            if container.is_public():
+                container.condition_ignore_reports = condition.ignore_reports
+                container.condition_days = condition.public_days
+            else:
+                container.condition_ignore_reports = 0
+                container.condition_days = condition.office_days
+
     def ignore_reports_count(self) -> int:
         """Возвращает количество сообщений о заполненности,
         которое нужно игнорировать, если контейнер в общественом месте"""
         if not self.is_public():
             return 0
-        if (self.building_part and
-                self.building_part.takeout_condition.ignore_reports):
-            return self.building_part.takeout_condition.ignore_reports
-        else:
-            return self.building.takeout_condition.ignore_reports
+        if hasattr(self, "condition_ignore_reports"):
+            # Посчитано в ContainerQuerySet.with_current_state
+            return self.condition_ignore_reports
+        return self.effective_condition().ignore_reports
 
     def is_full(self) -> bool:
         """Полный ли контейнер?
         Учитывается количество сообщений, которые надо игнорировать."""
-        if self.is_active() and self.last_full_report():
+        if self.is_active() and self.open_report_id:
 
             if not self.is_public():
                 return True
 
-            if self.last_full_report().by_staff:
+            if self.open_report.by_staff:
                 return True
 
             ignore_count = self.ignore_reports_count()
-            return self.last_full_report().count > ignore_count
+            return self.open_report_count > ignore_count
 
         else:
             return False
 
-    def add_report(self, by_staff: bool = False):
+    def add_report(self, by_staff: bool = False) -> bool:
         """Фиксируем сообщение о заполненности и
-        проверяем полноту контейнера"""
-        report: FullContainerReport = self.last_full_report()
-
-        if report:
+        проверяем полноту контейнера.
+        Возвращает True, если после сообщения контейнер стал полным.
+        Параллельные сообщения не теряются и не создают дублей:
+        кол-во сообщений увеличивается через F(), а незакрытое
+        сообщение у контейнера может быть только одно"""
+        with transaction.atomic():
             # При повторном сообщении о заполнении нужно
             # увеличить кол-во сообщений
-            if by_staff:
-                report.by_staff = True
-            report.count += 1
-            report.save()
+            report = self._increment_open_report(by_staff)
 
-        else:
-            # При первом сообщение о заполненности контейнера
-            # нужно создать FullContainerReport
-            FullContainerReport.objects.create(
-                container=self,
-                by_staff=by_staff
-            )
+            if not report:
+                # При первом сообщение о заполненности контейнера
+                # нужно создать FullContainerReport
+                try:
+                    with transaction.atomic():
+                        report = FullContainerReport.objects.create(
+                            container=self,
+                            by_staff=by_staff
+                        )
+                except IntegrityError:
+                    # Сообщение уже создано параллельным запросом
+                    report = self._increment_open_report(by_staff)
+
+            # Строка сообщения теперь заблокирована до конца транзакции,
+            # поэтому состояние контейнера можно перечитать без гонок
+            self.refresh_from_db(fields=self.STATE_FIELDS)
+            if self.open_report_id != report.pk:
+                self.filled_at = None
+            self.open_report = report
+            self.open_report_count = report.count
+            self.save(update_fields=["open_report", "open_report_count",
+                                     "filled_at"])
+
+            return self.check_fullness()
+
+    def _increment_open_report(self, by_staff: bool
+                               ) -> Union["FullContainerReport", None]:
+        """Атомарно увеличивает кол-во сообщений в незакрытом
+        сообщении о заполненности и возвращает его.
+        None - незакрытого сообщения нет"""
+        changes = {"count": F("count") + 1}
+        if by_staff:
+            changes["by_staff"] = True
+        reports = FullContainerReport.objects.filter(
+            container=self,
+            emptied_at__isnull=True
+        )
+        if reports.update(**changes):
+            return reports.get()
+        return None
+
+    @classmethod
+    def add_reports(cls, container_ids: Iterable[int],
+                    by_staff: bool = False,
+                    counts: Dict[int, int] = None) -> List["Container"]:
+        """Фиксирует сообщения о заполненности сразу для нескольких
+        контейнеров, как add_report для каждого из них, но
+        фиксированным числом запросов. Контейнеры блокируются до конца
+        транзакции (в порядке id), неизвестные и неактивные пропускаются.
+        counts - кол-во сообщений для контейнера (по id), по умолчанию 1.
+        Возвращает контейнеры, которые стали полными"""
+        counts = counts or {}
+        with transaction.atomic():
+            containers = list(cls.objects.filter(
+                pk__in=set(container_ids),
+                status=cls.ACTIVE
+            ).with_current_state().select_for_update(
+                of=("self",)
+            ).order_by("pk"))
+            reported = [c for c in containers if c.open_report_id]
+            new = [c for c in containers if not c.open_report_id]
+
+            # Повторные сообщения увеличивают кол-во сообщений,
+            # по одному UPDATE на каждое кол-во новых сообщений
+            by_count = defaultdict(list)
+            for container in reported:
+                by_count[counts.get(container.pk, 1)].append(container)
+            for count, group in by_count.items():
+                changes = {"count": F("count") + count}
+                if by_staff:
+                    changes["by_staff"] = True
+                FullContainerReport.objects.filter(
+                    pk__in=[c.open_report_id for c in group]
+                ).update(**changes)
+                cls.objects.filter(
+                    pk__in=[c.pk for c in group]
+                ).update(open_report_count=F("open_report_count") + count)
+                for container in group:
+                    container.open_report.count += count
+                    container.open_report_count += count
+                    if by_staff:
+                        container.open_report.by_staff = True
+
+            if new:
+                reports = FullContainerReport.objects.bulk_create([
+                    FullContainerReport(container=container,
+                                        by_staff=by_staff,
+                                        count=counts.get(container.pk, 1))
+                    for container in new
+                ])
+                if not connection.features.can_return_rows_from_bulk_insert:
+                    # INSERT не вернул id. Незакрытое сообщение у
+                    # контейнера одно (one_open_report_per_container),
+                    # а контейнеры заблокированы, поэтому это созданные
+                    report_ids = dict(FullContainerReport.objects.filter(
+                        container__in=new,
+                        emptied_at__isnull=True
+                    ).values_list("container", "pk"))
+                    for container, report in zip(new, reports):
+                        report.pk = report_ids[container.pk]
+                for container, report in zip(new, reports):
+                    container.open_report = report
+                    container.open_report_count = report.count
+                    container.filled_at = None
+                cls.objects.bulk_update(
+                    new, ["open_report", "open_report_count", "filled_at"]
+                )
 
-        time.sleep(5)  # Ждём сохранения в БД
-        # Если выполняются условия для вывоза по
-        # кол-ву бумаги, нужно сообщить
-        self.check_fullness()
+            return cls._check_fullness_bulk(containers)
+
+    @classmethod
+    def _check_fullness_bulk(cls, containers: List["Container"]
+                             ) -> List["Container"]:
+        """check_fullness для нескольких контейнеров.
+        Возвращает контейнеры, которые только что стали полными"""
+        newly_full = [
+            container for container in containers
+            if container.is_full() and not container._is_full
+        ]
+        if not newly_full:
+            return []
+
+        now = timezone.now()
+        FullContainerReport.objects.filter(
+            pk__in=[container.open_report_id for container in newly_full]
+        ).update(filled_at=now)
+
+        # Предыдущее заполненное сообщение каждого контейнера
+        # нужно для времени заполнения
+        previous_reports = FullContainerReport.objects.filter(
+            container=OuterRef("pk"),
+            filled_at__isnull=False
+        ).exclude(
+            pk=OuterRef("open_report")
+        ).order_by("-filled_at")
+        previous = {
+            pk: (previous_filled_at, previous_emptied_at)
+            for pk, previous_filled_at, previous_emptied_at in cls.objects.filter(
+                pk__in=[container.pk for container in newly_full]
+            ).annotate(
+                previous_filled_at=Subquery(
+                    previous_reports.values("filled_at")[:1]
+                ),
+                previous_emptied_at=Subquery(
+                    previous_reports.values("emptied_at")[:1]
+                )
+            ).values_list("pk", "previous_filled_at", "previous_emptied_at")
+        }
+
+        for container in newly_full:
+            container._is_full = True  # Для сортировки
+            container.open_report.filled_at = now
+            container.filled_at = now
+            previous_filled_at, previous_emptied_at = previous[container.pk]
+            previous_report = None
+            if previous_filled_at:
+                previous_report = FullContainerReport(
+                    filled_at=previous_filled_at,
+                    emptied_at=previous_emptied_at
+                )
+            container._change_fill_time(
+                container._fill_time_after(now, previous_report)
+            )
+        cls.objects.bulk_update(newly_full, [
+            "_is_full", "filled_at",
+            "fill_time_sum", "fill_time_count", "avg_fill_time"
+        ])
+        return newly_full
 
     def handle_empty(self):
         """При опустошении контейнера нужно запомнить время
         и пересчитать среднее время выноса"""
-        last_full_report = self.last_full_report()
-        if last_full_report:
-            last_full_report.emptied_at = timezone.now()
-            last_full_report.save()
-            time.sleep(5)  # Ждём сохранения в БД
-            self.avg_takeout_wait_time = self.calc_avg_takeout_wait_time()
-        self._is_full = False  # Для сортировки
-        self.save()
+        with transaction.atomic():
+            self.refresh_from_db(fields=self.STATE_FIELDS)
+            last_full_report = self.last_full_report()
+            if last_full_report:
+                last_full_report.emptied_at = timezone.now()
+                last_full_report.save(update_fields=["emptied_at"])
+                self.emptied_at = last_full_report.emptied_at
+                self._add_takeout_wait_time(last_full_report.takeout_wait_time())
+            self._reset_open_report()
+            self._is_full = False  # Для сортировки
+            self.save()
 
-    def check_fullness(self) -> None:
-        """Проверяет, полный ли контейнер. Если полный,
-        то сохраняет для сортировки и проверяет,
-        не выполнилось ли условие по массе"""
+    def check_fullness(self) -> bool:
+        """Проверяет, полный ли контейнер. Если контейнер
+        только что стал полным, то сохраняет это для сортировки
+        и возвращает True: после коммита нужно проверить
+        условия на сбор в здании"""
         if self.is_full() and not self._is_full:
             self._is_full = True  # Для сортировки
             report: FullContainerReport = self.last_full_report()
             report.filled_at = timezone.now()
-            report.save()
-            self.save()
-            time.sleep(5)  # Ждём сохранения в БД
-            self.avg_fill_time = self.calc_avg_fill_time()
-            self.save()
-            self.building.check_conditions_to_notify()
+            report.save(update_fields=["filled_at"])
+            self.filled_at = report.filled_at
+            self._change_fill_time(self.report_fill_time(report))
+            self.save(update_fields=self.STATE_FIELDS)
+            return True
+        return False
 
     def get_time_condition_days(self) -> Union[int, None]:
         """Возвращает максимальное кол-во дней, которое
         этот контейнер может быть заполнен по условию"""
+        if hasattr(self, "condition_days"):
+            # Посчитано в ContainerQuerySet.with_current_state
+            return self.condition_days
+        condition = self.effective_condition()
         if self.is_public():
-            if (self.building_part and
-                    self.building_part.takeout_condition.public_days):
-                return self.building_part.takeout_condition.public_days or 0
-            else:
-                return self.building.takeout_condition.public_days or 0
-        else:
-            if (self.building_part and
-                    self.building_part.takeout_condition.office_days):
-                return self.building_part.takeout_condition.office_days or 0
-            else:
-                return self.building.takeout_condition.office_days or 0
-        return 0
+            return condition.public_days
+        return condition.office_days
 
     def check_time_conditions(self) -> bool:
         '''Выполнены ли условия "не больше N дней"'''
@@ -702,56 +1201,111 @@ class Container(models.Model):  # pylint: disable=too-many-public-methods
 
     def cur_takeout_wait_time(self) -> Union[datetime.timedelta, None]:
         """Текущее время ожидания выноса контейнера"""
-        try:
-            if (self.is_active() and
-                self.last_full_report() is not None and
-                    self.last_full_report().filled_at):
-                try:
-                    wait_time = (timezone.now() -
-                                 self.last_full_report().filled_at)
-                    return wait_time
-                except AttributeError:
-                    return None
-        except ValueError:
-            return None
+        if self.is_active() and self.open_report_id and self.filled_at:
+            return timezone.now() - self.filled_at
         else:
             return None
 
-    def calc_avg_fill_time(self) -> Union[datetime.timedelta, None]:
-        """Считает среднее время заполнения контейнера"""
+    def fill_time_totals(self) -> Tuple[datetime.timedelta, int]:
+        """Считает сумму и кол-во времён заполнения контейнера
+        по всей истории сообщений"""
         reports = self.full_reports.filter(
             filled_at__isnull=False
         ).order_by("filled_at")
-        if (self.activated_at and reports) or len(reports) > 1:
-            sum_time = datetime.timedelta(seconds=0)
-            count = 0
-            if self.activated_at:
-                sum_time += reports[0].filled_at - self.activated_at
+        sum_time = datetime.timedelta(seconds=0)
+        count = 0
+        if self.activated_at and reports:
+            sum_time += reports[0].filled_at - self.activated_at
+            count += 1
+        for i in range(len(reports) - 1):
+            if reports[i].emptied_at:
+                fill_time = reports[i+1].filled_at - \
+                    reports[i].emptied_at
+                sum_time += fill_time
                 count += 1
-            for i in range(len(reports) - 1):
-                if reports[i].emptied_at:
-                    fill_time = reports[i+1].filled_at - \
-                        reports[i].emptied_at
-                    sum_time += fill_time
-                    count += 1
-            avg_fill_time = sum_time / count
-            return avg_fill_time
-        else:
-            return None
+        return sum_time, count
 
-    def calc_avg_takeout_wait_time(self) -> Union[datetime.timedelta, None]:
-        """Считает среднее время ожидания выноса контейнера"""
+    def takeout_wait_time_totals(self) -> Tuple[datetime.timedelta, int]:
+        """Считает сумму и кол-во времён ожидания выноса контейнера
+        по всей истории сообщений"""
         reports = self.full_reports.filter(
+            filled_at__isnull=False,
             emptied_at__isnull=False
         )
-        if not reports:
+        sum_time = datetime.timedelta(seconds=0)
+        for report in reports:
+            sum_time += report.takeout_wait_time()
+        return sum_time, len(reports)
+
+    def calc_avg_fill_time(self) -> Union[datetime.timedelta, None]:
+        """Считает среднее время заполнения контейнера"""
+        sum_time, count = self.fill_time_totals()
+        return sum_time / count if count else None
+
+    def calc_avg_takeout_wait_time(self) -> Union[datetime.timedelta, None]:
+        """Считает среднее время ожидания выноса контейнера"""
+        sum_time, count = self.takeout_wait_time_totals()
+        return sum_time / count if count else None
+
+    def report_fill_time(self, report: "FullContainerReport"
+                         ) -> Union[datetime.timedelta, None]:
+        """Время заполнения, которое заполненное сообщение report
+        добавляет в среднее: от выноса по предыдущему заполненному
+        сообщению (или от активации, если это первое)"""
+        previous_report = self.full_reports.filter(
+            filled_at__isnull=False,
+            filled_at__lt=report.filled_at
+        ).exclude(
+            pk=report.pk
+        ).order_by("-filled_at").only("emptied_at").first()
+        return self._fill_time_after(report.filled_at, previous_report)
+
+    def _fill_time_after(self, filled_at: datetime.datetime,
+                         previous_report: Union["FullContainerReport", None]
+                         ) -> Union[datetime.timedelta, None]:
+        """Время заполнения к filled_at после previous_report
+        (предыдущего заполненного сообщения)"""
+        if previous_report:
+            if previous_report.emptied_at:
+                return filled_at - previous_report.emptied_at
             return None
+        if self.activated_at:
+            return filled_at - self.activated_at
+        return None
+
+    def _change_fill_time(self, fill_time: Union[datetime.timedelta, None],
+                          removed: bool = False) -> None:
+        """Добавляет (или убирает) одно время заполнения
+        и пересчитывает среднее"""
+        if self.fill_time_count is None:
+            self.fill_time_sum, self.fill_time_count = self.fill_time_totals()
+        elif fill_time is not None:
+            if removed:
+                self.fill_time_sum -= fill_time
+                self.fill_time_count -= 1
+            else:
+                self.fill_time_sum += fill_time
+                self.fill_time_count += 1
+        if self.fill_time_count:
+            self.avg_fill_time = self.fill_time_sum / self.fill_time_count
         else:
-            sum_time = datetime.timedelta(seconds=0)
-            for report in reports:
-                sum_time += report.takeout_wait_time()
-            avg_takeout_wait_time = sum_time / len(reports)
-            return avg_takeout_wait_time
+            self.avg_fill_time = None
+
+    def _add_takeout_wait_time(self, wait_time: Union[datetime.timedelta, None]
+                               ) -> None:
+        """Добавляет одно время ожидания выноса
+        и пересчитывает среднее"""
+        if self.takeout_wait_time_count is None:
+            (self.takeout_wait_time_sum,
+             self.takeout_wait_time_count) = self.takeout_wait_time_totals()
+        elif wait_time is not None:
+            self.takeout_wait_time_sum += wait_time
+            self.takeout_wait_time_count += 1
+        if self.takeout_wait_time_count:
+            self.avg_takeout_wait_time = (self.takeout_wait_time_sum /
+                                          self.takeout_wait_time_count)
+        else:
+            self.avg_takeout_wait_time = None
 
     def request_activation(self) -> None:
         """Запросить активацию контейнера"""
@@ -783,7 +1337,7 @@ class Container(models.Model):  # pylint: disable=too-many-public-methods
                 emails
             )
             email.content_subtype = "html"
-            email.send()
+            send_email(email)
 
     def activate(self) -> None:
         """Активировать контейнер"""
@@ -815,7 +1369,7 @@ class Container(models.Model):  # pylint: disable=too-many-public-methods
             sticker_im = generate_sticker(self.pk)
             sticker_im.save(tmp.name, "pdf", quality=100)
             email.attach("sticker.pdf", tmp.read(), "application/pdf")
-            email.send()
+            send_email(email)
 
     def detect_building_part(self) -> Union[BuildingPart, None]:
         """Определяет корпус по номеру аудитории"""
@@ -838,13 +1392,54 @@ class Container(models.Model):  # pylint: disable=too-many-public-methods
         ошибок (заполненный в сервисе контейнер на самом деле пустой),
         поэтому не вызываем handle_empty_container
         (там устанавливается время опустошения)"""
-        last_report: FullContainerReport = self.last_full_report()
-        if last_report:
-            last_report.delete()
-            time.sleep(5)  # Ждём сохранения в БД
-            self._is_full = False  # Для сортировки
-            self.avg_fill_time = self.calc_avg_fill_time()
-            self.save()
+        with transaction.atomic():
+            last_report: FullContainerReport = self.last_full_report()
+            if last_report:
+                fill_time = None
+                if last_report.filled_at:
+                    fill_time = self.report_fill_time(last_report)
+                last_report.delete()
+                self._reset_open_report()
+                self._is_full = False  # Для сортировки
+                self._change_fill_time(fill_time, removed=True)
+                self.save()
+
+    def _reset_open_report(self) -> None:
+        """Сбрасывает текущее состояние после закрытия
+        или удаления сообщения о заполненности"""
+        self.open_report = None
+        self.open_report_count = 0
+        self.filled_at = None
+
+    def refresh_current_state(self) -> None:
+        """Пересчитывает текущее состояние и средние времена
+        по FullContainerReport (после правки или удаления сообщения
+        вручную, например в админке)"""
+        with transaction.atomic():
+            open_report: FullContainerReport = self.full_reports.filter(
+                emptied_at__isnull=True
+            ).first()
+            self.emptied_at = self.full_reports.aggregate(
+                last_emptied_at=Max("emptied_at")
+            )["last_emptied_at"]
+            if open_report:
+                self.open_report = open_report
+                self.open_report_count = open_report.count
+                self.filled_at = open_report.filled_at
+            else:
+                self._reset_open_report()
+            self._is_full = self.is_full()  # Для сортировки
+            # Накопленные суммы могли включать изменённые сообщения
+            self.fill_time_count = None
+            self._change_fill_time(None)
+            self.takeout_wait_time_count = None
+            self._add_takeout_wait_time(None)
+            self.save(update_fields=[
+                "_is_full", "open_report", "open_report_count", "filled_at",
+                "emptied_at", "fill_time_sum", "fill_time_count",
+                "avg_fill_time", "takeout_wait_time_sum",
+                "takeout_wait_time_count", "avg_takeout_wait_time",
+            ])
 
     def __str__(self) -> str:
         return f"Контейнер №{self.pk}"
@@ -852,6 +1447,29 @@ class Container(models.Model):  # pylint: disable=too-many-public-methods
     class Meta:
         verbose_name = "контейнер"
         verbose_name_plural = "контейнеры"
+        # Фильтры и сортировки списка контейнеров
+        # (id - для постраничного вывода по ключу)
+        indexes = [
+            models.Index(fields=["building", "status", "_is_full"],
+                         name="container_bld_status_full_idx"),
+            models.Index(fields=["building", "floor", "id"],
+                         name="container_bld_floor_idx"),
+            models.Index(fields=["building_part", "floor"],
+                         name="container_bpart_floor_idx"),
+            models.Index(fields=["status", "id"],
+                         name="container_status_idx"),
+            models.Index(fields=["_is_full", "id"],
+                         name="container_is_full_idx"),
+            # (поле, id) для остальных сортировок ContainerListView
+            models.Index(fields=["building", "id"],
+                         name="container_bld_id_idx"),
+            models.Index(fields=["building_part", "id"],
+                         name="container_bpart_id_idx"),
+            models.Index(fields=["floor", "id"],
+                         name="container_floor_idx"),
+            models.Index(fields=["description", "id"],
+                         name="container_description_idx"),
+        ]
 
 
 class FullContainerReport(models.Model):
@@ -906,6 +1524,28 @@ class FullContainerReport(models.Model):
     class Meta:
         verbose_name = "контейнер заполнен"
         verbose_name_plural = "контейнеры заполнены"
+        # Незакрытое сообщение контейнера ищется по частичному
+        # индексу ограничения one_open_report_per_container
+        constraints = [
+            models.UniqueConstraint(
+                fields=["container"],
+                condition=Q(emptied_at__isnull=True),
+                name="one_open_report_per_container"
+            ),
+        ]
+        indexes = [
+            # История сообщений контейнера (last_emptied_report)
+            models.Index(fields=["container", "reported_full_at"],
+                         name="report_container_reported_idx"),
+            # Время заполнения (fill_time_totals, report_fill_time)
+            models.Index(fields=["container", "filled_at"],
+                         condition=Q(filled_at__isnull=False),
+                         name="report_container_filled_idx"),
+            # Закрытые сообщения (collected_mass, время ожидания выноса)
+            models.Index(fields=["container", "emptied_at"],
+                         condition=Q(emptied_at__isnull=False),
+                         name="report_container_emptied_idx"),
+        ]
 
 
 class TankTakeoutCompany(models.Model):
@@ -1,6 +1,9 @@
+from typing import List
+
 from rest_framework import serializers
 
-from .models import Building, BuildingPart, Container, FullContainerReport
+from .models import Building, BuildingPart, Container
+from .utils.report_targets import ReportTarget, get_report_target
 from rcs_back.users_app.models import User
 
 class BuildingPartSerializer(serializers.ModelSerializer):
@@ -100,18 +103,44 @@ class BuildingShortSerializer(serializers.ModelSerializer):
         ]
 
 
-class FullContainerReportSerializer(serializers.ModelSerializer):
-    """Сериализатор для заполнения контейнера"""
-    container = serializers.PrimaryKeyRelatedField(
-        queryset=Container.objects.filter(status=Container.ACTIVE)
+class FullContainerReportSerializer(serializers.Serializer):
+    """Сериализатор для заполнения контейнера. Активный контейнер
+    ищется в кэше (get_report_target), обычно без запроса к БД"""
+    container = serializers.IntegerField(min_value=1)
+
+    def validate_container(self, value: int) -> ReportTarget:
+        target = get_report_target(value)
+        if target is None:
+            raise serializers.ValidationError(
+                f"Нет активного контейнера с ID {value}"
+            )
+        return target
+
+
+class BulkFullContainerReportSerializer(serializers.Serializer):
+    """Сериализатор для заполнения нескольких контейнеров"""
+    MAX_CONTAINERS = 500
+
+    containers = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=MAX_CONTAINERS
     )
 
-    class Meta:
-        model = FullContainerReport
-        fields = [
-            "id",
-            "container"
-        ]
+    def validate_containers(self, value: List[int]) -> List[int]:
+        """Все контейнеры проверяются одним запросом.
+        Возвращает id без повторов"""
+        ids = set(value)
+        missing = ids - set(Container.objects.filter(
+            pk__in=ids,
+            status=Container.ACTIVE
+        ).values_list("pk", flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                "Нет активных контейнеров с ID " +
+                ", ".join(str(pk) for pk in sorted(missing))
+            )
+        return sorted(ids)
 
 
 class ContainerSerializer(serializers.ModelSerializer):
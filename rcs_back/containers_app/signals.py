@@ -1,8 +1,10 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
 from rcs_back.containers_app.models import Building, BuildingPart, Container
+from rcs_back.containers_app.utils.report_targets import invalidate_report_target
 from rcs_back.takeouts_app.models import TakeoutCondition
 
 
@@ -11,7 +13,28 @@ def check_container_state(instance: Container, **kwargs) -> None:
     """Записываем время активации"""
     if instance.is_active() and not instance.activated_at:
         instance.activated_at = timezone.now()
-        instance.save()
+        instance.save(update_fields=["activated_at"])
+
+
+# Поля, от которых зависит приём сообщений о заполненности
+REPORT_TARGET_FIELDS = {"status", "building", "building_part", "kind"}
+
+
+@receiver(post_save, sender=Container)
+@receiver(post_delete, sender=Container)
+def invalidate_container_report_target(instance: Container,
+                                       update_fields=None, created=False,
+                                       **kwargs) -> None:
+    """Сбрасываем закэшированный контейнер. Новый контейнер ещё не
+    закэширован, сохранение только текущего состояния (add_report
+    и т.п.) кэш не меняет. Повторно - после коммита, чтобы другой
+    процесс не закэшировал старые данные"""
+    if created or (update_fields
+                   and not REPORT_TARGET_FIELDS & set(update_fields)):
+        return
+    container_id = instance.pk
+    invalidate_report_target(container_id)
+    transaction.on_commit(lambda: invalidate_report_target(container_id))
 
 
 @receiver(post_save, sender=Building)
@@ -1,15 +1,27 @@
-import time
+import logging
 
 from celery import shared_task
+from django.db import transaction
 
-from rcs_back.containers_app.models import Container
+from rcs_back.containers_app.models import Building, Container
+from rcs_back.containers_app.utils.report_buffer import (
+    FAILED_KEY,
+    MAX_FLUSH_ATTEMPTS,
+    BufferedReports,
+    clear_flushed_reports,
+    flush_lock,
+    record_flush_failure,
+    take_buffered_reports,
+)
+from rcs_back.utils.transaction import delay_on_commit
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
 def public_container_add_notify(container_id: int) -> None:
     """Отправляет сообщение с инструкциями для активации
     добавленного контейнера"""
-    time.sleep(5)  # Ждём сохранения в БД
     container: Container = Container.objects.get(pk=container_id)
     container.public_add_notify()
 
@@ -17,7 +29,70 @@ def public_container_add_notify(container_id: int) -> None:
 @shared_task
 def container_add_report(container_id: int, by_staff: bool) -> None:
     container: Container = Container.objects.get(pk=container_id)
-    container.add_report(by_staff)
+    if container.add_report(by_staff):
+        # Контейнер стал полным - проверяем условия на сбор
+        # отдельной задачей, чтобы не держать здесь отправку письма
+        delay_on_commit(building_check_conditions, container.building_id)
+
+
+@shared_task
+def flush_buffered_reports() -> None:
+    """Записывает в БД сообщения о заполненности,
+    накопленные в Redis (FULLNESS_REPORTS_BUFFERED)"""
+    lock = flush_lock()
+    if not lock.acquire(blocking=False):
+        # Сообщения уже записывает другая задача
+        return
+    try:
+        reports = take_buffered_reports()
+        if not reports:
+            return
+        try:
+            write_buffered_reports(reports)
+        except Exception:
+            attempts = record_flush_failure(reports)
+            if attempts >= MAX_FLUSH_ATTEMPTS:
+                logger.error("Сообщения о заполненности не записаны за %d "
+                             "попыток и отложены в %s (вернуть - "
+                             "manage.py requeue_failed_reports): %s",
+                             attempts, FAILED_KEY, reports)
+            else:
+                logger.warning("Сообщения о заполненности не записаны "
+                               "(попытка %d из %d)",
+                               attempts, MAX_FLUSH_ATTEMPTS)
+            raise
+        clear_flushed_reports()
+    finally:
+        lock.release()
+
+
+def write_buffered_reports(reports: BufferedReports) -> None:
+    """Записывает сообщения одной транзакцией"""
+    full_containers = []
+    with transaction.atomic():
+        # Сначала обычные сообщения, потом от сотрудников,
+        # как если бы они пришли по одному. Неизвестные
+        # и неактивные контейнеры пропускаются
+        for by_staff in (False, True):
+            counts = {
+                container_id: count
+                for (container_id, staff), count in reports.items()
+                if staff == by_staff
+            }
+            if counts:
+                full_containers += Container.add_reports(
+                    counts, by_staff=by_staff, counts=counts
+                )
+        for building_id in {c.building_id for c in full_containers}:
+            delay_on_commit(building_check_conditions, building_id)
+
+
+@shared_task
+def building_check_conditions(building_id: int) -> None:
+    """Проверяет условия на сбор в здании и
+    при необходимости отправляет оповещение"""
+    building: Building = Building.objects.get(pk=building_id)
+    building.check_conditions_to_notify()
 
 
 @ shared_task
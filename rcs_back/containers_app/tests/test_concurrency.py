@@ -0,0 +1,118 @@
+import datetime
+import importlib
+import threading
+from unittest import skipIf
+
+from django.apps import apps
+
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from rcs_back.containers_app.models import Container, FullContainerReport
+from rcs_back.takeouts_app.models import Building, TakeoutCondition
+
+
+def create_public_container() -> Container:
+    building = Building.objects.create(address="ул. Тестовая 30")
+    TakeoutCondition.objects.filter(building=building).update(
+        ignore_reports=1000
+    )
+    return Container.objects.create(
+        kind=Container.PUBLIC_ECOBOX,
+        building=building,
+        floor=1,
+        status=Container.ACTIVE
+    )
+
+
+class OpenReportTests(TestCase):
+
+    def setUp(self):
+        self.container = create_public_container()
+
+    def test_stale_instances_do_not_lose_reports(self):
+        first = Container.objects.get(pk=self.container.pk)
+        second = Container.objects.get(pk=self.container.pk)
+        first.add_report()
+        # second не знает о созданном сообщении
+        second.add_report()
+        first.add_report()
+        report = FullContainerReport.objects.get(container=self.container)
+        self.assertEqual(report.count, 3)
+        self.container.refresh_from_db()
+        self.assertEqual(self.container.open_report, report)
+        self.assertEqual(self.container.open_report_count, 3)
+
+    def test_one_open_report_per_container(self):
+        self.container.add_report()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FullContainerReport.objects.create(container=self.container)
+        self.container.handle_empty()
+        # После выноса можно открыть новое сообщение
+        self.container.add_report()
+        self.assertEqual(self.container.full_reports.count(), 2)
+
+    def test_migration_closes_stale_report(self):
+        migration = importlib.import_module(
+            "rcs_back.containers_app.migrations."
+            "0055_one_open_report_per_container"
+        )
+        self.container.add_report()
+        self.container.handle_empty()
+        # Старое сообщение осталось незакрытым, более новое уже вынесено
+        stale = FullContainerReport.objects.create(container=self.container)
+        FullContainerReport.objects.filter(pk=stale.pk).update(
+            reported_full_at=timezone.now() - datetime.timedelta(days=90)
+        )
+        Container.objects.filter(pk=self.container.pk).update(
+            open_report=stale
+        )
+
+        migration.one_open_report(apps, None)
+
+        stale.refresh_from_db()
+        self.container.refresh_from_db()
+        self.assertEqual(stale.emptied_at, self.container.emptied_at)
+        self.assertIsNone(self.container.open_report)
+        # Следующее сообщение открывает новое, а не продолжает старое
+        self.container.add_report()
+        self.assertEqual(self.container.open_report.count, 1)
+        self.assertNotEqual(self.container.open_report, stale)
+
+
+@skipIf(connection.vendor == "sqlite",
+        "SQLite не поддерживает параллельную запись")
+class ConcurrentReportsTests(TransactionTestCase):
+
+    THREADS = 16
+    REPORTS_PER_THREAD = 10
+
+    def test_parallel_scans(self):
+        container = create_public_container()
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def scan():
+            try:
+                barrier.wait()
+                for _ in range(self.REPORTS_PER_THREAD):
+                    Container.objects.get(pk=container.pk).add_report()
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=scan) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        report = FullContainerReport.objects.get(container=container)
+        self.assertEqual(report.count, self.THREADS * self.REPORTS_PER_THREAD)
+        container.refresh_from_db()
+        self.assertEqual(container.open_report, report)
+        self.assertEqual(container.open_report_count, report.count)
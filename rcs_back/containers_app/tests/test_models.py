@@ -1,7 +1,18 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
 
 from rcs_back.containers_app.models import Container, FullContainerReport
-from rcs_back.takeouts_app.models import Building, BuildingPart, TakeoutCondition
+from rcs_back.takeouts_app.models import (
+    Building,
+    BuildingPart,
+    TakeoutCondition,
+    TankTakeoutRequest,
+)
 
 
 # pylint: disable=too-many-instance-attributes
@@ -161,6 +172,149 @@ class ContainerModelTests(TestCase):
         container.handle_empty()
         self.assertEqual(container.collected_mass(), container.mass() * 2)
 
+    def test_current_state(self):
+        container: Container = self.public_container_in_bpart
+        container.add_report()
+        report = container.last_full_report()
+        self.assertEqual(container.open_report, report)
+        self.assertEqual(container.open_report_count, 1)
+        self.assertIsNone(container.filled_at)
+
+        container.add_report()
+        container.add_report()
+        report.refresh_from_db()
+        self.assertEqual(container.open_report_count, 3)
+        self.assertTrue(container.is_full())
+        self.assertEqual(container.filled_at, report.filled_at)
+
+        container.handle_empty()
+        report.refresh_from_db()
+        self.assertIsNone(container.open_report)
+        self.assertEqual(container.open_report_count, 0)
+        self.assertIsNone(container.filled_at)
+        self.assertEqual(container.emptied_at, report.emptied_at)
+        self.assertEqual(container.empty_from(), report.emptied_at)
+
+        container.add_report(True)
+        container.correct_fullness()
+        self.assertIsNone(container.open_report)
+        self.assertFalse(container.is_full())
+        self.assertEqual(container.emptied_at, report.emptied_at)
+
+    def test_running_averages(self):
+        container: Container = self.public_container_in_building
+        clock = [timezone.now()]
+
+        def now():
+            clock[0] += datetime.timedelta(hours=5)
+            return clock[0]
+
+        def assert_averages():
+            container.refresh_from_db()
+            self.assertEqual(container.avg_fill_time,
+                             container.calc_avg_fill_time())
+            self.assertEqual(container.avg_takeout_wait_time,
+                             container.calc_avg_takeout_wait_time())
+
+        with mock.patch("django.utils.timezone.now", side_effect=now):
+            # ignore_reports = 3: полный после 4 сообщений или сотрудника
+            for reports in (4, 1, 4):
+                container.add_report(reports == 1)
+                for _ in range(reports - 1):
+                    container.add_report()
+                assert_averages()
+                container.handle_empty()
+                assert_averages()
+            # Сообщение, не сделавшее контейнер полным
+            container.add_report()
+            container.handle_empty()
+            container.add_report(True)
+            assert_averages()
+            container.correct_fullness()
+            assert_averages()
+        self.assertEqual(container.fill_time_count, 3)
+        self.assertEqual(container.takeout_wait_time_count, 3)
+
+        out = StringIO()
+        call_command("verify_container_averages", stdout=out)
+        self.assertIn("с расхождениями: 0", out.getvalue())
+
+        Container.objects.filter(pk=container.pk).update(
+            fill_time_count=1, takeout_wait_time_sum=datetime.timedelta(0)
+        )
+        call_command("verify_container_averages", "--fix", stdout=out)
+        out = StringIO()
+        call_command("verify_container_averages", stdout=out)
+        self.assertIn("с расхождениями: 0", out.getvalue())
+        assert_averages()
+        self.assertEqual(container.fill_time_count, 3)
+
+    def test_backfill_container_state(self):
+        container: Container = self.office_container_in_building
+        container.add_report()
+        container.handle_empty()
+        container.add_report()
+        expected = Container.objects.get(pk=container.pk)
+
+        Container.objects.update(
+            open_report=None, open_report_count=0,
+            filled_at=None, emptied_at=None
+        )
+        call_command("backfill_container_state", stdout=StringIO())
+
+        container.refresh_from_db()
+        self.assertEqual(container.open_report_id, expected.open_report_id)
+        self.assertEqual(container.open_report_count, 1)
+        self.assertEqual(container.filled_at, expected.filled_at)
+        self.assertEqual(container.emptied_at, expected.emptied_at)
+
+    def test_refresh_current_state(self):
+        container: Container = self.office_container_in_building
+        container.add_report()
+        container.handle_empty()
+        container.add_report()
+        emptied_at = container.emptied_at
+
+        # Открытое сообщение удалено вручную
+        container.open_report.delete()
+        container.refresh_current_state()
+        container.refresh_from_db()
+        self.assertIsNone(container.open_report)
+        self.assertEqual(container.open_report_count, 0)
+        self.assertFalse(container._is_full)
+        self.assertEqual(container.emptied_at, emptied_at)
+        self.assertFalse(container.is_full())
+
+        # Вынесенное сообщение удалено вручную - средние без него
+        container.add_report()
+        container.handle_empty()
+        self.assertEqual(container.takeout_wait_time_count, 2)
+        container.full_reports.order_by("filled_at").first().delete()
+        container.refresh_current_state()
+        container.refresh_from_db()
+        self.assertEqual(
+            (container.fill_time_sum, container.fill_time_count),
+            container.fill_time_totals()
+        )
+        self.assertEqual(
+            (container.takeout_wait_time_sum,
+             container.takeout_wait_time_count),
+            container.takeout_wait_time_totals()
+        )
+        self.assertEqual(container.takeout_wait_time_count, 1)
+        self.assertEqual(container.avg_takeout_wait_time,
+                         container.calc_avg_takeout_wait_time())
+
+        # Вынесенное сообщение снова открыто вручную
+        FullContainerReport.objects.filter(container=container).update(
+            emptied_at=None
+        )
+        container.refresh_current_state()
+        container.refresh_from_db()
+        self.assertIsNotNone(container.open_report)
+        self.assertIsNone(container.emptied_at)
+        self.assertTrue(container.is_full())
+
 
 class SimpleMassRuleTests(TestCase):
     """Тест выполнения условий на сбор по массе"""
@@ -207,6 +361,60 @@ class SimpleMassRuleTests(TestCase):
         self.assertTrue(self.building.meets_mass_takeout_condition())
         self.assertTrue(self.building.needs_takeout())
 
+    def test_mass_annotations(self):
+        self.office_container.add_report(False)
+        other_building = Building.objects.create(address="ул. Тестовая 31")
+        self.assertEqual(self.building.current_mass(), Container.ECOBOX_MASS)
+        with self.assertNumQueries(1):
+            buildings = {
+                building.pk: building
+                for building in Building.objects.with_mass_condition()
+            }
+        self.assertEqual(buildings[self.building.pk].current_mass(),
+                         Container.ECOBOX_MASS)
+        self.assertEqual(buildings[other_building.pk].current_mass(), 0)
+        self.assertFalse(buildings[self.building.pk].meets_mass_takeout_condition())
+
+        self.public_container.add_report(False)
+        building = Building.objects.with_mass_condition().get(pk=self.building.pk)
+        self.assertEqual(building.current_mass(),
+                         Container.ECOBOX_MASS + Container.PUBLIC_ECOBOX_MASS)
+        self.assertTrue(building.meets_mass_takeout_condition())
+
+    def test_stats_annotations(self):
+        self.building.precollected_mass = 100
+        self.building.save()
+        other_building = Building.objects.create(address="ул. Тестовая 31")
+        TankTakeoutRequest.objects.create(
+            building=self.building,
+            confirmed_at=timezone.now() - datetime.timedelta(days=70),
+            confirmed_mass=300
+        )
+        TankTakeoutRequest.objects.create(building=self.building)
+        TankTakeoutRequest.objects.create(building=other_building)
+
+        with self.assertNumQueries(1):
+            buildings = {
+                building.pk: building
+                for building in Building.objects.with_stats()
+            }
+        with self.assertNumQueries(0):
+            stats = {
+                pk: (building.container_count(),
+                     building.confirmed_collected_mass(),
+                     building.avg_fill_speed())
+                for pk, building in buildings.items()
+            }
+        # Те же значения, что и без аннотаций
+        for building in (self.building, other_building):
+            self.assertEqual(stats[building.pk], (
+                building.container_count(),
+                building.confirmed_collected_mass(),
+                building.avg_fill_speed()
+            ))
+        self.assertEqual(stats[self.building.pk][:2], (2, 400))
+        self.assertEqual(stats[other_building.pk], (0, 0, None))
+
 
 class MassRuleIgnoreReportsTests(TestCase):
     """Тест выполнения условий на сбор по массе.
@@ -0,0 +1,179 @@
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import override_settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework.test import APITestCase
+
+from rcs_back.containers_app.models import Container
+from rcs_back.containers_app.tasks import (
+    building_check_conditions,
+    container_add_report,
+    flush_buffered_reports,
+)
+from rcs_back.containers_app.utils.report_buffer import (
+    FAILED_KEY,
+    FLUSH_ATTEMPTS_KEY,
+    FLUSHING_KEY,
+    MAX_FLUSH_ATTEMPTS,
+    PENDING_KEY,
+    flush_lock,
+)
+from rcs_back.takeouts_app.models import Building, TakeoutCondition
+
+
+def redis_available() -> bool:
+    try:
+        return get_redis_connection("default").ping()
+    except RedisError:
+        return False
+
+
+@skipUnless(redis_available(), "нужен Redis")
+@override_settings(FULLNESS_REPORTS_BUFFERED=True)
+class BufferedReportsTests(APITestCase):
+
+    def setUp(self):
+        get_redis_connection("default").delete(
+            PENDING_KEY, FLUSHING_KEY, FLUSH_ATTEMPTS_KEY, FAILED_KEY
+        )
+        self.building = Building.objects.create(address="ул. Тестовая 30")
+        TakeoutCondition.objects.filter(building=self.building).update(
+            ignore_reports=2
+        )
+        self.public_container = Container.objects.create(
+            kind=Container.PUBLIC_ECOBOX,
+            building=self.building,
+            floor=1,
+            status=Container.ACTIVE
+        )
+        self.office_container = Container.objects.create(
+            kind=Container.ECOBOX,
+            building=self.building,
+            floor=1,
+            status=Container.ACTIVE
+        )
+
+    def report(self, container_id: int) -> None:
+        resp = self.client.post(
+            "/api/full-container-reports", {"container": container_id}
+        )
+        self.assertEqual(resp.status_code, 201)
+        self.assertIn("time_condition_days", resp.data)
+
+    def test_reports_written_by_flush(self):
+        with mock.patch.object(container_add_report, "delay") as add_delay:
+            self.report(self.public_container.pk)
+            # Контейнер и условия для сбора из кэша
+            with self.assertNumQueries(0):
+                self.report(self.public_container.pk)
+            self.report(self.public_container.pk)
+            self.report(self.office_container.pk)
+            # Несуществующий контейнер не попадает в буфер
+            # (DRF откатывает при ошибке только atomic теста)
+            with transaction.atomic():
+                resp = self.client.post(
+                    "/api/full-container-reports", {"container": 999999}
+                )
+            self.assertEqual(resp.status_code, 400)
+        add_delay.assert_not_called()
+        self.assertFalse(self.public_container.full_reports.exists())
+
+        with mock.patch.object(building_check_conditions, "delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            flush_buffered_reports()
+        delay.assert_called_once_with(self.building.pk)
+
+        self.public_container.refresh_from_db()
+        self.assertEqual(self.public_container.open_report.count, 3)
+        self.assertTrue(self.public_container.is_full())
+        self.office_container.refresh_from_db()
+        self.assertTrue(self.office_container.is_full())
+        redis = get_redis_connection("default")
+        self.assertFalse(redis.exists(PENDING_KEY))
+        self.assertFalse(redis.exists(FLUSHING_KEY))
+
+        # Новые сообщения добавляются к незакрытому
+        self.report(self.public_container.pk)
+        flush_buffered_reports()
+        self.public_container.refresh_from_db()
+        self.assertEqual(self.public_container.open_report.count, 4)
+
+    def test_failed_flush_is_retried(self):
+        self.report(self.office_container.pk)
+        with mock.patch.object(Container, "add_reports",
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError), \
+                    self.assertLogs("rcs_back.containers_app.tasks", "WARNING"):
+                flush_buffered_reports()
+        self.assertFalse(self.office_container.full_reports.exists())
+
+        self.report(self.office_container.pk)
+        flush_buffered_reports()
+        # Сначала записывается неудавшаяся партия, новая ждёт
+        self.assertEqual(self.office_container.full_reports.get().count, 1)
+        flush_buffered_reports()
+        self.assertEqual(self.office_container.full_reports.get().count, 2)
+
+    def test_failing_batch_moved_aside(self):
+        self.report(self.office_container.pk)
+        with mock.patch.object(Container, "add_reports",
+                               side_effect=RuntimeError):
+            for _ in range(MAX_FLUSH_ATTEMPTS):
+                with self.assertRaises(RuntimeError), \
+                        self.assertLogs("rcs_back.containers_app.tasks") as logs:
+                    flush_buffered_reports()
+        self.assertIn("ERROR", logs.output[0])
+        redis = get_redis_connection("default")
+        self.assertFalse(redis.exists(FLUSHING_KEY))
+        self.assertEqual(redis.hgetall(FAILED_KEY),
+                         {f"{self.office_container.pk}:0".encode(): b"1"})
+
+        # Новые сообщения больше не ждут отложенную партию
+        self.report(self.public_container.pk)
+        flush_buffered_reports()
+        self.assertEqual(self.public_container.full_reports.get().count, 1)
+        self.assertFalse(self.office_container.full_reports.exists())
+
+        # После устранения ошибки отложенные сообщения возвращаются
+        self.report(self.office_container.pk)
+        call_command("requeue_failed_reports", stdout=StringIO())
+        self.assertFalse(redis.exists(FAILED_KEY))
+        flush_buffered_reports()
+        self.assertEqual(self.office_container.full_reports.get().count, 2)
+
+    def test_flush_skipped_while_locked(self):
+        self.report(self.office_container.pk)
+        lock = flush_lock()
+        self.assertTrue(lock.acquire(blocking=False))
+        try:
+            flush_buffered_reports()
+        finally:
+            lock.release()
+        self.assertFalse(self.office_container.full_reports.exists())
+        flush_buffered_reports()
+        self.assertTrue(self.office_container.full_reports.exists())
+
+
+@override_settings(FULLNESS_REPORTS_BUFFERED=True)
+class BufferedReportsRedisDownTests(APITestCase):
+
+    def test_reports_written_directly_without_redis(self):
+        container = Container.objects.create(
+            kind=Container.ECOBOX,
+            building=Building.objects.create(address="ул. Тестовая 31"),
+            floor=1,
+            status=Container.ACTIVE
+        )
+        with mock.patch(
+            "rcs_back.containers_app.views.buffer_report",
+            side_effect=RedisError
+        ), mock.patch.object(container_add_report, "delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post("/api/full-container-reports",
+                                    {"container": container.pk})
+        self.assertEqual(resp.status_code, 201)
+        delay.assert_called_once_with(container.pk, False)
@@ -0,0 +1,107 @@
+from unittest import mock, skipUnless
+
+from django.db import transaction
+from django.test import override_settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework.test import APITestCase
+
+from rcs_back.containers_app.models import Container
+from rcs_back.containers_app.tasks import container_add_report
+from rcs_back.containers_app.tests.test_report_buffer import redis_available
+from rcs_back.containers_app.utils.report_dedup import (
+    DEDUP_KEY_PREFIX,
+    METRICS_KEY,
+    dropped_reports_count,
+)
+from rcs_back.takeouts_app.models import Building
+
+
+@skipUnless(redis_available(), "нужен Redis")
+@override_settings(FULLNESS_REPORT_DEDUP_WINDOW=60)
+class ReportDedupTests(APITestCase):
+
+    def setUp(self):
+        redis = get_redis_connection("default")
+        redis.delete(METRICS_KEY, *redis.keys(f"{DEDUP_KEY_PREFIX}:*"))
+        building = Building.objects.create(address="ул. Тестовая 30")
+        self.containers = [
+            Container.objects.create(
+                kind=Container.ECOBOX,
+                building=building,
+                floor=1,
+                status=Container.ACTIVE
+            ) for _ in range(2)
+        ]
+
+    def report(self, container: Container, user_agent: str = "phone"):
+        return self.client.post(
+            "/api/full-container-reports",
+            {"container": container.pk},
+            HTTP_USER_AGENT=user_agent
+        )
+
+    def test_repeated_reports_dropped(self):
+        with mock.patch.object(container_add_report, "delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            resp = self.report(self.containers[0])
+            time_condition_days = resp.data["time_condition_days"]
+
+            # Повтор отсеивается без обращения к БД:
+            # контейнер и условия для сбора из кэша
+            with self.assertNumQueries(0):
+                resp = self.report(self.containers[0])
+            self.assertEqual(resp.status_code, 201)
+            self.assertTrue(resp.data["duplicate"])
+            self.assertEqual(resp.data["time_condition_days"],
+                             time_condition_days)
+
+            # Другой контейнер или другой отправитель - новое сообщение
+            self.report(self.containers[1])
+            self.report(self.containers[0], user_agent="other phone")
+
+        self.assertEqual(delay.call_count, 3)
+        self.assertEqual(dropped_reports_count(), 1)
+
+    def test_invalid_container_id(self):
+        resp = self.client.post("/api/full-container-reports",
+                                {"container": "abc"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(dropped_reports_count(), 0)
+
+    def test_inactive_container_not_deduplicated(self):
+        # Через save, чтобы сбросить закэшированный контейнер
+        self.containers[0].status = Container.INACTIVE
+        self.containers[0].save(update_fields=["status"])
+        for _ in range(2):
+            # DRF откатывает транзакцию при ошибке, а view работает вне
+            # транзакции запроса, поэтому откатывается только atomic теста
+            with transaction.atomic():
+                resp = self.report(self.containers[0])
+            self.assertEqual(resp.status_code, 400)
+        self.assertEqual(dropped_reports_count(), 0)
+
+
+@override_settings(FULLNESS_REPORT_DEDUP_WINDOW=60)
+class ReportDedupRedisDownTests(APITestCase):
+
+    def test_reports_accepted_without_redis(self):
+        container = Container.objects.create(
+            kind=Container.ECOBOX,
+            building=Building.objects.create(address="ул. Тестовая 31"),
+            floor=1,
+            status=Container.ACTIVE
+        )
+        redis = mock.Mock()
+        redis.set.side_effect = RedisError
+        with mock.patch(
+            "rcs_back.containers_app.utils.report_dedup.get_redis_connection",
+            return_value=redis
+        ), mock.patch.object(container_add_report, "delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):
+                resp = self.client.post("/api/full-container-reports",
+                                        {"container": container.pk})
+                self.assertEqual(resp.status_code, 201)
+                self.assertNotIn("duplicate", resp.data)
+        self.assertEqual(delay.call_count, 2)
@@ -0,0 +1,102 @@
+from django.test import TestCase
+
+from rcs_back.containers_app.models import Container
+from rcs_back.containers_app.utils.takeout_conditions import (
+    EffectiveCondition,
+    resolve_condition,
+    resolve_conditions,
+)
+from rcs_back.takeouts_app.models import Building, BuildingPart, TakeoutCondition
+
+
+class TakeoutConditionResolverTests(TestCase):
+
+    def setUp(self):
+        self.building = Building.objects.create(address="ул. Тестовая 25")
+        self.building_part = BuildingPart.objects.create(
+            building=self.building,
+            num=1
+        )
+        self.other_building = Building.objects.create(address="ул. Тестовая 30")
+        self.building_condition = TakeoutCondition.objects.get(
+            building=self.building
+        )
+        self.building_condition.office_days = 2
+        self.building_condition.public_days = 1
+        self.building_condition.ignore_reports = 3
+        self.building_condition.save()
+        self.bpart_condition = TakeoutCondition.objects.get(
+            building_part=self.building_part
+        )
+        self.bpart_condition.public_days = 5
+        self.bpart_condition.save()
+
+    def test_effective_condition(self):
+        self.assertEqual(resolve_condition(self.building.pk),
+                         EffectiveCondition(2, 1, 3))
+        # Не заданные у корпуса значения берутся у здания
+        self.assertEqual(
+            resolve_condition(self.building.pk, self.building_part.pk),
+            EffectiveCondition(2, 5, 3)
+        )
+        self.assertEqual(resolve_condition(self.other_building.pk),
+                         EffectiveCondition(0, 0, 0))
+
+    def test_bulk_and_cached(self):
+        keys = [
+            (self.building.pk, None),
+            (self.building.pk, self.building_part.pk),
+            (self.other_building.pk, None),
+        ]
+        with self.assertNumQueries(1):
+            conditions = resolve_conditions(keys)
+        self.assertEqual(conditions[keys[1]].public_days, 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_conditions(keys), conditions)
+
+    def test_invalidated_on_change(self):
+        resolve_condition(self.building.pk, self.building_part.pk)
+        self.bpart_condition.public_days = 7
+        self.bpart_condition.save()
+        self.assertEqual(
+            resolve_condition(self.building.pk, self.building_part.pk),
+            EffectiveCondition(2, 7, 3)
+        )
+
+        self.building_part.delete()
+        self.assertEqual(
+            resolve_condition(self.building.pk, self.building_part.pk),
+            EffectiveCondition(2, 1, 3)
+        )
+
+    def test_container_conditions(self):
+        public = Container.objects.create(
+            kind=Container.PUBLIC_ECOBOX,
+            building=self.building,
+            building_part=self.building_part,
+            floor=1
+        )
+        office = Container.objects.create(
+            kind=Container.ECOBOX,
+            building=self.building,
+            floor=1
+        )
+        resolve_condition(self.building.pk)
+        public = Container.objects.get(pk=public.pk)
+        office = Container.objects.get(pk=office.pk)
+        # Условия уже закэшированы
+        with self.assertNumQueries(0):
+            self.assertEqual(public.get_time_condition_days(), 5)
+            self.assertEqual(public.ignore_reports_count(), 3)
+            self.assertEqual(office.get_time_condition_days(), 2)
+            self.assertEqual(office.ignore_reports_count(), 0)
+
+        containers = list(Container.objects.all())
+        with self.assertNumQueries(0):
+            Container.prefetch_conditions(containers)
+        for container in containers:
+            self.assertEqual(
+                container.get_time_condition_days(),
+                public.get_time_condition_days()
+                if container.pk == public.pk else 2
+            )
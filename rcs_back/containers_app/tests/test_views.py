@@ -0,0 +1,238 @@
+import base64
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from rcs_back.containers_app.models import Container
+from rcs_back.containers_app.tasks import building_check_conditions, container_add_report
+from rcs_back.takeouts_app.models import Building, BuildingPart
+from rcs_back.users_app.models import User
+
+
+class FullContainerReportViewTests(APITestCase):
+
+    def setUp(self):
+        self.building = Building.objects.create(
+            address="ул. Тестовая 30"
+        )
+        self.container = Container.objects.create(
+            kind=Container.ECOBOX,
+            building=self.building,
+            floor=1,
+            status=Container.ACTIVE
+        )
+
+    def test_report_dispatched_on_commit(self):
+        with mock.patch.object(container_add_report, "delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                resp = self.client.post(
+                    "/api/full-container-reports",
+                    {"container": self.container.pk}
+                )
+                # До коммита задача не должна попасть в очередь
+                delay.assert_not_called()
+
+            self.assertEqual(resp.status_code, 201)
+            self.assertEqual(len(callbacks), 1)
+            delay.assert_called_once_with(self.container.pk, False)
+
+
+class ContainerListViewTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="eco@example.com", password="password"
+        )
+        self.client.force_authenticate(self.user)
+        self.building = Building.objects.create(
+            address="ул. Тестовая 30"
+        )
+        self.building_part = BuildingPart.objects.create(
+            building=self.building,
+            num=1
+        )
+
+    def add_containers(self, count: int) -> None:
+        """Добавляет контейнеры всех видов, часть из них полные"""
+        for i in range(count):
+            container = Container.objects.create(
+                kind=Container.KIND_CHOICES[i % 3][0],
+                building=self.building,
+                building_part=self.building_part if i % 2 else None,
+                floor=1,
+                status=Container.ACTIVE
+            )
+            if i % 3:
+                container.add_report(by_staff=bool(i % 4))
+
+    def list_query_count(self) -> int:
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/api/containers")
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_depend_on_rows(self):
+        self.add_containers(3)
+        few = self.list_query_count()
+        self.add_containers(30)
+        many = self.list_query_count()
+        self.assertEqual(few, many)
+
+    def test_detail_query_count(self):
+        self.add_containers(3)
+        container = Container.objects.filter(kind=Container.PUBLIC_ECOBOX).first()
+        # SAVEPOINT (ATOMIC_REQUESTS), SELECT, RELEASE SAVEPOINT
+        with self.assertNumQueries(3):
+            resp = self.client.get(f"/api/containers/{container.pk}")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["is_full"], container.is_full())
+
+    def pages(self, url: str) -> list:
+        """Обходит все страницы списка, проверяя число запросов"""
+        ids = []
+        query_counts = set()
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            query_counts.add(len(ctx.captured_queries))
+            ids += [c["id"] for c in resp.data["results"]]
+            url = resp.data["next"]
+        # Каждая страница - одинаковое число запросов
+        self.assertEqual(len(query_counts), 1)
+        return ids
+
+    def test_keyset_pages(self):
+        self.add_containers(11)
+        for sort in ["building_part", "is_full", "floor", "description"]:
+            for order in ["asc", "desc"]:
+                with self.subTest(sort=sort, order=order):
+                    url = (f"/api/containers?sort_by={sort}"
+                           f"&order_by={order}")
+                    full_list = [c["id"] for c in self.client.get(url).data]
+                    ids = self.pages(f"{url}&page_size=3")
+                    self.assertCountEqual(ids, full_list)
+                    self.assertEqual(len(ids), len(set(ids)))
+                    # Порядок: поле сортировки (пустые в конце), затем id
+                    field = "_is_full" if sort == "is_full" else sort
+                    values = dict(Container.objects.values_list("pk", field))
+                    keys = [(values[pk] is None, values[pk] or 0, pk)
+                            for pk in ids]
+                    self.assertEqual(keys, sorted(keys, reverse=order == "desc"))
+
+    def test_invalid_cursor(self):
+        resp = self.client.get("/api/containers?cursor=abc")
+        self.assertEqual(resp.status_code, 404)
+
+    def test_forged_cursor_value(self):
+        self.add_containers(1)
+        for sort, value in [("floor", '{"a": 1}'), ("floor", '"abc"'),
+                            ("is_full", "[1]"), ("building_part", "\"x\"")]:
+            with self.subTest(sort=sort, value=value):
+                cursor = base64.urlsafe_b64encode(
+                    f"[{value}, 1]".encode()
+                ).decode()
+                # Ошибка откатывает только atomic подтеста
+                with transaction.atomic():
+                    resp = self.client.get(
+                        f"/api/containers?sort_by={sort}&cursor={cursor}"
+                    )
+                self.assertEqual(resp.status_code, 404)
+
+
+class BulkFullContainerReportViewTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="eco@example.com", password="password"
+        )
+        self.client.force_authenticate(self.user)
+        self.buildings = [
+            Building.objects.create(address=f"ул. Тестовая {i}")
+            for i in range(2)
+        ]
+
+    def add_containers(self, count: int) -> list:
+        """Добавляет контейнеры всех видов, у части уже есть сообщения"""
+        containers = []
+        for i in range(count):
+            container = Container.objects.create(
+                kind=Container.KIND_CHOICES[i % 3][0],
+                building=self.buildings[i % 2],
+                floor=1,
+                status=Container.ACTIVE
+            )
+            if i % 4 == 1:
+                container.add_report()
+            containers.append(container)
+        return containers
+
+    def post(self, containers: list):
+        with mock.patch.object(building_check_conditions, "delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.post(
+                    "/api/full-container-reports/bulk",
+                    {"containers": [c.pk for c in containers]},
+                    format="json"
+                )
+        return resp, delay
+
+    def test_same_as_single_reports(self):
+        containers = self.add_containers(8)
+        expected = self.add_containers(8)
+        for container in expected:
+            container.add_report(True)
+
+        resp, delay = self.post(containers + containers[:1])
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data["containers"],
+                         sorted(c.pk for c in containers))
+        # Уже полные до запроса контейнеры не считаются
+        self.assertEqual(
+            resp.data["full_containers"],
+            sorted(c.pk for c in containers if not c._is_full)
+        )
+        # Одна проверка условий на здание
+        self.assertEqual(
+            sorted(call.args[0] for call in delay.call_args_list),
+            sorted(b.pk for b in self.buildings)
+        )
+
+        for container, expected_container in zip(containers, expected):
+            container.refresh_from_db()
+            expected_container.refresh_from_db()
+            report = container.open_report
+            expected_report = expected_container.open_report
+            self.assertEqual(report.count, expected_report.count)
+            self.assertEqual(report.by_staff, expected_report.by_staff)
+            self.assertIsNotNone(report.filled_at)
+            self.assertEqual(container.open_report_count,
+                             expected_container.open_report_count)
+            self.assertEqual(container.is_full(), expected_container.is_full())
+            self.assertEqual(container.fill_time_count,
+                             expected_container.fill_time_count)
+            self.assertEqual(container.avg_fill_time,
+                             container.calc_avg_fill_time())
+
+    def test_query_count_does_not_depend_on_containers(self):
+        few = self.add_containers(4)
+        many = self.add_containers(40)
+        with CaptureQueriesContext(connection) as few_ctx:
+            self.post(few)
+        with CaptureQueriesContext(connection) as many_ctx:
+            self.post(many)
+        self.assertEqual(len(few_ctx.captured_queries),
+                         len(many_ctx.captured_queries))
+
+    def test_unknown_containers(self):
+        containers = self.add_containers(2)
+        Container.objects.filter(pk=containers[1].pk).update(
+            status=Container.WAITING
+        )
+        resp, _ = self.post(containers)
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn(str(containers[1].pk), str(resp.data["containers"]))
+        containers[0].refresh_from_db()
+        self.assertIsNone(containers[0].open_report)
@@ -0,0 +1,52 @@
+from django.db import transaction
+
+
+def backfill_container_state(Container, FullContainerReport,
+                             batch_size: int = 1000) -> int:
+    """Заполняет текущее состояние контейнеров (open_report,
+    filled_at, emptied_at, open_report_count) по истории
+    FullContainerReport. Модели передаются параметрами, чтобы
+    использовать и в миграции. Возвращает кол-во контейнеров"""
+    state = {}
+    # Отчёты идут от старых к новым, поэтому
+    # для каждого контейнера в конце останется самый новый
+    reports = FullContainerReport.objects.order_by(
+        "container_id", "reported_full_at", "pk"
+    ).values_list(
+        "pk", "container_id", "count", "filled_at", "emptied_at"
+    )
+    for pk, container_id, count, filled_at, emptied_at in reports.iterator():
+        container_state = state.setdefault(container_id, {
+            "emptied_at": None
+        })
+        if emptied_at:
+            container_state["open_report"] = None
+            container_state["emptied_at"] = max(
+                emptied_at,
+                container_state["emptied_at"] or emptied_at
+            )
+        else:
+            container_state["open_report"] = (pk, count, filled_at)
+
+    containers = []
+    for container in Container.objects.only("pk").iterator():
+        container_state = state.get(container.pk, {})
+        open_report = container_state.get("open_report")
+        if open_report:
+            container.open_report_id = open_report[0]
+            container.open_report_count = open_report[1]
+            container.filled_at = open_report[2]
+        else:
+            container.open_report_id = None
+            container.open_report_count = 0
+            container.filled_at = None
+        container.emptied_at = container_state.get("emptied_at")
+        containers.append(container)
+
+    with transaction.atomic():
+        Container.objects.bulk_update(
+            containers,
+            ["open_report", "open_report_count", "filled_at", "emptied_at"],
+            batch_size=batch_size
+        )
+    return len(containers)
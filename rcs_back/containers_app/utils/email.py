@@ -1,6 +1,7 @@
 from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 
+from rcs_back.utils.mail import send_email
 from rcs_back.utils.model import get_eco_emails
 
 
@@ -21,4 +22,4 @@ def send_public_feedback(email: str, msg: str, container_id: int = 0) -> None:
         get_eco_emails()
     )
     email.content_subtype = "html"
-    email.send()
+    send_email(email)
@@ -0,0 +1,95 @@
+from typing import Dict, Tuple
+
+from django_redis import get_redis_connection
+
+# Накопленные сообщения о заполненности:
+# hash "<id контейнера>:<by_staff>" -> кол-во сообщений
+PENDING_KEY = "full-container-reports:pending"
+# Сообщения, которые сейчас записываются в БД. Удаляются только
+# после записи, поэтому при ошибке запишутся при следующем запуске
+FLUSHING_KEY = "full-container-reports:flushing"
+FLUSH_LOCK_KEY = "full-container-reports:flush-lock"
+FLUSH_LOCK_TIMEOUT = 5 * 60
+# Кол-во неудачных попыток записать FLUSHING_KEY
+FLUSH_ATTEMPTS_KEY = "full-container-reports:flush-attempts"
+MAX_FLUSH_ATTEMPTS = 5
+# Сообщения, которые не удалось записать за MAX_FLUSH_ATTEMPTS.
+# Откладываются, чтобы не задерживать новые сообщения, и возвращаются
+# в очередь командой requeue_failed_reports после устранения ошибки
+FAILED_KEY = "full-container-reports:failed"
+
+# {(id контейнера, by_staff): кол-во сообщений}
+BufferedReports = Dict[Tuple[int, bool], int]
+
+
+def buffer_report(container_id: int, by_staff: bool) -> None:
+    """Запоминает сообщение о заполненности в Redis
+    (одна команда HINCRBY). Если Redis недоступен - RedisError"""
+    get_redis_connection("default").hincrby(
+        PENDING_KEY, f"{container_id}:{int(by_staff)}", 1
+    )
+
+
+def take_buffered_reports() -> BufferedReports:
+    """Забирает накопленные сообщения для записи в БД.
+    Новые сообщения в это время копятся отдельно"""
+    redis = get_redis_connection("default")
+    if not redis.exists(FLUSHING_KEY):
+        if not redis.exists(PENDING_KEY):
+            return {}
+        # RENAME атомарен: каждое сообщение попадёт ровно в одну запись
+        redis.rename(PENDING_KEY, FLUSHING_KEY)
+    return _read_reports(redis, FLUSHING_KEY)
+
+
+def _read_reports(redis, key: str) -> BufferedReports:
+    reports = {}
+    for field, count in redis.hgetall(key).items():
+        container_id, by_staff = field.decode().split(":")
+        reports[(int(container_id), by_staff == "1")] = int(count)
+    return reports
+
+
+def clear_flushed_reports() -> None:
+    """Удаляет сообщения, записанные в БД"""
+    get_redis_connection("default").delete(FLUSHING_KEY, FLUSH_ATTEMPTS_KEY)
+
+
+def record_flush_failure(reports: BufferedReports) -> int:
+    """Учитывает неудачную запись сообщений и возвращает кол-во
+    попыток. После MAX_FLUSH_ATTEMPTS сообщения переносятся
+    в FAILED_KEY, и следующая запись начнётся с новых"""
+    redis = get_redis_connection("default")
+    attempts = redis.incr(FLUSH_ATTEMPTS_KEY)
+    if attempts >= MAX_FLUSH_ATTEMPTS:
+        pipeline = redis.pipeline()
+        for (container_id, by_staff), count in reports.items():
+            pipeline.hincrby(FAILED_KEY, f"{container_id}:{int(by_staff)}",
+                             count)
+        pipeline.delete(FLUSHING_KEY, FLUSH_ATTEMPTS_KEY)
+        pipeline.execute()
+    return attempts
+
+
+def requeue_failed_reports() -> BufferedReports:
+    """Возвращает сообщения из FAILED_KEY к новым, чтобы их записал
+    следующий запуск flush_buffered_reports. Вызывается под flush_lock,
+    иначе запись может отложить новую партию во время переноса.
+    Возвращает перенесённые сообщения"""
+    redis = get_redis_connection("default")
+    reports = _read_reports(redis, FAILED_KEY)
+    if reports:
+        pipeline = redis.pipeline()
+        for (container_id, by_staff), count in reports.items():
+            pipeline.hincrby(PENDING_KEY, f"{container_id}:{int(by_staff)}",
+                             count)
+        pipeline.delete(FAILED_KEY)
+        pipeline.execute()
+    return reports
+
+
+def flush_lock():
+    """Блокировка, чтобы сообщения записывала одна задача за раз"""
+    return get_redis_connection("default").lock(
+        FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT
+    )
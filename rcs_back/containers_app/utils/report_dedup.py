@@ -0,0 +1,47 @@
+import hashlib
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework.request import Request
+from rest_framework.throttling import BaseThrottle
+
+DEDUP_KEY_PREFIX = "full-container-reports:dedup"
+# Счётчики сообщений о заполненности для метрик
+METRICS_KEY = "full-container-reports:metrics"
+
+
+def client_fingerprint(request: Request) -> str:
+    """Отпечаток отправителя сообщения: пользователь,
+    а для анонимных - IP (с учётом прокси) и User-Agent"""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    ident = BaseThrottle().get_ident(request)
+    user_agent = request.META.get("HTTP_USER_AGENT", "")
+    return hashlib.sha1(f"{ident}|{user_agent}".encode()).hexdigest()
+
+
+def is_duplicate_report(container_id: int, fingerprint: str) -> bool:
+    """Было ли сообщение о заполненности этого контейнера
+    от того же отправителя в течение FULLNESS_REPORT_DEDUP_WINDOW секунд.
+    Отброшенные сообщения учитываются в метриках.
+    Если Redis недоступен, сообщение принимается"""
+    redis = get_redis_connection("default")
+    try:
+        is_first = redis.set(
+            f"{DEDUP_KEY_PREFIX}:{container_id}:{fingerprint}", 1,
+            nx=True, ex=settings.FULLNESS_REPORT_DEDUP_WINDOW
+        )
+        if is_first:
+            return False
+        redis.hincrby(METRICS_KEY, "dropped", 1)
+    except RedisError:
+        return False
+    return True
+
+
+def dropped_reports_count() -> int:
+    """Сколько повторных сообщений было отброшено"""
+    return int(
+        get_redis_connection("default").hget(METRICS_KEY, "dropped") or 0
+    )
@@ -0,0 +1,113 @@
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from django.apps import apps
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from .takeout_conditions import resolve_condition
+
+# Активные контейнеры, принимающие сообщения о заполненности:
+# "<префикс>:<id контейнера>" -> "<id здания>:<id корпуса или 0>:<вид>"
+CACHE_KEY_PREFIX = "report-targets"
+CACHE_TIMEOUT = 60 * 60
+# Сколько секунд контейнер хранится в памяти процесса. Изменения
+# в других процессах (worker, другие копии django) видны не позже
+LOCAL_CACHE_TIMEOUT = 60
+
+# Вид общественного контейнера (Container.PUBLIC_ECOBOX)
+PUBLIC_ECOBOX = 2
+
+
+class ReportTarget(NamedTuple):
+    """Активный контейнер: всё, что нужно для приёма сообщения
+    о заполненности и ответа на него"""
+    container_id: int
+    building_id: int
+    building_part_id: Optional[int]
+    kind: int
+
+    def time_condition_days(self) -> int:
+        """Как Container.get_time_condition_days, по кэшу условий"""
+        condition = resolve_condition(self.building_id, self.building_part_id)
+        if self.kind == PUBLIC_ECOBOX:
+            return condition.public_days
+        return condition.office_days
+
+
+# {id контейнера: (время устаревания, контейнер)}
+_local_cache: Dict[int, Tuple[float, ReportTarget]] = {}
+# До какого момента не обращаться к Redis после ошибки
+_redis_retry_at = 0.0
+
+
+def _redis_failed() -> None:
+    global _redis_retry_at  # pylint: disable=global-statement
+    _redis_retry_at = time.monotonic() + LOCAL_CACHE_TIMEOUT
+
+
+def _cache_key(container_id: int) -> str:
+    return f"{CACHE_KEY_PREFIX}:{container_id}"
+
+
+def _load_target(container_id: int) -> Optional[ReportTarget]:
+    container_model = apps.get_model("containers_app", "Container")
+    row = container_model.objects.filter(
+        pk=container_id,
+        status=container_model.ACTIVE
+    ).values_list("building", "building_part", "kind").first()
+    if row is None:
+        return None
+    return ReportTarget(container_id, *row)
+
+
+def get_report_target(container_id: int) -> Optional[ReportTarget]:
+    """Активный контейнер: из памяти процесса, затем из Redis,
+    и только если его там нет - из БД. None - контейнера нет
+    или он не активен (не кэшируется)"""
+    now = time.monotonic()
+    cached = _local_cache.get(container_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    use_redis = _redis_retry_at <= now
+    target = None
+    if use_redis:
+        try:
+            value = get_redis_connection("default").get(_cache_key(container_id))
+        except RedisError:
+            _redis_failed()
+            use_redis = False
+        else:
+            if value:
+                building_id, part_id, kind = map(int, value.decode().split(":"))
+                target = ReportTarget(container_id, building_id,
+                                      part_id or None, kind)
+    if target is None:
+        target = _load_target(container_id)
+        if target is None:
+            return None
+        if use_redis:
+            try:
+                get_redis_connection("default").set(
+                    _cache_key(container_id),
+                    f"{target.building_id}:{target.building_part_id or 0}:"
+                    f"{target.kind}",
+                    ex=CACHE_TIMEOUT
+                )
+            except RedisError:
+                _redis_failed()
+
+    _local_cache[container_id] = (now + LOCAL_CACHE_TIMEOUT, target)
+    return target
+
+
+def invalidate_report_target(container_id: int) -> None:
+    """Сбрасывает закэшированный контейнер
+    (при изменении статуса, здания, корпуса или вида)"""
+    _local_cache.pop(container_id, None)
+    try:
+        get_redis_connection("default").delete(_cache_key(container_id))
+    except RedisError:
+        # Закэшированное в Redis устареет через CACHE_TIMEOUT
+        _redis_failed()
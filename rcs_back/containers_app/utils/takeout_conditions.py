@@ -0,0 +1,184 @@
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from django.apps import apps
+from django.db.models import Q
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+# Действующие условия для сбора здания:
+# hash "<id корпуса или 0 для здания>" -> "office_days:public_days:ignore_reports"
+CACHE_KEY_PREFIX = "takeout-conditions"
+CACHE_TIMEOUT = 60 * 60
+# Сколько секунд условия хранятся в памяти процесса. Изменения
+# в других процессах (worker, другие копии django) видны не позже
+LOCAL_CACHE_TIMEOUT = 60
+
+
+class EffectiveCondition(NamedTuple):
+    """Условия для сбора, действующие для контейнеров корпуса
+    (или здания): значения корпуса, если заданы (не 0), иначе здания"""
+    office_days: int = 0
+    public_days: int = 0
+    ignore_reports: int = 0
+
+
+# (id здания, id корпуса или None)
+ConditionKey = Tuple[int, Optional[int]]
+# {id корпуса или 0: условия}
+BuildingConditions = Dict[int, EffectiveCondition]
+
+# {id здания: (время устаревания, условия)}
+_local_cache: Dict[int, Tuple[float, BuildingConditions]] = {}
+# До какого момента не обращаться к Redis после ошибки,
+# чтобы не ждать соединения при каждом запросе условий
+_redis_retry_at = 0.0
+
+
+def _redis_failed() -> None:
+    global _redis_retry_at  # pylint: disable=global-statement
+    _redis_retry_at = time.monotonic() + LOCAL_CACHE_TIMEOUT
+
+
+def _cache_key(building_id: int) -> str:
+    return f"{CACHE_KEY_PREFIX}:{building_id}"
+
+
+def _load_conditions(building_ids: Iterable[int]) -> Dict[int, BuildingConditions]:
+    """Считает действующие условия зданий и их корпусов
+    одним запросом к БД"""
+    takeout_condition = apps.get_model("takeouts_app", "TakeoutCondition")
+    rows = takeout_condition.objects.filter(
+        Q(building__in=building_ids) |
+        Q(building_part__building__in=building_ids)
+    ).values_list(
+        "building", "building_part", "building_part__building",
+        "office_days", "public_days", "ignore_reports"
+    )
+    own = {}
+    parts = []
+    for building_id, part_id, part_building_id, *values in rows:
+        if part_id is None:
+            own[building_id] = values
+        else:
+            parts.append((part_building_id, part_id, values))
+
+    conditions = {
+        building_id: {0: EffectiveCondition(
+            *[value or 0 for value in own.get(building_id, ())]
+        )}
+        for building_id in building_ids
+    }
+    for building_id, part_id, values in parts:
+        building = conditions[building_id][0]
+        conditions[building_id][part_id] = EffectiveCondition(*[
+            value or default for value, default in zip(values, building)
+        ])
+    return conditions
+
+
+def _get_cached(building_ids: Iterable[int]) -> Dict[int, BuildingConditions]:
+    """Условия зданий из Redis (одним pipeline)"""
+    building_ids = list(building_ids)
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for building_id in building_ids:
+        pipe.hgetall(_cache_key(building_id))
+    conditions = {}
+    for building_id, cached in zip(building_ids, pipe.execute()):
+        if cached:
+            conditions[building_id] = {
+                int(part_id): EffectiveCondition(
+                    *map(int, values.decode().split(":"))
+                )
+                for part_id, values in cached.items()
+            }
+    return conditions
+
+
+def _set_cached(conditions: Dict[int, BuildingConditions]) -> None:
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for building_id, building_conditions in conditions.items():
+        key = _cache_key(building_id)
+        pipe.delete(key)
+        pipe.hset(key, mapping={
+            part_id: ":".join(map(str, condition))
+            for part_id, condition in building_conditions.items()
+        })
+        pipe.expire(key, CACHE_TIMEOUT)
+    pipe.execute()
+
+
+def get_building_conditions(
+        building_ids: Iterable[int]) -> Dict[int, BuildingConditions]:
+    """Действующие условия зданий и их корпусов: из памяти процесса,
+    затем из Redis, и только для оставшихся зданий - из БД.
+    Если Redis недоступен, условия считаются из БД"""
+    now = time.monotonic()
+    conditions = {}
+    missing = set()
+    for building_id in set(building_ids):
+        cached = _local_cache.get(building_id)
+        if cached and cached[0] > now:
+            conditions[building_id] = cached[1]
+        else:
+            missing.add(building_id)
+    if not missing:
+        return conditions
+
+    use_redis = _redis_retry_at <= now
+    from_redis = {}
+    if use_redis:
+        try:
+            from_redis = _get_cached(missing)
+        except RedisError:
+            _redis_failed()
+            use_redis = False
+    missing -= from_redis.keys()
+    if missing:
+        from_db = _load_conditions(missing)
+        if use_redis:
+            try:
+                _set_cached(from_db)
+            except RedisError:
+                _redis_failed()
+        from_redis.update(from_db)
+
+    for building_id, building_conditions in from_redis.items():
+        _local_cache[building_id] = (now + LOCAL_CACHE_TIMEOUT,
+                                     building_conditions)
+    conditions.update(from_redis)
+    return conditions
+
+
+def resolve_conditions(
+        keys: Iterable[ConditionKey]) -> Dict[ConditionKey, EffectiveCondition]:
+    """Действующие условия для нескольких пар (здание, корпус)"""
+    keys = set(keys)
+    conditions = get_building_conditions(
+        building_id for building_id, _ in keys
+    )
+    return {
+        (building_id, part_id): conditions[building_id].get(
+            part_id or 0, conditions[building_id][0]
+        )
+        for building_id, part_id in keys
+    }
+
+
+def resolve_condition(building_id: int,
+                      building_part_id: Optional[int] = None) -> EffectiveCondition:
+    """Действующие условия для контейнеров корпуса (или здания)"""
+    return resolve_conditions([(building_id, building_part_id)])[
+        (building_id, building_part_id)
+    ]
+
+
+def invalidate_conditions(building_id: int) -> None:
+    """Сбрасывает закэшированные условия здания
+    (при изменении условий здания или одного из корпусов)"""
+    _local_cache.pop(building_id, None)
+    try:
+        get_redis_connection("default").delete(_cache_key(building_id))
+    except RedisError:
+        # Закэшированное в Redis устареет через CACHE_TIMEOUT
+        _redis_failed()
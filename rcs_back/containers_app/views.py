@@ -1,23 +1,28 @@
 from tempfile import NamedTemporaryFile
-from typing import Union
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework.parsers import MultiPartParser
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from django.http.response import HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from rest_framework import generics, permissions, status, views
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from redis.exceptions import RedisError
 import os
 from rcs_back.containers_app.models import Building, BuildingPart, Container, EmailToken
 from rcs_back.utils.mixins import UpdateThenRetrieveModelMixin
+from rcs_back.utils.pagination import KeysetPagination
+from rcs_back.utils.transaction import delay_on_commit
 from rcs_back.users_app.models import User
 from rest_framework.permissions import IsAuthenticated
 
 from .serializers import (
     AsignUsersToBuildingsSerializer,
     BuildingPartSerializer,
+    BulkFullContainerReportSerializer,
     BuildingSerializer,
     ChangeContainerSerializer,
     ContainerPublicAddSerializer,
@@ -31,56 +36,98 @@ from .serializers import (
     UserSerializer,
 )
 from .tasks import (
+    building_check_conditions,
     container_add_report,
     container_correct_fullness,
     public_container_add_notify,
 )
 from .utils.email import send_public_feedback
+from .utils.report_buffer import buffer_report
+from .utils.report_dedup import client_fingerprint, is_duplicate_report
+from .utils.report_targets import ReportTarget
 from .utils.qr import generate_sticker
 
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class FullContainerReportView(generics.CreateAPIView):
-    """View для заполнения контейнера"""
+    """View для заполнения контейнера.
+    Сам view ничего не пишет в БД, поэтому транзакция на запрос не нужна.
+    При FULLNESS_REPORTS_BUFFERED сообщение только считается в Redis,
+    в БД его записывает периодическая задача flush_buffered_reports"""
     permission_classes = [permissions.AllowAny]
     serializer_class = FullContainerReportSerializer
 
-    def perform_create(self, serializer) -> Union[Container, None]:
-        if "container" in serializer.validated_data:
-            container = serializer.validated_data["container"]
-            by_staff = self.request.user.is_authenticated
-            #  Фиксируем сообщение о заполненности и
-            #  проверяем полноту контейнера
-            container_add_report.delay(container.pk, by_staff)
-            return container
-        return None
+    def perform_create(self, serializer) -> None:
+        target: ReportTarget = serializer.validated_data["container"]
+        by_staff = self.request.user.is_authenticated
+        if settings.FULLNESS_REPORTS_BUFFERED:
+            try:
+                buffer_report(target.container_id, by_staff)
+                return
+            except RedisError:
+                # Буфер недоступен - записываем сообщение задачей
+                pass
+        #  Фиксируем сообщение о заполненности и
+        #  проверяем полноту контейнера после коммита запроса
+        delay_on_commit(container_add_report, target.container_id, by_staff)
 
     def create(self, request, *args, **kwargs):
         """Изменённый create для того чтобы возвращать кол-во
-        дней, через которое опустошат контейнер"""
+        дней, через которое опустошат контейнер.
+        Контейнер и условия для сбора берутся из кэша, поэтому
+        повторные (FULLNESS_REPORT_DEDUP_WINDOW) и буферизованные
+        сообщения обычно не обращаются к БД"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        container: Container = self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.data)
-        resp = {}
-        if container:
-            resp[
-                "time_condition_days"
-            ] = container.get_time_condition_days() + 1
-        return Response(resp,
-                        status=status.HTTP_201_CREATED,
-                        headers=headers)
+        target: ReportTarget = serializer.validated_data["container"]
+        resp = {
+            "time_condition_days": target.time_condition_days() + 1
+        }
+        if settings.FULLNESS_REPORT_DEDUP_WINDOW and is_duplicate_report(
+            target.container_id, client_fingerprint(request)
+        ):
+            resp["duplicate"] = True
+        else:
+            self.perform_create(serializer)
+        return Response(resp, status=status.HTTP_201_CREATED)
+
+
+class BulkFullContainerReportView(views.APIView):
+    """View для заполнения сразу нескольких контейнеров
+    (сотрудник обходит этажи и отмечает полные контейнеры)"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkFullContainerReportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        container_ids = serializer.validated_data["containers"]
+        full_containers = Container.add_reports(container_ids, by_staff=True)
+        # Условия на сбор проверяются один раз на здание
+        for building_id in {c.building_id for c in full_containers}:
+            delay_on_commit(building_check_conditions, building_id)
+        return Response({
+            "containers": container_ids,
+            "full_containers": sorted(c.pk for c in full_containers),
+        }, status=status.HTTP_201_CREATED)
 
 
 class ContainerDetailView(UpdateThenRetrieveModelMixin,
                           generics.RetrieveUpdateDestroyAPIView):
     """ View для CRUD-операций с контейнерами """
-    queryset = Container.objects.filter(
-        ~Q(status=Container.RESERVED)
-    )
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     retrieve_serializer = ContainerSerializer
     update_serializer = ChangeContainerSerializer
 
+    def get_queryset(self):
+        queryset = Container.objects.filter(
+            ~Q(status=Container.RESERVED)
+        )
+        if self.request.method == "GET":
+            # При изменении здания/корпуса аннотации устареют,
+            # поэтому подгружаем их только для чтения
+            queryset = queryset.with_current_state()
+        return queryset
+
     def get_serializer_class(self):
         if self.request.method == "GET":
             return self.retrieve_serializer
@@ -92,6 +139,8 @@ class ContainerListView(generics.ListAPIView):
     """ View для CRUD-операций с контейнерами """
 
     serializer_class = ContainerSerializer
+    # Постранично - с параметром page_size или cursor
+    pagination_class = KeysetPagination
 
     filterset_fields = [
         "building",
@@ -113,7 +162,7 @@ class ContainerListView(generics.ListAPIView):
         """Сортировка"""
         queryset = Container.objects.filter(
             ~Q(status=Container.RESERVED)
-        )
+        ).with_current_state()
         if (
             self.request.user.is_authenticated
             and
@@ -126,7 +175,7 @@ class ContainerListView(generics.ListAPIView):
         if "is_full" in self.request.query_params:
             is_full_param = self.request.query_params.get("is_full")
             is_full = not is_full_param == "false"
-            queryset = Container.objects.filter(
+            queryset = queryset.filter(
                 _is_full=is_full
             )
 
@@ -152,7 +201,7 @@ class ContainerListView(generics.ListAPIView):
 class BuildingListView(generics.ListAPIView):
     """Списко зданий (для опций при создании контейнера)"""
     serializer_class = BuildingSerializer
-    queryset = Building.objects.all()
+    queryset = Building.objects.prefetch_related("building_parts")
     permission_classes = [permissions.AllowAny]
 
 
@@ -161,7 +210,7 @@ class BuildingListPagiView(generics.ListAPIView):
     class SmallPagesPagination(PageNumberPagination):  
         page_size = 15
     serializer_class = BuildingSerializer
-    queryset = Building.objects.all()
+    queryset = Building.objects.prefetch_related("building_parts")
     permission_classes = [permissions.AllowAny]
     pagination_class = SmallPagesPagination
 
@@ -357,7 +406,7 @@ class ContainerPublicAddView(generics.CreateAPIView):
             container.building_part = container.detect_building_part()
             container.save()
 
-        public_container_add_notify.delay(container.pk)
+        delay_on_commit(public_container_add_notify, container.pk)
 
 
 class PublicFeedbackView(views.APIView):
@@ -398,7 +447,7 @@ class EmptyContainerView(views.APIView):
                 pk=self.kwargs["pk"]
             ).first()
             if container:
-                container_correct_fullness.delay(container.pk)
+                delay_on_commit(container_correct_fullness, container.pk)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -505,7 +554,8 @@ class ContainerCountView(views.APIView):
     def get(self, request, *args, **kwargs):
         resp = []
         building: Building
-        for building in Building.objects.all():
+        for building in Building.objects.with_container_count(
+        ).with_tank_takeout_stats():
             building_dict = {}
             building_dict["id"] = building.pk
             building_dict["building"] = building.street_name()
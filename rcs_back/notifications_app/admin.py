@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .models import OutboxEmail
+
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = [
+        "__str__",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "sent_at",
+    ]
+    list_filter = ["status"]
+
+
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class NotificationsAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'rcs_back.notifications_app'
+    verbose_name = "Оповещения"
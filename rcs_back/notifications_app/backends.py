@@ -0,0 +1,23 @@
+from django.core.mail.backends.base import BaseEmailBackend
+
+from rcs_back.utils.transaction import delay_on_commit
+
+from .models import OutboxEmail
+from .serialization import email_to_dict
+from .tasks import send_outbox_emails
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """Почтовый бэкенд, который не отправляет письма, а записывает
+    их в очередь (OutboxEmail) в текущей транзакции. Если транзакция
+    откатится, писем не будет; ответ на запрос не ждёт почтовый сервер"""
+
+    def send_messages(self, email_messages) -> int:
+        if not email_messages:
+            return 0
+        OutboxEmail.objects.bulk_create([
+            OutboxEmail(message=email_to_dict(message))
+            for message in email_messages
+        ])
+        delay_on_commit(send_outbox_emails)
+        return len(email_messages)
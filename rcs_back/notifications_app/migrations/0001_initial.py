@@ -0,0 +1,40 @@
+# Generated by Django 3.2.5 on 2026-10-18 10:17
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.JSONField(verbose_name='письмо')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'ожидает отправки'), (2, 'отправлено'), (3, 'не удалось отправить')], default=1, verbose_name='состояние')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попыток отправки')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='время следующей попытки')),
+                ('last_error', models.TextField(blank=True, verbose_name='последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='время создания')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='время отправки')),
+            ],
+            options={
+                'verbose_name': 'письмо в очереди',
+                'verbose_name_plural': 'очередь писем',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxemail',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['next_attempt_at'], name='outbox_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxemail',
+            index=models.Index(fields=['sent_at'], name='outbox_sent_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEmail(models.Model):
+    """Письмо в очереди на отправку. Записывается в той же
+    транзакции, что и изменения, о которых оповещает,
+    отправляется воркером (send_outbox_emails)"""
+
+    # Варианты статуса
+    PENDING = 1
+    SENT = 2
+    FAILED = 3
+    STATUS_CHOICES = (
+        (PENDING, "ожидает отправки"),
+        (SENT, "отправлено"),
+        (FAILED, "не удалось отправить"),
+    )
+
+    message = models.JSONField(
+        verbose_name="письмо"
+    )
+
+    status = models.PositiveSmallIntegerField(
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name="состояние"
+    )
+
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="попыток отправки"
+    )
+
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="время следующей попытки"
+    )
+
+    last_error = models.TextField(
+        blank=True,
+        verbose_name="последняя ошибка"
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="время создания"
+    )
+
+    sent_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="время отправки"
+    )
+
+    def __str__(self) -> str:
+        return (f"{self.message.get('subject', '')} "
+                f"({', '.join(self.message.get('to', []))})")
+
+    class Meta:
+        verbose_name = "письмо в очереди"
+        verbose_name_plural = "очередь писем"
+        indexes = [
+            # Выбор писем к отправке
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status=1),
+                name="outbox_pending_idx"
+            ),
+            # Ограничение скорости отправки
+            models.Index(fields=["sent_at"], name="outbox_sent_idx"),
+        ]
@@ -0,0 +1,167 @@
+import datetime
+import logging
+import time
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from rcs_back.utils.mail import BatchStats
+
+from .models import OutboxEmail
+from .serialization import dict_to_email
+
+logger = logging.getLogger(__name__)
+
+# Окно, в котором отправляется не больше EMAIL_RATE_LIMIT писем
+RATE_WINDOW = datetime.timedelta(minutes=1)
+# Выбранное воркером письмо не выбирается снова это время
+# (если воркер упал, письмо будет отправлено повторно)
+CLAIM_TIMEOUT = datetime.timedelta(minutes=5)
+# Повтор через 1, 2, 4... минуты, но не реже раза в 6 часов
+RETRY_BASE_DELAY = datetime.timedelta(minutes=1)
+RETRY_MAX_DELAY = datetime.timedelta(hours=6)
+MAX_ATTEMPTS = 8
+# Сколько секунд одна задача может отправлять письма
+DRAIN_TIME_BUDGET = 40
+
+OUTBOX_LOCK_KEY = "email-outbox:drain-lock"
+OUTBOX_LOCK_TIMEOUT = 5 * 60
+# Сколько отправленных писем удаляется одним запросом
+PRUNE_BATCH_SIZE = 1000
+
+
+def retry_delay(attempts: int) -> datetime.timedelta:
+    """Экспоненциальная задержка перед следующей попыткой"""
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def outbox_lock():
+    """Блокировка, чтобы очередь разбирала одна задача за раз
+    (иначе не соблюдается ограничение скорости)"""
+    return get_redis_connection("default").lock(
+        OUTBOX_LOCK_KEY, timeout=OUTBOX_LOCK_TIMEOUT
+    )
+
+
+def claim_batch() -> List[OutboxEmail]:
+    """Письма к отправке, не больше EMAIL_BATCH_SIZE и не больше,
+    чем осталось до EMAIL_RATE_LIMIT за последнюю минуту"""
+    now = timezone.now()
+    sent_recently = OutboxEmail.objects.filter(
+        sent_at__gte=now - RATE_WINDOW
+    ).count()
+    size = min(settings.EMAIL_BATCH_SIZE,
+               settings.EMAIL_RATE_LIMIT - sent_recently)
+    if size <= 0:
+        return []
+    with transaction.atomic():
+        emails = list(OutboxEmail.objects.filter(
+            status=OutboxEmail.PENDING,
+            next_attempt_at__lte=now
+        ).order_by("next_attempt_at", "pk").select_for_update(
+            skip_locked=True
+        )[:size])
+        OutboxEmail.objects.filter(
+            pk__in=[email.pk for email in emails]
+        ).update(next_attempt_at=now + CLAIM_TIMEOUT)
+    return emails
+
+
+def send_batch(emails: List[OutboxEmail]) -> BatchStats:
+    """Отправляет письма через одно соединение. Статусы
+    обновляются двумя запросами на всю пачку"""
+    start = time.perf_counter()
+    errors: List[Optional[Exception]]
+    connection = get_connection(settings.OUTBOX_EMAIL_BACKEND)
+    try:
+        connection.open()
+    except Exception as e:  # pylint: disable=broad-except
+        errors = [e] * len(emails)
+    else:
+        errors = []
+        for email in emails:
+            try:
+                connection.send_messages([dict_to_email(email.message)])
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+            else:
+                errors.append(None)
+        connection.close()
+
+    now = timezone.now()
+    sent_ids = []
+    failed = []
+    for email, error in zip(emails, errors):
+        if error is None:
+            sent_ids.append(email.pk)
+            continue
+        email.attempts += 1
+        email.last_error = repr(error)
+        if email.attempts >= MAX_ATTEMPTS:
+            email.status = OutboxEmail.FAILED
+            logger.error("Письмо %s не отправлено: %r", email.pk, error)
+        else:
+            email.next_attempt_at = now + retry_delay(email.attempts)
+        failed.append(email)
+    OutboxEmail.objects.filter(pk__in=sent_ids).update(
+        status=OutboxEmail.SENT,
+        sent_at=now,
+        attempts=F("attempts") + 1
+    )
+    OutboxEmail.objects.bulk_update(
+        failed, ["attempts", "status", "next_attempt_at", "last_error"]
+    )
+
+    stats = BatchStats(len(sent_ids), time.perf_counter() - start)
+    logger.info("Отправлено писем из очереди: %d из %d за %.2f с "
+                "(%.1f писем/с)", stats.messages, len(emails),
+                stats.seconds, stats.rate)
+    return stats
+
+
+def drain_outbox() -> int:
+    """Отправляет письма из очереди, пока они есть, пока не
+    достигнуто ограничение скорости и не истекло DRAIN_TIME_BUDGET.
+    Возвращает кол-во отправленных писем"""
+    lock = outbox_lock()
+    if not lock.acquire(blocking=False):
+        # Очередь уже разбирает другая задача
+        return 0
+    try:
+        sent = 0
+        deadline = time.monotonic() + DRAIN_TIME_BUDGET
+        while time.monotonic() < deadline:
+            emails = claim_batch()
+            if not emails:
+                break
+            sent += send_batch(emails).messages
+        return sent
+    finally:
+        lock.release()
+
+
+def prune_sent_emails() -> int:
+    """Удаляет отправленные письма старше EMAIL_OUTBOX_RETENTION_DAYS
+    (по outbox_sent_idx), пачками по PRUNE_BATCH_SIZE, чтобы не
+    держать долгую блокировку. Возвращает кол-во удалённых писем"""
+    sent_before = timezone.now() - datetime.timedelta(
+        days=settings.EMAIL_OUTBOX_RETENTION_DAYS
+    )
+    outdated = OutboxEmail.objects.filter(
+        status=OutboxEmail.SENT,
+        sent_at__lt=sent_before
+    )
+    pruned = 0
+    while True:
+        ids = list(outdated.values_list("pk", flat=True)[:PRUNE_BATCH_SIZE])
+        if not ids:
+            break
+        pruned += OutboxEmail.objects.filter(pk__in=ids).delete()[0]
+    if pruned:
+        logger.info("Удалено отправленных писем из очереди: %d", pruned)
+    return pruned
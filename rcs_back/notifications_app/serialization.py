@@ -0,0 +1,63 @@
+import base64
+from typing import Any, Dict
+
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+
+
+def email_to_dict(message: EmailMessage) -> Dict[str, Any]:
+    """Письмо в виде, пригодном для JSONField
+    (вложения - в base64)"""
+    message_dict = {
+        "subject": message.subject,
+        "body": message.body,
+        "from_email": message.from_email,
+        "to": message.to,
+        "cc": message.cc,
+        "bcc": message.bcc,
+        "reply_to": message.reply_to,
+        "headers": message.extra_headers,
+        "attachments": [],
+    }
+    if isinstance(message, EmailMultiAlternatives):
+        message_dict["alternatives"] = message.alternatives
+    if message.content_subtype != EmailMessage.content_subtype:
+        message_dict["content_subtype"] = message.content_subtype
+    if message.mixed_subtype != EmailMessage.mixed_subtype:
+        message_dict["mixed_subtype"] = message.mixed_subtype
+    for attachment in message.attachments:
+        # Вложения MIMEBase (attach(mime_obj)) в проекте не используются
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        message_dict["attachments"].append(
+            (filename, base64.b64encode(content).decode("ascii"), mimetype)
+        )
+    return message_dict
+
+
+def dict_to_email(message_dict: Dict[str, Any]) -> EmailMessage:
+    """Письмо из email_to_dict"""
+    kwargs = dict(message_dict)
+    content_subtype = kwargs.pop("content_subtype", None)
+    mixed_subtype = kwargs.pop("mixed_subtype", None)
+    attachments = []
+    for filename, content, mimetype in kwargs.pop("attachments", []):
+        content = base64.b64decode(content.encode("ascii"))
+        # Текстовые вложения EmailMessage ожидает строкой
+        if mimetype and mimetype.startswith("text/"):
+            content = content.decode()
+        attachments.append((filename, content, mimetype))
+    kwargs["attachments"] = attachments
+
+    if "alternatives" in kwargs:
+        kwargs["alternatives"] = [
+            tuple(alternative) for alternative in kwargs["alternatives"]
+        ]
+        message = EmailMultiAlternatives(**kwargs)
+    else:
+        message = EmailMessage(**kwargs)
+    if content_subtype:
+        message.content_subtype = content_subtype
+    if mixed_subtype:
+        message.mixed_subtype = mixed_subtype
+    return message
@@ -0,0 +1,16 @@
+from celery import shared_task
+
+from . import outbox
+
+
+@shared_task
+def send_outbox_emails() -> None:
+    """Отправляет письма из очереди (OutboxEmail). Ставится
+    после коммита записи писем и раз в минуту - для повторов"""
+    outbox.drain_outbox()
+
+
+@shared_task
+def prune_sent_emails() -> None:
+    """Удаляет старые отправленные письма (раз в сутки)"""
+    outbox.prune_sent_emails()
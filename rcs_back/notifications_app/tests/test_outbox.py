@@ -0,0 +1,173 @@
+import datetime
+from smtplib import SMTPException
+from unittest import mock, skipUnless
+
+from django.core import mail
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from rcs_back.containers_app.models import Building, TankTakeoutCompany
+from rcs_back.containers_app.tests.test_report_buffer import redis_available
+from rcs_back.notifications_app.models import OutboxEmail
+from rcs_back.notifications_app.outbox import (
+    MAX_ATTEMPTS,
+    claim_batch,
+    drain_outbox,
+    prune_sent_emails,
+    send_batch,
+)
+from rcs_back.notifications_app.serialization import dict_to_email, email_to_dict
+from rcs_back.users_app.models import User
+from rcs_back.utils.mail import EmailDispatcher, send_email
+
+OUTBOX_BACKEND = "rcs_back.notifications_app.backends.OutboxEmailBackend"
+
+
+def message(to: str = "eco@example.com") -> EmailMessage:
+    email = EmailMessage("Оповещение", "<p>Текст</p>", None, [to])
+    email.content_subtype = "html"
+    email.attach("containers.pdf", b"%PDF-1.4", "application/pdf")
+    return email
+
+
+class SerializationTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        original = message()
+        original.attach("notes.txt", "Текст", "text/plain")
+        restored = dict_to_email(email_to_dict(original))
+        self.assertEqual(restored.to, ["eco@example.com"])
+        self.assertEqual(restored.content_subtype, "html")
+        self.assertEqual(restored.attachments, original.attachments)
+
+        original = EmailMultiAlternatives("Тема", "Текст", None,
+                                          ["eco@example.com"])
+        original.attach_alternative("<p>Текст</p>", "text/html")
+        restored = dict_to_email(email_to_dict(original))
+        self.assertIsInstance(restored, EmailMultiAlternatives)
+        self.assertEqual(restored.alternatives, original.alternatives)
+
+
+@override_settings(EMAIL_BACKEND=OUTBOX_BACKEND)
+class OutboxEmailBackendTests(APITestCase):
+
+    def test_written_in_transaction(self):
+        with self.captureOnCommitCallbacks() as callbacks, \
+                self.assertLogs("rcs_back.utils.mail", "INFO"):
+            send_email(message())
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(mail.outbox, [])
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertEqual(email.message["to"], ["eco@example.com"])
+
+    def test_rolled_back_with_transaction(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic(), \
+                    self.assertLogs("rcs_back.utils.mail", "INFO"):
+                send_email(message())
+                raise ValueError
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_request_does_not_send(self):
+        building = Building.objects.create(address="ул. Тестовая 70")
+        TankTakeoutCompany.objects.create(email="tank@example.com")
+        self.client.force_authenticate(User.objects.create_superuser(
+            email="admin@example.com", password="password"
+        ))
+        with mock.patch.object(EmailBackend, "send_messages") as send, \
+                self.assertLogs("rcs_back.utils.mail", "INFO"):
+            resp = self.client.post("/api/tank-takeout-requests",
+                                    {"building": building.pk})
+        self.assertEqual(resp.status_code, 201)
+        send.assert_not_called()
+        self.assertEqual(OutboxEmail.objects.get().message["to"],
+                         ["tank@example.com"])
+
+
+class OutboxDrainTests(TestCase):
+
+    def setUp(self):
+        with override_settings(EMAIL_BACKEND=OUTBOX_BACKEND), \
+                self.captureOnCommitCallbacks(), \
+                self.assertLogs("rcs_back.utils.mail", "INFO"):
+            with EmailDispatcher() as dispatcher:
+                for i in range(3):
+                    dispatcher.add(message(f"owner{i}@example.com"))
+
+    def test_sent_and_retried(self):
+        emails = claim_batch()
+        self.assertEqual(len(emails), 3)
+        with mock.patch.object(EmailBackend, "send_messages",
+                               autospec=True,
+                               side_effect=[1, SMTPException("timeout"), 1]), \
+                self.assertLogs("rcs_back.notifications_app.outbox", "INFO"):
+            # Статусы всей пачки - двумя запросами
+            with self.assertNumQueries(2):
+                stats = send_batch(emails)
+        self.assertEqual(stats.messages, 2)
+
+        self.assertEqual(
+            OutboxEmail.objects.filter(status=OutboxEmail.SENT).count(), 2
+        )
+        failed = OutboxEmail.objects.get(status=OutboxEmail.PENDING)
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn("timeout", failed.last_error)
+        self.assertAlmostEqual(
+            failed.next_attempt_at,
+            timezone.now() + datetime.timedelta(minutes=1),
+            delta=datetime.timedelta(seconds=10)
+        )
+        # Повтор - только после задержки
+        self.assertEqual(claim_batch(), [])
+
+    def test_gives_up_after_max_attempts(self):
+        OutboxEmail.objects.update(attempts=MAX_ATTEMPTS - 1)
+        with mock.patch.object(EmailBackend, "open",
+                               side_effect=SMTPException("refused")), \
+                self.assertLogs("rcs_back.notifications_app.outbox", "INFO"):
+            send_batch(claim_batch())
+        self.assertEqual(
+            OutboxEmail.objects.filter(status=OutboxEmail.FAILED).count(), 3
+        )
+
+    @override_settings(EMAIL_RATE_LIMIT=4)
+    def test_rate_limit(self):
+        body = OutboxEmail.objects.first().message
+        now = timezone.now()
+        for sent_at in (now, now, now - datetime.timedelta(minutes=2)):
+            OutboxEmail.objects.create(message=body, status=OutboxEmail.SENT,
+                                       sent_at=sent_at)
+        # За последнюю минуту отправлено 2 из 4
+        self.assertEqual(len(claim_batch()), 2)
+
+    @override_settings(EMAIL_OUTBOX_RETENTION_DAYS=30)
+    def test_prune_sent(self):
+        now = timezone.now()
+        OutboxEmail.objects.filter(
+            pk=OutboxEmail.objects.first().pk
+        ).update(status=OutboxEmail.SENT,
+                 sent_at=now - datetime.timedelta(days=31))
+        OutboxEmail.objects.filter(
+            pk=OutboxEmail.objects.last().pk
+        ).update(status=OutboxEmail.SENT,
+                 sent_at=now - datetime.timedelta(days=1))
+        with self.assertLogs("rcs_back.notifications_app.outbox", "INFO"):
+            self.assertEqual(prune_sent_emails(), 1)
+        # Недавно отправленное и ожидающее отправки остались
+        self.assertEqual(
+            sorted(OutboxEmail.objects.values_list("status", flat=True)),
+            [OutboxEmail.PENDING, OutboxEmail.SENT]
+        )
+
+    @skipUnless(redis_available(), "нужен Redis")
+    def test_drain(self):
+        with self.assertLogs("rcs_back.notifications_app.outbox", "INFO"):
+            self.assertEqual(drain_outbox(), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].attachments[0][1], b"%PDF-1.4")
+        self.assertEqual(mail.outbox[0].content_subtype, "html")
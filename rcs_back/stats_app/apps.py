@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StatsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rcs_back.stats_app'
+
+    def ready(self):
+        # pylint: disable=import-outside-toplevel,unused-import
+        from rcs_back.stats_app import task_metrics
@@ -0,0 +1,234 @@
+import json
+import logging
+import re
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+# Бюджеты эндпоинтов: кол-во запросов к БД и время ответа
+BUDGETS_PATH = Path(__file__).parent / "endpoint_budgets.json"
+# Запас по времени при записи бюджетов: время
+# сильно зависит от машины, запросы - нет
+TIME_HEADROOM = 3
+# Быстрые эндпоинты не проверяются точнее этого
+MIN_TIME_BUDGET_MS = 50
+# Во сколько раз меньше данных при втором замере: кол-во запросов
+# не должно зависеть от объёма данных (иначе это N+1)
+GROWTH_CHECK_DIVISOR = 2
+# Размеры набора данных, которые уменьшаются для второго замера.
+# Данные здания (контейнеров на здание, сборов за период) те же,
+# чтобы отличалось только кол-во строк, а не то, что в них попало
+SCALED_DATASET_FIELDS = ("buildings", "containers")
+# Эндпоинты, кол-во запросов которых пока растёт с данными:
+# маршрут -> причина. Новые сюда не добавлять
+KNOWN_QUERY_GROWTH: Dict[str, str] = {}
+
+# Модели объектов для параметров пути, у которых
+# нет queryset во view (по имени view или параметра)
+PATH_PARAM_MODELS = {
+    "building_id": "containers_app.Building",
+    "user_id": "users_app.User",
+    "ContainerDetailView": "containers_app.Container",
+    "ContainerStickerView": "containers_app.Container",
+    "ContainerActivationView": "containers_app.Container",
+    "ContainersForTakeoutView": "takeouts_app.ContainersTakeoutRequest",
+    "StatsReportDownloadView": "stats_app.StatsReport",
+}
+
+
+# Обязательные параметры запроса
+QUERY_PARAMS = {
+    "MonthlyMassPerBuildingView": lambda: {"year": timezone.now().year},
+    "MonthlyActivationsPerBuildingView": lambda: {"year": timezone.now().year},
+}
+
+
+class Endpoint(NamedTuple):
+    route: str
+    view_class: type
+
+
+class Measurement(NamedTuple):
+    route: str
+    url: Optional[str]
+    status: Optional[int]
+    queries: int
+    query_time_ms: float
+    time_ms: float
+
+
+def collect_endpoints() -> List[Endpoint]:
+    """GET-эндпоинты проекта из config/urls.py и подключённых
+    в нём urls приложений (без админки, djoser и схемы API)"""
+    endpoints = []
+
+    def walk(patterns, prefix: str) -> None:
+        for pattern in patterns:
+            route = prefix + str(pattern.pattern)
+            if isinstance(pattern, URLResolver):
+                module = getattr(pattern.urlconf_module, "__name__", "")
+                if module.startswith("rcs_back."):
+                    walk(pattern.url_patterns, route)
+            elif isinstance(pattern, URLPattern):
+                view_class = getattr(pattern.callback, "view_class", None)
+                if (view_class and hasattr(view_class, "get") and
+                        view_class.__module__.startswith("rcs_back.")):
+                    endpoints.append(Endpoint("/" + route, view_class))
+
+    walk(get_resolver().url_patterns, "")
+    return endpoints
+
+
+def path_param_model(endpoint: Endpoint, param: str):
+    name = (PATH_PARAM_MODELS.get(endpoint.view_class.__name__) or
+            PATH_PARAM_MODELS.get(param))
+    if name:
+        return apps.get_model(name)
+    queryset = getattr(endpoint.view_class, "queryset", None)
+    return queryset.model if queryset is not None else None
+
+
+def endpoint_url(endpoint: Endpoint) -> Optional[str]:
+    """URL эндпоинта с id первого подходящего объекта
+    (None, если объекта нет)"""
+    url = endpoint.route
+    for converter, param in re.findall(r"<(\w+):(\w+)>", endpoint.route):
+        model = path_param_model(endpoint, param)
+        obj = model.objects.order_by("pk").first() if model else None
+        if obj is None:
+            return None
+        url = url.replace(f"<{converter}:{param}>", str(obj.pk))
+    return url
+
+
+def measure_endpoint(client: APIClient, endpoint: Endpoint,
+                     repeat: int = 3) -> Measurement:
+    """Медианное время ответа, кол-во запросов к БД
+    и их суммарное время (по последнему повтору)"""
+    url = endpoint_url(endpoint)
+    if url is None:
+        return Measurement(endpoint.route, None, None, 0, 0, 0)
+    params = QUERY_PARAMS.get(endpoint.view_class.__name__, dict)()
+    timings = []
+    # Ошибки попадут в результаты, в логе они не нужны
+    request_logger = logging.getLogger("django.request")
+    level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            client.get(url, params)  # прогрев
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    response = client.get(url, params)
+                    timings.append(time.perf_counter() - start)
+    finally:
+        request_logger.setLevel(level)
+    return Measurement(
+        route=endpoint.route,
+        url=url,
+        status=response.status_code,
+        queries=len(ctx.captured_queries),
+        query_time_ms=sum(float(q["time"]) for q in ctx.captured_queries) * 1000,
+        time_ms=statistics.median(timings) * 1000,
+    )
+
+
+def benchmark_client() -> APIClient:
+    """Клиент от имени нового суперпользователя. Ошибки view -
+    ответ 500, а не исключение"""
+    user = get_user_model().objects.create_superuser(
+        email="benchmark@example.com", password=None
+    )
+    client = APIClient(raise_request_exception=False)
+    client.force_authenticate(user)
+    return client
+
+
+def measure_endpoints(client: APIClient, repeat: int = 3) -> List[Measurement]:
+    """Замеры всех GET-эндпоинтов проекта"""
+    return [measure_endpoint(client, endpoint, repeat)
+            for endpoint in collect_endpoints()]
+
+
+def scaled_dataset(dataset: Dict,
+                   divisor: int = GROWTH_CHECK_DIVISOR) -> Dict:
+    """Тот же набор данных, уменьшенный в divisor раз"""
+    return {
+        field: max(value // divisor, 1)
+        if field in SCALED_DATASET_FIELDS and value else value
+        for field, value in dataset.items()
+    }
+
+
+def find_query_growth(small: List[Measurement], large: List[Measurement],
+                      known: Dict[str, str] = None) -> List[str]:
+    """Эндпоинты, кол-во запросов которых на большем наборе данных
+    больше, чем на меньшем (кроме known)"""
+    known = KNOWN_QUERY_GROWTH if known is None else known
+    small_queries = {m.route: m.queries for m in small if m.url}
+    problems = []
+    for m in large:
+        if m.url is None or m.route in known:
+            continue
+        queries = small_queries.get(m.route)
+        if queries is not None and m.queries > queries:
+            problems.append(
+                f"{m.route}: запросов {m.queries} (на меньших данных "
+                f"{queries}) - растёт с данными"
+            )
+    return problems
+
+
+def load_budgets(path: Path = BUDGETS_PATH) -> Dict:
+    if not path.exists():
+        return {"dataset": {}, "endpoints": {}}
+    return json.loads(path.read_text())
+
+
+def save_budgets(measurements: List[Measurement], dataset: Dict,
+                 path: Path = BUDGETS_PATH) -> None:
+    budgets = {
+        "dataset": dataset,
+        "endpoints": {
+            m.route: {
+                "queries": m.queries,
+                "time_ms": max(round(m.time_ms * TIME_HEADROOM, 1),
+                               MIN_TIME_BUDGET_MS),
+            }
+            for m in measurements if m.url and m.status < 500
+        },
+    }
+    path.write_text(json.dumps(budgets, indent=2, ensure_ascii=False) + "\n")
+
+
+def compare_to_budgets(measurements: List[Measurement], budgets: Dict,
+                       check_time: bool = True) -> List[str]:
+    """Список превышений бюджетов (и ошибок сервера)"""
+    problems = []
+    for m in measurements:
+        if m.url is None:
+            continue
+        if m.status >= 500:
+            problems.append(f"{m.route}: ответ {m.status}")
+        budget = budgets["endpoints"].get(m.route)
+        if not budget:
+            continue
+        if m.queries > budget["queries"]:
+            problems.append(
+                f"{m.route}: запросов {m.queries}, бюджет {budget['queries']}"
+            )
+        if check_time and m.time_ms > budget["time_ms"]:
+            problems.append(
+                f"{m.route}: {m.time_ms:.1f} мс, бюджет {budget['time_ms']} мс"
+            )
+    return problems
@@ -1,14 +1,22 @@
 from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Sequence
 
-from django.db.models import Q
+from django.db.models import Max, Q, TextField
+from django.db.models.functions import Cast, Length
 from django.db.models.query import QuerySet
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font
-from openpyxl.worksheet.worksheet import Worksheet
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
 
 from rcs_back.containers_app.models import Building, Container
 from rcs_back.takeouts_app.models import ContainersTakeoutRequest, TankTakeoutRequest
 
+Row = Sequence[Any]
+
+ITERATOR_CHUNK_SIZE = 2000
+
 
 def queryset_to_ids(qs: QuerySet) -> str:
     """Форматирование QuerySet"""
@@ -31,315 +39,433 @@ def format_td(timed: timedelta) -> str:
         return td_s.split(":", maxsplit=1)[0] + " ч"
 
 
-def set_width(worksheet: Worksheet) -> None:
-    """Ширина столбца как наибольшая из клеток"""
-    dims = {}
-    for row in worksheet.rows:
-        for cell in row:
-            if cell.value:
-                dims[cell.column_letter] = max(
-                    (dims.get(cell.column_letter, 0),
-                     len(str(cell.value)))
-                )
-                if dims[cell.column_letter] > 20:
-                    dims[cell.column_letter] = 30
-    for col, value in dims.items():
-        worksheet.column_dimensions[col].width = value + 2
-
-
-def write_container_headers(worksheet: Worksheet) -> None:
-    """Записывает заголовки в статистику о контейнере"""
-    worksheet["A2"] = "ID"
-    worksheet["B2"] = "Вид контейнера"
-    worksheet["C2"] = "Масса, кг"
-    worksheet["D2"] = "Адрес здания"
-    worksheet["E2"] = "Номер корпуса"
-    worksheet["F2"] = "Этаж"
-    worksheet["G2"] = "Аудитория"
-    worksheet["H2"] = "Описание"
-    worksheet["I2"] = "Состояние"
-    worksheet["J2"] = "Текущее"
-    worksheet["K2"] = "Среднее"
-    worksheet["L2"] = "Текущее"
-    worksheet["M2"] = "Среднее"
-    worksheet["N2"] = "Номер телефона"
-    worksheet["O2"] = "Почта"
-    worksheet["P2"] = "Суммарная масса, кг"
-    worksheet["J1"] = "Время заполнения"
-    worksheet["L1"] = "Ожидание сбора после заполнения"
-    worksheet["N1"] = "Контактное лицо"
-
-    worksheet.row_dimensions[1].font = Font(bold=True)
-    worksheet.row_dimensions[2].font = Font(bold=True)
-
-
-def write_container(container: Container, worksheet: Worksheet, i: int) -> None:
-    """Записывает статистику одного контейнера"""
-    worksheet[f"A{i}"] = container.pk
-    worksheet[f"B{i}"] = container.get_kind_display()
-    worksheet[f"C{i}"] = container.mass()
-    worksheet[f"D{i}"] = container.building.address
-    if container.building_part:
-        worksheet[f"E{i}"] = container.building_part.num
-    else:
-        worksheet[f"E{i}"] = "-"
-    worksheet[f"F{i}"] = container.floor
-    worksheet[f"G{i}"] = container.room
-    worksheet[f"H{i}"] = container.description
-    worksheet[f"I{i}"] = container.get_status_display()
-    if container.cur_fill_time():
-        worksheet[f"J{i}"] = format_td(container.cur_fill_time())
+class ColumnWidths:
+    """Ширина столбца как наибольшая из клеток.
+    openpyxl пишет ширину столбцов до данных, поэтому она
+    считается заранее: по заголовкам, известным значениям
+    и одному агрегирующему запросу, а не по самим строкам"""
+
+    MAX_WIDTH = 20
+    WIDE_WIDTH = 30
+    PADDING = 2
+
+    def __init__(self) -> None:
+        self.widths: Dict[int, int] = {}
+
+    def fit(self, col: int, width: int) -> None:
+        self.widths[col] = max(self.widths.get(col, 0), width)
+
+    def fit_values(self, col: int, values: Iterable[Any]) -> None:
+        """Учитывает заранее известные значения столбца"""
+        for value in values:
+            if value:
+                self.fit(col, len(str(value)))
+
+    def track(self, row: Row) -> None:
+        """Учитывает строку (заголовок)"""
+        for col, value in enumerate(row, 1):
+            self.fit_values(col, [value])
+
+    def fit_queryset(self, queryset: QuerySet,
+                     columns: Dict[int, str]) -> None:
+        """Учитывает наибольшую длину полей (столбец: поле)
+        одним запросом на стороне БД"""
+        lengths = queryset.order_by().aggregate(**{
+            f"col_{col}": Max(Length(Cast(field, output_field=TextField())))
+            for col, field in columns.items()
+        })
+        for col in columns:
+            if lengths[f"col_{col}"]:
+                self.fit(col, lengths[f"col_{col}"])
+
+    def apply(self, worksheet: WriteOnlyWorksheet) -> None:
+        """Задаёт ширину столбцов. Для write-only страницы
+        нужно вызвать до записи первой строки"""
+        for col, width in self.widths.items():
+            if width > self.MAX_WIDTH:
+                width = self.WIDE_WIDTH
+            worksheet.column_dimensions[
+                get_column_letter(col)
+            ].width = width + self.PADDING
+
+
+def write_sheet(workbook: Workbook, title: str,
+                headers: List[Row], rows: Iterable[Row],
+                widths: ColumnWidths = None) -> None:
+    """Добавляет страницу в write-only Workbook. Строки
+    пишутся сразу по мере получения, поэтому ширина столбцов
+    данных передаётся заранее в widths"""
+    widths = widths or ColumnWidths()
+    for row in headers:
+        widths.track(row)
+
+    worksheet = workbook.create_sheet(title)
+    widths.apply(worksheet)
+    bold = Font(bold=True)
+    for row in headers:
+        header_row = []
+        for value in row:
+            cell = WriteOnlyCell(worksheet, value=value)
+            if value is not None:
+                cell.font = bold
+            header_row.append(cell)
+        worksheet.append(header_row)
+    for row in rows:
+        worksheet.append(row)
+
+
+def choice_labels(choices) -> List[str]:
+    """Подписи вариантов поля с choices"""
+    return [label for _, label in choices]
+
+
+# Значения столбцов со временем (format_td и пояснения)
+DURATION_VALUES = [
+    "999 дн 23 ч",
+    "Уже заполнен",
+    "Ещё не подключён",
+    "Ещё не заполнен",
+    "Недостаточно данных",
+]
+
+
+CONTAINER_HEADERS = [
+    [None] * 9 + [
+        "Время заполнения",
+        None,
+        "Ожидание сбора после заполнения",
+        None,
+        "Контактное лицо",
+    ],
+    [
+        "ID",
+        "Вид контейнера",
+        "Масса, кг",
+        "Адрес здания",
+        "Номер корпуса",
+        "Этаж",
+        "Аудитория",
+        "Описание",
+        "Состояние",
+        "Текущее",
+        "Среднее",
+        "Текущее",
+        "Среднее",
+        "Номер телефона",
+        "Почта",
+        "Суммарная масса, кг",
+    ],
+]
+
+
+def container_row(container: Container) -> Row:
+    """Статистика одного контейнера"""
+    cur_fill_time = container.cur_fill_time()
+    cur_takeout_wait_time = container.cur_takeout_wait_time()
+    if cur_fill_time:
+        cur_fill_time = format_td(cur_fill_time)
     elif container.is_active():
-        worksheet[f"J{i}"] = "Уже заполнен"
+        cur_fill_time = "Уже заполнен"
     else:
-        worksheet[f"J{i}"] = "Ещё не подключён"
+        cur_fill_time = "Ещё не подключён"
     if container.avg_fill_time:
-        worksheet[f"K{i}"] = format_td(container.avg_fill_time)
+        avg_fill_time = format_td(container.avg_fill_time)
     else:
-        worksheet[f"K{i}"] = "Недостаточно данных"
-    if container.cur_takeout_wait_time():
-        worksheet[f"L{i}"] = format_td(container.cur_takeout_wait_time())
+        avg_fill_time = "Недостаточно данных"
+    if cur_takeout_wait_time:
+        cur_takeout_wait_time = format_td(cur_takeout_wait_time)
     else:
-        worksheet[f"L{i}"] = "Ещё не заполнен"
+        cur_takeout_wait_time = "Ещё не заполнен"
     if container.avg_takeout_wait_time:
-        worksheet[f"M{i}"] = format_td(container.avg_takeout_wait_time)
+        avg_takeout_wait_time = format_td(container.avg_takeout_wait_time)
     else:
-        worksheet[f"M{i}"] = "Недостаточно данных"
-    worksheet[f"N{i}"] = container.phone
-    worksheet[f"O{i}"] = container.email
-    worksheet[f"P{i}"] = container.collected_mass()
-
-
-def get_container_stats_ws(worksheet: Worksheet) -> None:
-    """Создаёт страницу из excel с актуальной статистикой по контейнерам"""
-    worksheet.title = "Контейнеры"
-    write_container_headers(worksheet)
-    containers = Container.objects.filter(
+        avg_takeout_wait_time = "Недостаточно данных"
+    return [
+        container.pk,
+        container.get_kind_display(),
+        container.mass(),
+        container.building.address,
+        container.building_part.num if container.building_part else "-",
+        container.floor,
+        container.room,
+        container.description,
+        container.get_status_display(),
+        cur_fill_time,
+        avg_fill_time,
+        cur_takeout_wait_time,
+        avg_takeout_wait_time,
+        container.phone,
+        container.email,
+        container.collected_mass(),
+    ]
+
+
+def container_stats_queryset() -> QuerySet[Container]:
+    """Контейнеры для статистики со всеми нужными данными
+    в одном запросе"""
+    return Container.objects.filter(
         ~Q(status=Container.RESERVED)
-    ).order_by("pk")
+    ).with_current_state().with_emptied_reports_count().order_by("pk")
 
-    for i in range(3, len(containers) + 3):
-        container = containers[i-3]
-        write_container(container, worksheet, i)
 
-    set_width(worksheet)
+def write_container_stats_ws(workbook: Workbook) -> None:
+    """Создаёт страницу из excel с актуальной статистикой по контейнерам"""
+    containers = container_stats_queryset()
+    widths = ColumnWidths()
+    widths.fit_queryset(
+        Container.objects.filter(~Q(status=Container.RESERVED)),
+        {1: "pk", 4: "building__address", 5: "building_part__num",
+         6: "floor", 7: "room", 8: "description", 14: "phone", 15: "email"}
+    )
+    widths.fit_values(2, choice_labels(Container.KIND_CHOICES))
+    widths.fit_values(9, choice_labels(Container.STATUS_CHOICES))
+    for col in range(10, 14):
+        widths.fit_values(col, DURATION_VALUES)
+    write_sheet(
+        workbook, "Контейнеры", CONTAINER_HEADERS,
+        (container_row(container)
+         for container in containers.iterator(chunk_size=ITERATOR_CHUNK_SIZE)),
+        widths
+    )
 
 
 def get_container_stats_xl() -> Workbook:
     """Создаёт excel-WorkBook с актуальной статистикой по контейнерам"""
-    workbook = Workbook()
-    worksheet = workbook.active
-    get_container_stats_ws(worksheet)
+    workbook = Workbook(write_only=True)
+    write_container_stats_ws(workbook)
     return workbook
 
 
-def write_container_takeout_headers(worksheet: Worksheet) -> None:
-    """Записывает заголовки в статистику о сборе"""
-    worksheet["A1"] = "Дата сбора"
-    worksheet["A2"] = "создание"
-    worksheet["B2"] = "подтверждение"
-    worksheet["C1"] = "Здание"
-    worksheet["D1"] = "Корпус"
-    worksheet["E1"] = "Список контейнеров на сбор"
-    worksheet["F1"] = "Неподтверждённые контейнеры"
-    worksheet["G1"] = "Соответствие"
-    worksheet["H1"] = "Суммарная масса сбора"
-    worksheet["I1"] = "Данные подсобного рабочего"
-
-    worksheet.row_dimensions[1].font = Font(bold=True)
-    worksheet.row_dimensions[2].font = Font(bold=True)
-
-
-def write_container_takeout(request: ContainersTakeoutRequest,
-                            worksheet: Worksheet, i: int) -> None:
-    """Записывает статистику одного сбора"""
-    worksheet[f"A{i}"] = request.created_at.strftime("%d.%m.%Y")
+CONTAINER_TAKEOUT_HEADERS = [
+    [
+        "Дата сбора",
+        None,
+        "Здание",
+        "Корпус",
+        "Список контейнеров на сбор",
+        "Неподтверждённые контейнеры",
+        "Соответствие",
+        "Суммарная масса сбора",
+        "Данные подсобного рабочего",
+    ],
+    [
+        "создание",
+        "подтверждение",
+    ],
+]
+
+
+def iterator_with_prefetch(queryset: QuerySet,
+                           chunk_size: int = ITERATOR_CHUNK_SIZE):
+    """Как queryset.iterator(chunk_size), но с prefetch_related,
+    который iterator() не выполняет: объекты читаются по chunk_size
+    в порядке pk"""
+    last_pk = None
+    while True:
+        chunk = queryset.order_by("pk")
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last_pk = chunk[-1].pk
+
+
+def container_takeout_row(request: ContainersTakeoutRequest) -> Row:
+    """Статистика одного сбора (контейнеры подгружены
+    через ContainersTakeoutRequestQuerySet.with_containers)"""
     if request.confirmed_at:
-        worksheet[f"B{i}"] = request.confirmed_at.strftime("%d.%m.%Y")
+        confirmed_at = request.confirmed_at.strftime("%d.%m.%Y")
     else:
-        worksheet[f"B{i}"] = "-"
-    worksheet[f"C{i}"] = request.building.address
-    if request.building_part:
-        worksheet[f"D{i}"] = request.building_part.num
-    else:
-        worksheet[f"D{i}"] = "-"
-    worksheet[f"E{i}"] = queryset_to_ids(request.containers.all())
-    worksheet[f"F{i}"] = queryset_to_ids(request.unconfirmed_containers())
-    worksheet[f"G{i}"] = request.emptied_containers_match()
-    worksheet[f"H{i}"] = request.mass()
-    worksheet[f"I{i}"] = request.worker_info
-
-
-def get_container_takeout_stats_ws(worksheet: Worksheet) -> None:
+        confirmed_at = "-"
+    return [
+        request.created_at.strftime("%d.%m.%Y"),
+        confirmed_at,
+        request.building.address,
+        request.building_part.num if request.building_part else "-",
+        queryset_to_ids(request.containers.all()),
+        queryset_to_ids(request.unconfirmed_containers()),
+        request.emptied_containers_match(),
+        request.mass(),
+        request.worker_info,
+    ]
+
+
+def write_container_takeout_stats_ws(workbook: Workbook) -> None:
     """Создаёт страницу из excel с актуальной статистикой по сборам"""
-    worksheet.title = "Сборы"
-    write_container_takeout_headers(worksheet)
-    container_takeouts = ContainersTakeoutRequest.objects.order_by(
-        "pk")
-
-    for i in range(3, len(container_takeouts) + 3):
-        takeout = container_takeouts[i-3]
-        write_container_takeout(takeout, worksheet, i)
-
-    set_width(worksheet)
+    container_takeouts = ContainersTakeoutRequest.objects.select_related(
+        "building", "building_part"
+    ).with_containers()
+    widths = ColumnWidths()
+    widths.fit_queryset(
+        ContainersTakeoutRequest.objects.all(),
+        {3: "building__address", 4: "building_part__num", 9: "worker_info"}
+    )
+    write_sheet(
+        workbook, "Сборы", CONTAINER_TAKEOUT_HEADERS,
+        (container_takeout_row(takeout)
+         for takeout in iterator_with_prefetch(container_takeouts)),
+        widths
+    )
 
 
 def get_container_takeout_stats_xl() -> Workbook:
     """Создаёт excel-WorkBook с актуальной статистикой по сборам"""
-    workbook = Workbook()
-    worksheet = workbook.active
-    get_container_takeout_stats_ws(worksheet)
+    workbook = Workbook(write_only=True)
+    write_container_takeout_stats_ws(workbook)
     return workbook
 
 
-def write_tank_takeout_headers(worksheet: Worksheet) -> None:
-    """Записывает заголовки в статистику о вывозе"""
-    worksheet["A1"] = "Дата обращения к оператору"
-    worksheet["B1"] = "Дата вывоза"
-    worksheet["C1"] = "Здание"
-    worksheet["D1"] = "Время заполнения накопительного бака"
-    worksheet["E1"] = "Расчётная масса вывоза, кг"
-    worksheet["F1"] = "Подтверждённая масса вывоза, кг"
-    worksheet["G1"] = "Соответствие (расчётная/подтверждённая"
-    worksheet["H1"] = "Разница (расчётная - подтверждённая), кг"
+TANK_TAKEOUT_HEADERS = [
+    [
+        "Дата обращения к оператору",
+        "Дата вывоза",
+        "Здание",
+        "Время заполнения накопительного бака",
+        "Расчётная масса вывоза, кг",
+        "Подтверждённая масса вывоза, кг",
+        "Соответствие (расчётная/подтверждённая",
+        "Разница (расчётная - подтверждённая), кг",
+    ],
+]
 
-    worksheet.row_dimensions[1].font = Font(bold=True)
 
-
-def write_tank_takeout(request: TankTakeoutRequest,
-                       worksheet: Worksheet, i: int) -> None:
-    """Записывает статистику одного вывоза"""
-    worksheet[f"A{i}"] = request.created_at.strftime("%d.%m.%Y")
+def tank_takeout_row(request: TankTakeoutRequest) -> Row:
+    """Статистика одного вывоза"""
     if request.confirmed_at:
-        worksheet[f"B{i}"] = request.confirmed_at.strftime("%d.%m.%Y")
+        confirmed_at = request.confirmed_at.strftime("%d.%m.%Y")
     else:
-        worksheet[f"B{i}"] = "-"
-    worksheet[f"C{i}"] = request.building.address
-    if request.fill_time():
-        worksheet[f"D{i}"] = format_td(request.fill_time())
+        confirmed_at = "-"
+    fill_time = request.fill_time()
+    if fill_time:
+        fill_time = format_td(fill_time)
     else:
-        worksheet[f"D{i}"] = "Недостаточно данных"
-    worksheet[f"E{i}"] = request.mass()
-    worksheet[f"F{i}"] = request.confirmed_mass
-    worksheet[f"G{i}"] = request.confirmed_mass_match()
-    worksheet[f"H{i}"] = request.mass_difference()
-
-
-def get_tank_takeout_stats_ws(worksheet: Worksheet) -> None:
+        fill_time = "Недостаточно данных"
+    return [
+        request.created_at.strftime("%d.%m.%Y"),
+        confirmed_at,
+        request.building.address,
+        fill_time,
+        request.mass(),
+        request.confirmed_mass,
+        request.confirmed_mass_match(),
+        request.mass_difference(),
+    ]
+
+
+def write_tank_takeout_stats_ws(workbook: Workbook) -> None:
     """Создаёт страницу из excel с актуальной статистикой по вывозам"""
-    worksheet.title = "Вывозы"
-    write_tank_takeout_headers(worksheet)
-    tank_takeouts = TankTakeoutRequest.objects.order_by(
-        "pk")
-
-    for i in range(2, len(tank_takeouts) + 2):
-        takeout = tank_takeouts[i-2]
-        write_tank_takeout(takeout, worksheet, i)
-
-    set_width(worksheet)
-
-
-def write_building_headers(worksheet: Worksheet) -> None:
-    """Записывает заголовки в статистику по зданию"""
-    worksheet["A1"] = "Здание"
-    worksheet["B1"] = "Число контейнеров"
-    worksheet["C1"] = "Суммарный объём, кг"
-    worksheet["D1"] = "Средняя скорость сбора, кг/месяц"
-
-    worksheet.row_dimensions[1].font = Font(bold=True)
-
-
-def write_building(building: Building, worksheet: Worksheet, i: int) -> None:
-    """Записывает статистику одного здания"""
-    worksheet[f"A{i}"] = building.address
-    worksheet[f"B{i}"] = building.container_count()
-    worksheet[f"C{i}"] = building.confirmed_collected_mass()
-    worksheet[f"D{i}"] = building.avg_fill_speed()
-
-
-def get_building_stats_ws(worksheet: Worksheet) -> None:
+    tank_takeouts = list(
+        TankTakeoutRequest.objects.select_related("building").order_by("pk")
+    )
+    TankTakeoutRequest.prefetch_stats(tank_takeouts)
+    widths = ColumnWidths()
+    widths.fit_queryset(TankTakeoutRequest.objects.all(),
+                        {3: "building__address"})
+    widths.fit_values(4, DURATION_VALUES)
+    write_sheet(
+        workbook, "Вывозы", TANK_TAKEOUT_HEADERS,
+        (tank_takeout_row(takeout) for takeout in tank_takeouts),
+        widths
+    )
+
+
+BUILDING_HEADERS = [
+    [
+        "Здание",
+        "Число контейнеров",
+        "Суммарный объём, кг",
+        "Средняя скорость сбора, кг/месяц",
+        "Масса в полных контейнерах, кг",
+    ],
+]
+
+
+def building_row(building: Building) -> Row:
+    """Статистика одного здания"""
+    return [
+        building.address,
+        building.container_count(),
+        building.confirmed_collected_mass(),
+        building.avg_fill_speed(),
+        building.current_mass(),
+    ]
+
+
+def write_building_stats_ws(workbook: Workbook) -> None:
     """Создаёт страницу из excel с актуальной статистикой по зданию"""
-    worksheet.title = "По зданиям"
-    write_building_headers(worksheet)
-    buildings = Building.objects.order_by("pk")
-
-    for i in range(2, len(buildings) + 2):
-        building = buildings[i-2]
-        write_building(building, worksheet, i)
-
-    set_width(worksheet)
+    buildings = Building.objects.with_stats().order_by("pk")
+    widths = ColumnWidths()
+    widths.fit_queryset(Building.objects.all(), {1: "address"})
+    write_sheet(
+        workbook, "По зданиям", BUILDING_HEADERS,
+        (building_row(building) for building in buildings.iterator()),
+        widths
+    )
 
 
 def get_tank_takeout_stats_xl() -> Workbook:
     """Создаёт excel-WorkBook с актуальной статистикой по вывозам"""
-    workbook = Workbook()
-    worksheet = workbook.active
-    get_tank_takeout_stats_ws(worksheet)
-    ws1 = workbook.create_sheet()
-    get_building_stats_ws(ws1)
+    workbook = Workbook(write_only=True)
+    write_tank_takeout_stats_ws(workbook)
+    write_building_stats_ws(workbook)
     return workbook
 
 
 def get_all_stats_xl() -> Workbook:
     """Создаёт excel-WorkBook со всей актуальной статистикой"""
-    workbook = Workbook()
-    worksheet = workbook.active
-    get_container_stats_ws(worksheet)
-    ws1 = workbook.create_sheet()
-    get_container_takeout_stats_ws(ws1)
-    ws2 = workbook.create_sheet()
-    get_tank_takeout_stats_ws(ws2)
-    ws3 = workbook.create_sheet()
-    get_building_stats_ws(ws3)
+    workbook = Workbook(write_only=True)
+    write_container_stats_ws(workbook)
+    write_container_takeout_stats_ws(workbook)
+    write_tank_takeout_stats_ws(workbook)
+    write_building_stats_ws(workbook)
     return workbook
 
 
-def write_short_container_headers(worksheet: Worksheet) -> None:
-    """Записывает заголовки в короткую статистику о контейнерах"""
-    worksheet["A1"] = "ID"
-    worksheet["B1"] = "Вид контейнера"
-    worksheet["C1"] = "Номер корпуса"
-    worksheet["D1"] = "Этаж"
-    worksheet["E1"] = "Аудитория"
-    worksheet["F1"] = "Описание"
-    worksheet["G1"] = "Номер телефона"
-    worksheet["H1"] = "Почта"
-
-    worksheet.row_dimensions[1].font = Font(bold=True)
-
-
-def write_short_container_info(container: Container, worksheet: Worksheet, i: int) -> None:
-    """Записывает краткую информацию об одном контейнере"""
-    worksheet[f"A{i}"] = container.pk
-    worksheet[f"B{i}"] = container.get_kind_display()
-    if container.building_part:
-        worksheet[f"C{i}"] = container.building_part.num
-    else:
-        worksheet[f"C{i}"] = "-"
-    worksheet[f"D{i}"] = container.floor
-    worksheet[f"E{i}"] = container.room
-    worksheet[f"F{i}"] = container.description
-    worksheet[f"G{i}"] = container.phone
-    worksheet[f"H{i}"] = container.email
-
-
-def get_short_container_info_ws(worksheet: Worksheet,
-                                containers: QuerySet[Container]) -> None:
-    """Создаёт страницу из excel с краткой информацией
-    по выбранным контейнерам"""
-    worksheet.title = "Контейнеры"
-    write_short_container_headers(worksheet)
-
-    for i in range(2, len(containers) + 2):
-        container = containers[i-2]
-        write_short_container_info(container, worksheet, i)
-
-    set_width(worksheet)
+SHORT_CONTAINER_HEADERS = [
+    [
+        "ID",
+        "Вид контейнера",
+        "Номер корпуса",
+        "Этаж",
+        "Аудитория",
+        "Описание",
+        "Номер телефона",
+        "Почта",
+    ],
+]
+
+
+def short_container_row(container: Container) -> Row:
+    """Краткая информация об одном контейнере"""
+    return [
+        container.pk,
+        container.get_kind_display(),
+        container.building_part.num if container.building_part else "-",
+        container.floor,
+        container.room,
+        container.description,
+        container.phone,
+        container.email,
+    ]
 
 
 def get_short_container_info_xl(containers: QuerySet[Container]) -> Workbook:
-    """Создаёт excel-WorkBook с актуальной статистикой по контейнерам"""
-    workbook = Workbook()
-    worksheet = workbook.active
-    get_short_container_info_ws(worksheet, containers)
+    """Создаёт excel-WorkBook с краткой информацией
+    по выбранным контейнерам"""
+    workbook = Workbook(write_only=True)
+    widths = ColumnWidths()
+    widths.fit_queryset(
+        containers,
+        {1: "pk", 3: "building_part__num", 4: "floor", 5: "room",
+         6: "description", 7: "phone", 8: "email"}
+    )
+    widths.fit_values(2, choice_labels(Container.KIND_CHOICES))
+    write_sheet(
+        workbook, "Контейнеры", SHORT_CONTAINER_HEADERS,
+        (short_container_row(container)
+         for container in containers.iterator(chunk_size=ITERATOR_CHUNK_SIZE)),
+        widths
+    )
     return workbook
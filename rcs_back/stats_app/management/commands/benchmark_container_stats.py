@@ -0,0 +1,74 @@
+import time
+from tempfile import NamedTemporaryFile
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from rcs_back.containers_app.models import Container
+from rcs_back.stats_app.excel import (
+    container_row,
+    container_stats_queryset,
+    get_container_stats_xl,
+)
+from rcs_back.stats_app.synthetic import generate_dataset
+
+
+class Command(BaseCommand):
+    help = ("Замеряет время выгрузки страницы «Контейнеры» "
+            "на синтетических данных. Данные создаются в транзакции "
+            "и откатываются после замера")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--containers", type=int, default=10000)
+        parser.add_argument("--buildings", type=int, default=20)
+        parser.add_argument("--reports", type=int, default=3,
+                            help="сообщений о заполненности на контейнер")
+        parser.add_argument("--baseline", type=int, default=500,
+                            help="сколько контейнеров выгрузить без "
+                                 "аннотаций для сравнения (0 - не сравнивать)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.generate(options)
+            self.measure(options)
+            transaction.set_rollback(True)
+
+    def generate(self, options) -> None:
+        generate_dataset(
+            seed=options["seed"],
+            buildings=options["buildings"],
+            containers=options["containers"],
+            reports=options["reports"],
+            stdout=self.stdout,
+        )
+
+    def measure(self, options) -> None:
+        containers = container_stats_queryset()
+        self.report("Строки (один запрос)", lambda: [
+            container_row(container) for container in containers.iterator()
+        ])
+
+        if options["baseline"]:
+            plain = Container.objects.filter(
+                ~Q(status=Container.RESERVED)
+            ).order_by("pk")[:options["baseline"]]
+            self.report(f"Строки без аннотаций ({options['baseline']} шт.)", lambda: [
+                container_row(container) for container in plain
+            ])
+
+        def export():
+            with NamedTemporaryFile() as tmp:
+                get_container_stats_xl().save(tmp)
+        self.report("Полная выгрузка .xlsx", export)
+
+    def report(self, title: str, func) -> None:
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{title}: {elapsed:.2f} с, запросов: {len(ctx.captured_queries)}"
+        )
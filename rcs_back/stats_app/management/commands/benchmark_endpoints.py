@@ -0,0 +1,87 @@
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rcs_back.stats_app.endpoint_benchmark import (
+    Measurement,
+    benchmark_client,
+    compare_to_budgets,
+    find_query_growth,
+    load_budgets,
+    measure_endpoints,
+    save_budgets,
+    scaled_dataset,
+)
+from rcs_back.stats_app.synthetic import generate_dataset
+
+# Набор данных, если он не записан вместе с бюджетами
+DEFAULT_DATASET = {
+    "seed": 0,
+    "buildings": 10,
+    "parts": 2,
+    "containers": 1000,
+    "reports": 5,
+    "years": 2,
+    "takeouts": 20,
+}
+
+
+class Command(BaseCommand):
+    help = ("Запрашивает все GET-эндпоинты на синтетических данных и "
+            "сравнивает кол-во запросов к БД с бюджетами "
+            "(stats_app/endpoint_budgets.json). Замер повторяется на "
+            "вдвое меньших данных: кол-во запросов не должно расти с "
+            "данными (кроме KNOWN_QUERY_GROWTH). Время ответа зависит от "
+            "машины, поэтому проверяется только с --check-time, на той "
+            "же машине, где записаны бюджеты (бюджет - время x "
+            "TIME_HEADROOM). Завершается с ошибкой, если бюджет превышен. "
+            "Данные откатываются после замера")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--update", action="store_true",
+                            help="записать текущие значения как бюджеты")
+        parser.add_argument("--check-time", action="store_true",
+                            help="проверять и время ответа")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    @staticmethod
+    def measure(dataset: Dict, repeat: int) -> List[Measurement]:
+        with transaction.atomic():
+            generate_dataset(**dataset)
+            measurements = measure_endpoints(benchmark_client(), repeat)
+            transaction.set_rollback(True)
+        return measurements
+
+    def handle(self, *args, **options):
+        budgets = load_budgets()
+        dataset = budgets["dataset"] or DEFAULT_DATASET
+        measurements = self.measure(dataset, options["repeat"])
+        small_measurements = self.measure(scaled_dataset(dataset), 1)
+
+        for m in measurements:
+            if m.url is None:
+                self.stdout.write(f"{m.route}: нет объекта, пропущен")
+                continue
+            budget = budgets["endpoints"].get(m.route, {})
+            self.stdout.write(
+                f"{m.route}: {m.status}, {m.time_ms:.1f} мс "
+                f"(бюджет {budget.get('time_ms', '-')}), "
+                f"запросов {m.queries} (бюджет {budget.get('queries', '-')}), "
+                f"в БД {m.query_time_ms:.1f} мс"
+            )
+
+        problems = find_query_growth(small_measurements, measurements)
+        if options["update"]:
+            if problems:
+                raise CommandError("Бюджеты не записаны, кол-во запросов "
+                                   "растёт с данными:\n" + "\n".join(problems))
+            save_budgets(measurements, dataset)
+            self.stdout.write(self.style.SUCCESS("Бюджеты записаны"))
+            return
+
+        problems += compare_to_budgets(measurements, budgets,
+                                       check_time=options["check_time"])
+        if problems:
+            raise CommandError("Превышены бюджеты:\n" + "\n".join(problems))
+        self.stdout.write(self.style.SUCCESS("Все эндпоинты в бюджете"))
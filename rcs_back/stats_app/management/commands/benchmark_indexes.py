@@ -0,0 +1,172 @@
+import datetime
+import statistics
+import time
+from typing import Callable, List, Tuple
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from rcs_back.containers_app.models import Container, FullContainerReport
+from rcs_back.stats_app.endpoint_benchmark import (
+    Measurement,
+    benchmark_client,
+    measure_endpoints,
+)
+from rcs_back.stats_app.synthetic import generate_dataset
+from rcs_back.takeouts_app.models import (
+    ContainersTakeoutRequest,
+    TankTakeoutRequest,
+)
+
+# Модели, индексы которых сравниваются
+INDEXED_MODELS = [
+    FullContainerReport,
+    ContainersTakeoutRequest,
+    TankTakeoutRequest,
+]
+
+
+def hot_queries() -> List[Tuple[str, Callable[[Container], QuerySet]]]:
+    """Запросы, для которых добавлены индексы, в том виде, в каком
+    их строят методы моделей (для планов: что именно ускорилось)"""
+    now = timezone.now()
+    month_ago = now - datetime.timedelta(days=31)
+    return [
+        ("Последние сообщения контейнера (last_emptied_report)",
+         lambda c: c.full_reports.order_by("-reported_full_at")[:2]),
+        ("Заполненные сообщения контейнера (fill_time_totals)",
+         lambda c: c.full_reports.filter(
+             filled_at__isnull=False
+         ).order_by("filled_at")),
+        ("Закрытые сообщения контейнера (collected_mass)",
+         lambda c: c.full_reports.filter(emptied_at__isnull=False)),
+        ("Предыдущий вывоз бака (TankTakeoutRequest.fill_time)",
+         lambda c: TankTakeoutRequest.objects.filter(
+             building=c.building_id, created_at__lt=now
+         ).order_by("-created_at")[:1]),
+        ("Подтверждённая масса за месяц (confirmed_collected_mass)",
+         lambda c: TankTakeoutRequest.objects.filter(
+             building=c.building_id,
+             confirmed_mass__isnull=False,
+             confirmed_at__gte=month_ago,
+             confirmed_at__lt=now
+         )),
+        ("Сборы контейнеров здания за месяц (TankTakeoutRequest.mass)",
+         lambda c: ContainersTakeoutRequest.objects.filter(
+             building=c.building_id,
+             created_at__gt=month_ago,
+             created_at__lt=now
+         )),
+        ("Подтверждённые сборы здания (calculated_collected_mass)",
+         lambda c: ContainersTakeoutRequest.objects.filter(
+             building=c.building_id, confirmed_at__isnull=False
+         )),
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает с индексами сообщений о заполненности и сборов "
+            "и без них время ответа всех GET-эндпоинтов (как "
+            "benchmark_endpoints) на синтетических данных, а также планы "
+            "и время отдельных запросов, для которых индексы добавлены. "
+            "Данные создаются в транзакции и откатываются после замера, "
+            "индексы удаляются только внутри неё")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--containers", type=int, default=10000)
+        parser.add_argument("--buildings", type=int, default=20)
+        parser.add_argument("--reports", type=int, default=10,
+                            help="сообщений о заполненности на контейнер")
+        parser.add_argument("--takeouts", type=int, default=100,
+                            help="сборов контейнеров на здание")
+        parser.add_argument("--samples", type=int, default=200,
+                            help="сколько контейнеров опрашивать")
+        parser.add_argument("--repeat", type=int, default=3,
+                            help="повторов запроса к эндпоинту")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            buildings = generate_dataset(
+                seed=options["seed"],
+                buildings=options["buildings"],
+                containers=options["containers"],
+                reports=options["reports"],
+                takeouts=options["takeouts"],
+                stdout=self.stdout,
+            )
+            self.analyze()
+            containers = list(Container.objects.filter(
+                building__in=buildings
+            ).order_by("?")[:options["samples"]])
+
+            client = benchmark_client()
+
+            with_indexes = self.measure(containers)
+            endpoints_with_indexes = measure_endpoints(client,
+                                                       options["repeat"])
+            self.drop_indexes()
+            self.analyze()
+            without_indexes = self.measure(containers)
+            endpoints_without_indexes = measure_endpoints(client,
+                                                          options["repeat"])
+            transaction.set_rollback(True)
+
+        self.write_endpoints(endpoints_with_indexes, endpoints_without_indexes)
+        self.stdout.write(self.style.MIGRATE_HEADING("Отдельные запросы"))
+        for (title, plan, elapsed), (_, old_plan, old_elapsed) in zip(
+                with_indexes, without_indexes):
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(f"  без индексов: {old_elapsed * 1000:.2f} мс")
+            self.stdout.write(self.indent(old_plan))
+            self.stdout.write(f"  с индексами: {elapsed * 1000:.2f} мс")
+            self.stdout.write(self.indent(plan))
+
+    def write_endpoints(self, with_indexes: List[Measurement],
+                        without_indexes: List[Measurement]) -> None:
+        self.stdout.write(self.style.MIGRATE_HEADING("Эндпоинты"))
+        for m, old in zip(with_indexes, without_indexes):
+            if m.url is None or m.status >= 500:
+                continue
+            self.stdout.write(
+                f"  {m.route}: без индексов {old.time_ms:.1f} мс "
+                f"(в БД {old.query_time_ms:.1f} мс), с индексами "
+                f"{m.time_ms:.1f} мс (в БД {m.query_time_ms:.1f} мс)"
+            )
+
+    @staticmethod
+    def indent(plan: str) -> str:
+        return "\n".join(f"    {line}" for line in plan.splitlines())
+
+    @staticmethod
+    def analyze() -> None:
+        """Обновляет статистику планировщика после вставки данных"""
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def measure(self, containers: List[Container]
+                ) -> List[Tuple[str, str, float]]:
+        """План запроса (для первого контейнера) и медианное
+        время его выполнения по всем контейнерам"""
+        results = []
+        for title, query in hot_queries():
+            timings = []
+            for container in containers:
+                start = time.perf_counter()
+                list(query(container))
+                timings.append(time.perf_counter() - start)
+            plan = query(containers[0]).explain()
+            results.append((title, plan, statistics.median(timings)))
+        return results
+
+    def drop_indexes(self) -> None:
+        """Удаляет индексы из Meta.indexes моделей
+        (DROP INDEX откатится вместе с транзакцией)"""
+        # pylint: disable=protected-access
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    cursor.execute(str(index.remove_sql(model, editor)))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rcs_back.stats_app.synthetic import generate_dataset
+
+
+class Command(BaseCommand):
+    help = ("Создаёт синтетические данные для нагрузочного тестирования: "
+            "здания, корпуса, условия для сбора, контейнеры всех видов, "
+            "историю сообщений о заполненности, сборы контейнеров "
+            "и вывозы бака. При одном и том же --seed данные одинаковые. "
+            "Не запускать на рабочей БД")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buildings", type=int, default=50)
+        parser.add_argument("--parts", type=int, default=2,
+                            help="корпусов в здании")
+        parser.add_argument("--containers", type=int, default=10000)
+        parser.add_argument("--reports", type=int, default=10,
+                            help="сообщений о заполненности на контейнер")
+        parser.add_argument("--years", type=int, default=3,
+                            help="за сколько лет история сообщений и сборов")
+        parser.add_argument("--takeouts", type=int, default=150,
+                            help="сборов контейнеров на здание")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            generate_dataset(
+                seed=options["seed"],
+                buildings=options["buildings"],
+                parts=options["parts"],
+                containers=options["containers"],
+                reports=options["reports"],
+                years=options["years"],
+                takeouts=options["takeouts"],
+                stdout=self.stdout,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {time.perf_counter() - start:.1f} с"
+        ))
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.5 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('containers', 'контейнеры'), ('container-takeouts', 'сборы'), ('tank-takeouts', 'вывозы'), ('all', 'вся статистика')], max_length=32, verbose_name='вид отчёта')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='версия данных')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'формируется'), (2, 'готов'), (3, 'ошибка')], default=1, verbose_name='состояние')),
+                ('file', models.FileField(blank=True, upload_to='stats/', verbose_name='файл')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='время создания')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='время формирования')),
+            ],
+            options={
+                'verbose_name': 'отчёт со статистикой',
+                'verbose_name_plural': 'отчёты со статистикой',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='statsreport',
+            index=models.Index(fields=['kind', 'fingerprint'], name='stats_app_s_kind_6d8f09_idx'),
+        ),
+    ]
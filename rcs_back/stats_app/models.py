@@ -0,0 +1,90 @@
+from django.db import models
+from django.utils import timezone
+
+tz = timezone.get_default_timezone()
+
+
+class StatsReport(models.Model):
+    """Модель .xlsx отчёта со статистикой, построенного в фоне.
+    Готовый файл переиспользуется, пока не изменились данные"""
+
+    # Варианты отчёта
+    CONTAINERS = "containers"
+    CONTAINER_TAKEOUTS = "container-takeouts"
+    TANK_TAKEOUTS = "tank-takeouts"
+    ALL = "all"
+    KIND_CHOICES = (
+        (CONTAINERS, "контейнеры"),
+        (CONTAINER_TAKEOUTS, "сборы"),
+        (TANK_TAKEOUTS, "вывозы"),
+        (ALL, "вся статистика"),
+    )
+
+    FILE_PREFIXES = {
+        CONTAINERS: "recycle-starter-container-stats-",
+        CONTAINER_TAKEOUTS: "recycle-starter-container-takeout-stats-",
+        TANK_TAKEOUTS: "recycle-starter-tank-takeout-stats-",
+        ALL: "recycle-starter-stats-",
+    }
+
+    # Варианты статуса
+    PENDING = 1
+    DONE = 2
+    FAILED = 3
+    STATUS_CHOICES = (
+        (PENDING, "формируется"),
+        (DONE, "готов"),
+        (FAILED, "ошибка"),
+    )
+
+    kind = models.CharField(
+        max_length=32,
+        choices=KIND_CHOICES,
+        verbose_name="вид отчёта"
+    )
+
+    fingerprint = models.CharField(
+        max_length=64,
+        verbose_name="версия данных"
+    )
+
+    status = models.PositiveSmallIntegerField(
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name="состояние"
+    )
+
+    file = models.FileField(
+        upload_to="stats/",
+        blank=True,
+        verbose_name="файл"
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="время создания"
+    )
+
+    finished_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="время формирования"
+    )
+
+    def file_name(self) -> str:
+        """Имя файла для скачивания"""
+        fname = self.FILE_PREFIXES[self.kind]
+        fname += self.created_at.astimezone(tz).strftime("%d.%m.%Y")
+        fname += ".xlsx"
+        return fname
+
+    def __str__(self) -> str:
+        return (f"Отчёт «{self.get_kind_display()}» от "
+                f"{self.created_at.astimezone(tz).strftime('%d.%m.%Y %H:%M')}")
+
+    class Meta:
+        verbose_name = "отчёт со статистикой"
+        verbose_name_plural = "отчёты со статистикой"
+        indexes = [
+            models.Index(fields=["kind", "fingerprint"]),
+        ]
@@ -0,0 +1,112 @@
+import datetime
+import hashlib
+from typing import Dict, Tuple, Type
+
+from django.db.models import Aggregate, Count, Max, Sum
+from django.db.models.functions import TruncMonth, TruncYear
+from django.db.models.functions.datetime import TruncBase
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from rcs_back.containers_app.models import (
+    Building,
+    BuildingPart,
+    Container,
+    FullContainerReport,
+)
+from rcs_back.takeouts_app.models import ContainersTakeoutRequest, TankTakeoutRequest
+
+# {(id здания, дата начала периода): значение}
+PeriodStats = Dict[Tuple[int, datetime.date], int]
+
+
+def aggregate_by_period(queryset: QuerySet,
+                        date_field: str,
+                        trunc: Type[TruncBase],
+                        aggregate: Aggregate) -> PeriodStats:
+    """Группирует queryset по зданию и периоду (месяц/год)
+    одним GROUP BY запросом"""
+    rows = queryset.annotate(
+        period=trunc(date_field)
+    ).values(
+        "building", "period"
+    ).annotate(
+        value=aggregate
+    ).order_by()
+    return {
+        (row["building"], timezone.localtime(row["period"]).date()): row["value"]
+        for row in rows
+    }
+
+
+def period_range(start_date: datetime.date,
+                 end_date: datetime.date) -> Tuple[datetime.datetime, datetime.datetime]:
+    """Границы периода в текущем часовом поясе"""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.datetime.combine(start_date, datetime.time()), tz),
+        timezone.make_aware(datetime.datetime.combine(end_date, datetime.time()), tz),
+    )
+
+
+def confirmed_mass_per_period(start_date: datetime.date,
+                              end_date: datetime.date,
+                              yearly: bool = False) -> PeriodStats:
+    """Подтверждённая после вывозов баков масса
+    по зданиям за каждый месяц (или год) в [start_date, end_date)"""
+    start, end = period_range(start_date, end_date)
+    return aggregate_by_period(
+        TankTakeoutRequest.objects.filter(
+            confirmed_mass__isnull=False,
+            confirmed_at__gte=start,
+            confirmed_at__lt=end
+        ),
+        "confirmed_at",
+        TruncYear if yearly else TruncMonth,
+        Sum("confirmed_mass")
+    )
+
+
+def activations_per_month(start_date: datetime.date,
+                          end_date: datetime.date) -> PeriodStats:
+    """Кол-во активированных контейнеров по зданиям
+    за каждый месяц в [start_date, end_date)"""
+    start, end = period_range(start_date, end_date)
+    return aggregate_by_period(
+        Container.objects.filter(
+            activated_at__gte=start,
+            activated_at__lt=end
+        ),
+        "activated_at",
+        TruncMonth,
+        Count("pk")
+    )
+
+
+def data_fingerprint() -> str:
+    """Версия данных, из которых строится статистика.
+    Меняется при добавлении/удалении записей, новых сообщениях
+    о заполненности, сборах и вывозах. Правки без отметки времени
+    (например, описание контейнера) не отслеживаются, поэтому
+    в версию входит текущий час: текущие времена заполнения
+    в отчёте тоже считаются с точностью до часа"""
+    snapshot = [
+        timezone.localtime().strftime("%Y-%m-%d %H"),
+        Building.objects.aggregate(Count("pk"), Max("pk")),
+        BuildingPart.objects.aggregate(Count("pk"), Max("pk")),
+        Container.objects.aggregate(
+            Count("pk"), Max("pk"), Max("activated_at"),
+            Max("filled_at"), Max("emptied_at")
+        ),
+        FullContainerReport.objects.aggregate(
+            Count("pk"), Max("pk"), Sum("count"),
+            Max("filled_at"), Max("emptied_at")
+        ),
+        ContainersTakeoutRequest.objects.aggregate(
+            Count("pk"), Max("pk"), Max("confirmed_at")
+        ),
+        TankTakeoutRequest.objects.aggregate(
+            Count("pk"), Max("pk"), Max("confirmed_at"), Sum("confirmed_mass")
+        ),
+    ]
+    return hashlib.sha256(str(snapshot).encode()).hexdigest()
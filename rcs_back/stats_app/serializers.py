@@ -0,0 +1,24 @@
+from rest_framework import serializers
+
+from .models import StatsReport
+
+
+class StatsReportSerializer(serializers.ModelSerializer):
+    """Сериализатор фонового отчёта со статистикой"""
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = StatsReport
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "created_at",
+            "finished_at",
+            "download"
+        ]
+
+    def get_download(self, obj: StatsReport):
+        if obj.status == StatsReport.DONE:
+            return f"/api/stats/reports/{obj.pk}/download"
+        return None
@@ -0,0 +1,282 @@
+import datetime
+import random
+from contextlib import contextmanager
+from typing import Dict, List
+
+from django.db import connection
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from rcs_back.containers_app.models import (
+    Building,
+    BuildingPart,
+    Container,
+    FullContainerReport,
+)
+from rcs_back.takeouts_app.models import (
+    ContainersTakeoutRequest,
+    TakeoutCondition,
+    TankTakeoutRequest,
+)
+
+BATCH_SIZE = 1000
+# Доли контейнеров по состоянию
+STATUS_WEIGHTS = {
+    Container.ACTIVE: 90,
+    Container.WAITING: 5,
+    Container.INACTIVE: 5,
+}
+# Сколько контейнеров здания выбирается в один сбор
+CONTAINERS_PER_TAKEOUT = 10
+
+
+def bulk_create(model, objs: list) -> list:
+    """bulk_create, который возвращает объекты с pk
+    и на тех БД, где INSERT не возвращает id (sqlite)"""
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    max_pk = model.objects.aggregate(max_pk=Max("pk"))["max_pk"] or 0
+    model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    return list(model.objects.filter(pk__gt=max_pk).order_by("pk"))
+
+
+@contextmanager
+def explicit_auto_now_add(*fields):
+    """Позволяет задать значения полей с auto_now_add
+    при bulk_create (для истории в прошлом)"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def generate_dataset(seed: int = 0,
+                     buildings: int = 20,
+                     parts: int = 2,
+                     containers: int = 10000,
+                     reports: int = 3,
+                     years: int = 1,
+                     takeouts: int = 0,
+                     stdout=None) -> List[Building]:
+    """Создаёт синтетические здания (по parts корпусов), условия
+    для сбора, контейнеры всех видов с историей сообщений
+    о заполненности за years лет и takeouts сборов контейнеров
+    (и вывозов бака) на здание. Всё создаётся через bulk_create,
+    сигналы не вызываются. При одном и том же seed данные одинаковые"""
+    rnd = random.Random(seed)
+    now = timezone.now()
+    start = now - datetime.timedelta(days=365 * years)
+
+    building_objs = bulk_create(Building, [
+        Building(address=f"ул. Синтетическая {i}")
+        for i in range(buildings)
+    ])
+    part_objs = bulk_create(BuildingPart, [
+        BuildingPart(building=building, num=str(num))
+        for building in building_objs for num in range(1, parts + 1)
+    ])
+    TakeoutCondition.objects.bulk_create(
+        [TakeoutCondition(building=building, office_days=3,
+                          public_days=2, ignore_reports=1,
+                          mass=rnd.choice([None, 100, 500]))
+         for building in building_objs] +
+        [TakeoutCondition(building_part=part, office_days=2)
+         for part in part_objs]
+    )
+    building_parts: Dict[int, List[BuildingPart]] = {}
+    for part in part_objs:
+        building_parts.setdefault(part.building_id, []).append(part)
+
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    container_objs = []
+    for i in range(containers):
+        building = building_objs[i % buildings]
+        container_objs.append(Container(
+            kind=Container.KIND_CHOICES[i % len(Container.KIND_CHOICES)][0],
+            building=building,
+            building_part=rnd.choice(
+                [None] + building_parts.get(building.pk, [])
+            ),
+            floor=rnd.randint(1, 9),
+            room=str(rnd.randint(100, 999)),
+            status=rnd.choices(statuses, weights)[0],
+            activated_at=start,
+        ))
+    container_objs = bulk_create(Container, container_objs)
+
+    # Сообщения равномерно (со случайным сдвигом) за весь период,
+    # последнее остаётся незакрытым
+    step = (now - start) / (reports + 1)
+    report_objs = []
+    for container in container_objs:
+        for i in range(reports):
+            filled_at = start + step * (i + rnd.uniform(0.5, 1))
+            is_last = i == reports - 1
+            report_objs.append(FullContainerReport(
+                container=container,
+                count=rnd.randint(1, 3),
+                by_staff=rnd.random() < 0.2,
+                reported_full_at=filled_at,
+                filled_at=filled_at,
+                emptied_at=None if is_last else filled_at + step * rnd.uniform(0, 0.5),
+            ))
+    with explicit_auto_now_add(
+            FullContainerReport._meta.get_field("reported_full_at")):
+        FullContainerReport.objects.bulk_create(report_objs,
+                                                batch_size=BATCH_SIZE)
+    set_container_state(building_objs)
+    set_container_averages(container_objs, report_objs)
+
+    takeout_count = 0
+    if takeouts:
+        takeout_count = generate_takeouts(rnd, building_objs, container_objs,
+                                          takeouts, start, now)
+
+    if stdout:
+        stdout.write(
+            f"Создано зданий: {buildings}, корпусов: {len(part_objs)}, "
+            f"контейнеров: {containers}, сообщений: {len(report_objs)}, "
+            f"сборов и вывозов: {takeout_count}"
+        )
+    return building_objs
+
+
+def set_container_state(buildings: List[Building]) -> None:
+    """Текущее состояние контейнеров по созданной истории
+    (как backfill_container_state, но одним UPDATE)"""
+    open_reports = FullContainerReport.objects.filter(
+        container=OuterRef("pk"),
+        emptied_at__isnull=True
+    ).order_by("-reported_full_at")
+    emptied_reports = FullContainerReport.objects.filter(
+        container=OuterRef("pk"),
+        emptied_at__isnull=False
+    ).order_by("-emptied_at")
+    containers = Container.objects.filter(building__in=buildings)
+    containers.update(
+        open_report=Subquery(open_reports.values("pk")[:1]),
+        open_report_count=Coalesce(
+            Subquery(open_reports.values("count")[:1]), 0
+        ),
+        filled_at=Subquery(open_reports.values("filled_at")[:1]),
+        emptied_at=Subquery(emptied_reports.values("emptied_at")[:1]),
+    )
+    # Полные по незакрытому сообщению (как Container.is_full)
+    Container.objects.filter(
+        pk__in=containers.full().values("pk")
+    ).update(_is_full=True)
+
+
+def set_container_averages(containers: List[Container],
+                           reports: List[FullContainerReport]) -> None:
+    """Суммы и средние времён заполнения и ожидания выноса по созданной
+    истории (как fill_time_totals и takeout_wait_time_totals),
+    чтобы verify_container_averages не находил расхождений"""
+    container_reports: Dict[int, List[FullContainerReport]] = {}
+    for report in reports:
+        container_reports.setdefault(report.container_id, []).append(report)
+    for container in containers:
+        history = sorted(container_reports.get(container.pk, []),
+                         key=lambda report: report.filled_at)
+        fill_times = []
+        if container.activated_at and history:
+            fill_times.append(history[0].filled_at - container.activated_at)
+        fill_times += [
+            report.filled_at - previous.emptied_at
+            for previous, report in zip(history, history[1:])
+            if previous.emptied_at
+        ]
+        wait_times = [report.emptied_at - report.filled_at
+                      for report in history if report.emptied_at]
+        container.fill_time_sum = sum(fill_times, datetime.timedelta())
+        container.fill_time_count = len(fill_times)
+        container.avg_fill_time = (
+            container.fill_time_sum / len(fill_times) if fill_times else None
+        )
+        container.takeout_wait_time_sum = sum(wait_times, datetime.timedelta())
+        container.takeout_wait_time_count = len(wait_times)
+        container.avg_takeout_wait_time = (
+            container.takeout_wait_time_sum / len(wait_times)
+            if wait_times else None
+        )
+    Container.objects.bulk_update(containers, [
+        "fill_time_sum", "fill_time_count", "avg_fill_time",
+        "takeout_wait_time_sum", "takeout_wait_time_count",
+        "avg_takeout_wait_time",
+    ], batch_size=BATCH_SIZE)
+
+
+def generate_takeouts(rnd: random.Random, buildings: List[Building],
+                      containers: List[Container], takeouts: int,
+                      start: datetime.datetime, now: datetime.datetime) -> int:
+    """Сборы контейнеров здания с выбранными и опустошёнными
+    контейнерами, вывоз бака - после каждого четвёртого сбора.
+    Возвращает кол-во созданных сборов и вывозов"""
+    building_containers: Dict[int, List[Container]] = {}
+    for container in containers:
+        building_containers.setdefault(container.building_id, []).append(container)
+
+    step = (now - start) / takeouts
+    container_takeouts = []
+    tank_takeouts = []
+    selected = []
+    for building in buildings:
+        candidates = building_containers.get(building.pk, [])
+        for i in range(takeouts):
+            created_at = start + step * i
+            confirmed_at = created_at + datetime.timedelta(
+                hours=rnd.randint(1, 72)
+            )
+            takeout = ContainersTakeoutRequest(
+                building=building,
+                created_at=created_at,
+                confirmed_at=confirmed_at if rnd.random() < 0.9 else None,
+            )
+            container_takeouts.append(takeout)
+            selected.append(rnd.sample(
+                candidates, min(CONTAINERS_PER_TAKEOUT, len(candidates))
+            ))
+            if i % 4 == 3:
+                # Бак вывозят после нескольких сборов
+                tank_takeout = TankTakeoutRequest(
+                    building=building,
+                    created_at=confirmed_at,
+                    confirmed_at=confirmed_at + datetime.timedelta(days=1),
+                    confirmed_mass=rnd.randint(50, 500),
+                )
+                tank_takeouts.append(tank_takeout)
+
+    with explicit_auto_now_add(
+            ContainersTakeoutRequest._meta.get_field("created_at"),
+            TankTakeoutRequest._meta.get_field("created_at")):
+        container_takeouts = bulk_create(ContainersTakeoutRequest,
+                                         container_takeouts)
+        TankTakeoutRequest.objects.bulk_create(tank_takeouts,
+                                               batch_size=BATCH_SIZE)
+
+    # Связи многие-ко-многим: выбранные контейнеры
+    # и опустошённые (у подтверждённых сборов)
+    containers_through = ContainersTakeoutRequest.containers.through
+    emptied_through = ContainersTakeoutRequest.emptied_containers.through
+    containers_links = []
+    emptied_links = []
+    for takeout, takeout_containers in zip(container_takeouts, selected):
+        for container in takeout_containers:
+            containers_links.append(containers_through(
+                containerstakeoutrequest_id=takeout.pk,
+                container_id=container.pk
+            ))
+            if takeout.confirmed_at and rnd.random() < 0.9:
+                emptied_links.append(emptied_through(
+                    containerstakeoutrequest_id=takeout.pk,
+                    container_id=container.pk
+                ))
+    containers_through.objects.bulk_create(containers_links,
+                                           batch_size=BATCH_SIZE)
+    emptied_through.objects.bulk_create(emptied_links, batch_size=BATCH_SIZE)
+    return len(container_takeouts) + len(tank_takeouts)
@@ -0,0 +1,184 @@
+import logging
+import time
+from typing import Dict, List, Optional, Sequence
+
+from celery import current_app
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+)
+from django_redis import get_redis_connection
+from kombu.exceptions import KombuError
+from redis.exceptions import RedisError
+
+from rcs_back.utils.metrics import INF, bucket, split_histograms
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм времени выполнения и ожидания в очереди
+TASK_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+                   30000, 60000, 300000)
+
+TASK_METRICS_PREFIX = "task-metrics"
+TASK_NAMES_KEY = f"{TASK_METRICS_PREFIX}:tasks"
+# Заголовок сообщения со временем постановки задачи в очередь
+SENT_AT_HEADER = "sent_at"
+
+# Время начала выполнения задач этого процесса по id задачи
+_started: Dict[str, float] = {}
+
+
+def task_key(task_name: str) -> str:
+    return f"{TASK_METRICS_PREFIX}:{task_name}"
+
+
+@before_task_publish.connect
+def add_sent_at(headers=None, **kwargs):
+    """Время отправки задачи, по нему считается ожидание в очереди"""
+    if headers is not None:
+        headers.setdefault(SENT_AT_HEADER, time.time())
+
+
+@task_prerun.connect
+def task_started(task_id=None, **kwargs):
+    _started[task_id] = time.time()
+
+
+@task_postrun.connect
+def task_finished(task_id=None, task=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is None or task is None:
+        return
+    runtime_ms = (time.time() - started) * 1000
+    # Без брокера (CELERY_TASK_ALWAYS_EAGER) заголовка нет
+    sent_at = getattr(task.request, SENT_AT_HEADER, None)
+    wait_ms = max((started - sent_at) * 1000, 0) if sent_at else None
+    try:
+        record_task(task.name, runtime_ms, wait_ms)
+    except RedisError:
+        logger.warning("Не удалось записать метрики задачи", exc_info=True)
+
+
+@task_failure.connect
+def task_failed(sender=None, **kwargs):
+    try:
+        get_redis_connection("default").hincrby(
+            task_key(sender.name), "failures", 1
+        )
+    except RedisError:
+        logger.warning("Не удалось записать метрики задачи", exc_info=True)
+
+
+def record_task(task_name: str, runtime_ms: float,
+                wait_ms: Optional[float]) -> None:
+    key = task_key(task_name)
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    pipe.sadd(TASK_NAMES_KEY, task_name)
+    pipe.hincrby(key, "count", 1)
+    pipe.hincrbyfloat(key, "runtime_ms", runtime_ms)
+    pipe.hincrby(key, f"runtime:{bucket(runtime_ms, TASK_BUCKETS_MS)}", 1)
+    if wait_ms is not None:
+        pipe.hincrby(key, "wait_count", 1)
+        pipe.hincrbyfloat(key, "wait_ms", wait_ms)
+        pipe.hincrby(key, f"wait:{bucket(wait_ms, TASK_BUCKETS_MS)}", 1)
+    pipe.execute()
+
+
+def reset_task_metrics() -> None:
+    redis = get_redis_connection("default")
+    names = [n.decode() for n in redis.smembers(TASK_NAMES_KEY)]
+    redis.delete(TASK_NAMES_KEY, *[task_key(n) for n in names])
+
+
+def queue_names() -> List[str]:
+    queues = current_app.conf.task_queues
+    if queues:
+        return [queue.name for queue in queues]
+    return [current_app.conf.task_default_queue]
+
+
+def queue_depths() -> Dict[str, int]:
+    """Кол-во сообщений в очередях брокера
+    (пусто, если брокер недоступен)"""
+    depths = {}
+    try:
+        with current_app.connection_for_read() as conn:
+            conn.ensure_connection(max_retries=1)
+            channel = conn.default_channel
+            for name in queue_names():
+                try:
+                    depths[name] = channel.queue_declare(
+                        name, passive=True
+                    ).message_count
+                except conn.channel_errors:
+                    # Очередь ещё не создана
+                    depths[name] = 0
+    except (KombuError, OSError):
+        logger.warning("Брокер недоступен", exc_info=True)
+    return depths
+
+
+def histogram_lines(metric: str, labels: str, histogram: Dict[str, int],
+                    buckets: Sequence[int], total_ms: float,
+                    count: int) -> List[str]:
+    """Гистограмма в формате Prometheus: накопительные
+    корзины в секундах, сумма и кол-во"""
+    lines = []
+    seen = 0
+    for upper in [str(b) for b in buckets] + [INF]:
+        seen += histogram.get(upper, 0)
+        le = upper if upper == INF else str(int(upper) / 1000)
+        lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {seen}')
+    lines.append(f"{metric}_sum{{{labels}}} {total_ms / 1000}")
+    lines.append(f"{metric}_count{{{labels}}} {count}")
+    return lines
+
+
+def prometheus_metrics() -> str:
+    """Метрики задач Celery в текстовом формате Prometheus"""
+    redis = get_redis_connection("default")
+    names = sorted(n.decode() for n in redis.smembers(TASK_NAMES_KEY))
+    pipe = redis.pipeline(transaction=False)
+    for name in names:
+        pipe.hgetall(task_key(name))
+
+    runtime, wait, failures = [], [], []
+    for name, raw in zip(names, pipe.execute()):
+        fields = {k.decode(): v.decode() for k, v in raw.items()}
+        histograms = split_histograms(fields)
+        labels = f'task="{name}"'
+        runtime += histogram_lines(
+            "celery_task_runtime_seconds", labels,
+            histograms.get("runtime", {}), TASK_BUCKETS_MS,
+            float(fields.get("runtime_ms", 0)), int(fields.get("count", 0))
+        )
+        if "wait_count" in fields:
+            wait += histogram_lines(
+                "celery_task_wait_seconds", labels,
+                histograms.get("wait", {}), TASK_BUCKETS_MS,
+                float(fields["wait_ms"]), int(fields["wait_count"])
+            )
+        failures.append(
+            f"celery_task_failures_total{{{labels}}} {fields.get('failures', 0)}"
+        )
+
+    lines = [
+        "# HELP celery_task_runtime_seconds Время выполнения задачи",
+        "# TYPE celery_task_runtime_seconds histogram",
+        *runtime,
+        "# HELP celery_task_wait_seconds Время ожидания задачи в очереди",
+        "# TYPE celery_task_wait_seconds histogram",
+        *wait,
+        "# HELP celery_task_failures_total Кол-во задач, завершившихся ошибкой",
+        "# TYPE celery_task_failures_total counter",
+        *failures,
+        "# HELP celery_queue_length Кол-во сообщений в очереди",
+        "# TYPE celery_queue_length gauge",
+    ]
+    lines += [
+        f'celery_queue_length{{queue="{name}"}} {depth}'
+        for name, depth in queue_depths().items()
+    ]
+    return "\n".join(lines) + "\n"
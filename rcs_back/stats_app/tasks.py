@@ -0,0 +1,68 @@
+import datetime
+from tempfile import NamedTemporaryFile
+
+from celery import shared_task
+from django.core.files import File
+from django.utils import timezone
+
+from rcs_back.stats_app.excel import (
+    get_all_stats_xl,
+    get_container_stats_xl,
+    get_container_takeout_stats_xl,
+    get_tank_takeout_stats_xl,
+)
+from rcs_back.stats_app.models import StatsReport
+
+XL_BUILDERS = {
+    StatsReport.CONTAINERS: get_container_stats_xl,
+    StatsReport.CONTAINER_TAKEOUTS: get_container_takeout_stats_xl,
+    StatsReport.TANK_TAKEOUTS: get_tank_takeout_stats_xl,
+    StatsReport.ALL: get_all_stats_xl,
+}
+
+# Сколько хранятся прошлые версии отчёта: клиент мог
+# получить их id и ещё не успеть скачать файл
+OUTDATED_REPORT_AGE = datetime.timedelta(days=1)
+
+# Ограничения времени формирования отчёта: общие
+# CELERY_TASK_SOFT_TIME_LIMIT/CELERY_TASK_TIME_LIMIT рассчитаны
+# на короткие задачи. После REPORT_TIME_LIMIT задача точно
+# не выполняется, и незаконченный отчёт строится заново
+REPORT_SOFT_TIME_LIMIT = 10 * 60
+REPORT_TIME_LIMIT = REPORT_SOFT_TIME_LIMIT + 60
+
+
+@shared_task(soft_time_limit=REPORT_SOFT_TIME_LIMIT,
+             time_limit=REPORT_TIME_LIMIT)
+def build_stats_report(report_id: int) -> None:
+    """Формирует .xlsx отчёт и сохраняет его в media"""
+    report: StatsReport = StatsReport.objects.get(pk=report_id)
+    if report.status != StatsReport.PENDING:
+        # Отчёт признан зависшим и уже строится заново
+        return
+    try:
+        workbook = XL_BUILDERS[report.kind]()
+        with NamedTemporaryFile() as tmp:
+            workbook.save(tmp)
+            tmp.seek(0)
+            report.file.save(
+                f"{report.kind}-{report.fingerprint}.xlsx",
+                File(tmp),
+                save=False
+            )
+    except Exception:
+        report.status = StatsReport.FAILED
+        report.save()
+        raise
+    report.status = StatsReport.DONE
+    report.finished_at = timezone.now()
+    report.save()
+
+    # Давно построенные версии этого отчёта больше не понадобятся
+    outdated: StatsReport
+    for outdated in StatsReport.objects.filter(
+        kind=report.kind,
+        created_at__lt=report.finished_at - OUTDATED_REPORT_AGE
+    ).exclude(pk=report.pk).exclude(status=StatsReport.PENDING):
+        outdated.file.delete(save=False)
+        outdated.delete()
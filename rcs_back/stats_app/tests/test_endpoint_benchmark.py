@@ -0,0 +1,74 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from rcs_back.containers_app.views import ContainerCountView, ContainerListView
+from rcs_back.stats_app.endpoint_benchmark import (
+    Endpoint,
+    Measurement,
+    collect_endpoints,
+    compare_to_budgets,
+    endpoint_url,
+    find_query_growth,
+    measure_endpoint,
+    scaled_dataset,
+)
+from rcs_back.stats_app.synthetic import generate_dataset
+from rcs_back.stats_app.views import StatsReportDetailView
+
+
+class EndpointBenchmarkTests(TestCase):
+
+    def test_collect_endpoints(self):
+        endpoints = {e.route: e.view_class for e in collect_endpoints()}
+        self.assertIs(endpoints["/api/containers"], ContainerListView)
+        self.assertIs(endpoints["/api/stats/reports/<int:pk>"],
+                      StatsReportDetailView)
+        # Только GET, без админки и djoser
+        self.assertNotIn("/api/full-container-reports/bulk", endpoints)
+        self.assertFalse(any("auth/users/activation" in route
+                             for route in endpoints))
+
+    def test_regression_detected(self):
+        generate_dataset(buildings=3, containers=6, reports=2)
+        client = APIClient()
+        endpoint = Endpoint("/api/container-count", ContainerCountView)
+        measurement = measure_endpoint(client, endpoint, repeat=1)
+        self.assertEqual(measurement.status, 200)
+
+        budgets = {"endpoints": {endpoint.route: {
+            "queries": measurement.queries, "time_ms": 10 ** 6
+        }}}
+        self.assertEqual(compare_to_budgets([measurement], budgets), [])
+        budgets["endpoints"][endpoint.route]["queries"] -= 1
+        self.assertEqual(len(compare_to_budgets([measurement], budgets)), 1)
+
+    def test_missing_object_skipped(self):
+        endpoint = Endpoint("/api/stats/reports/<int:pk>", StatsReportDetailView)
+        self.assertIsNone(endpoint_url(endpoint))
+
+    def test_query_growth_detected(self):
+        self.assertEqual(
+            scaled_dataset({"seed": 0, "buildings": 10, "containers": 1000,
+                            "takeouts": 20}),
+            {"seed": 0, "buildings": 5, "containers": 500, "takeouts": 20}
+        )
+        small = [Measurement("/a", "/a", 200, 5, 0, 0),
+                 Measurement("/b", "/b", 200, 5, 0, 0)]
+        large = [Measurement("/a", "/a", 200, 5, 0, 0),
+                 Measurement("/b", "/b", 200, 9, 0, 0)]
+        problems = find_query_growth(small, large, known={})
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0].startswith("/b:"))
+        self.assertEqual(
+            find_query_growth(small, large, known={"/b": "причина"}), []
+        )
+
+    def test_container_count_queries_constant(self):
+        client = APIClient()
+        endpoint = Endpoint("/api/container-count", ContainerCountView)
+        generate_dataset(buildings=2, containers=4, reports=2, takeouts=4)
+        small = measure_endpoint(client, endpoint, repeat=1)
+        generate_dataset(seed=1, buildings=4, containers=8, reports=2,
+                         takeouts=4)
+        large = measure_endpoint(client, endpoint, repeat=1)
+        self.assertEqual(find_query_growth([small], [large], known={}), [])
@@ -0,0 +1,103 @@
+from unittest import skipUnless
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from rcs_back.containers_app.models import Building, Container
+from rcs_back.containers_app.tests.test_report_buffer import redis_available
+from rcs_back.users_app.models import User
+from rcs_back.utils.metrics import (
+    LATENCY_BUCKETS_MS,
+    bucket,
+    percentile,
+    request_stats,
+    reset_request_stats,
+)
+
+
+class HistogramTests(SimpleTestCase):
+
+    def test_bucket(self):
+        self.assertEqual(bucket(3, LATENCY_BUCKETS_MS), "5")
+        self.assertEqual(bucket(5, LATENCY_BUCKETS_MS), "5")
+        self.assertEqual(bucket(6, LATENCY_BUCKETS_MS), "10")
+        self.assertEqual(bucket(10 ** 6, LATENCY_BUCKETS_MS), "+Inf")
+
+    def test_percentile(self):
+        histogram = {"5": 90, "100": 9, "+Inf": 1}
+        self.assertEqual(percentile(histogram, LATENCY_BUCKETS_MS, 0.5), 5)
+        self.assertEqual(percentile(histogram, LATENCY_BUCKETS_MS, 0.95), 100)
+        self.assertEqual(percentile(histogram, LATENCY_BUCKETS_MS, 1),
+                         float("inf"))
+        self.assertIsNone(percentile({}, LATENCY_BUCKETS_MS, 0.95))
+
+
+class RequestMetricsMiddlewareTests(APITestCase):
+
+    def setUp(self):
+        building = Building.objects.create(address="ул. Тестовая 40")
+        Container.objects.create(
+            kind=Container.ECOBOX,
+            building=building,
+            floor=1,
+            status=Container.ACTIVE
+        )
+
+    @override_settings(REQUEST_METRICS=True, DEBUG=True)
+    def test_server_timing(self):
+        resp = self.client.get("/api/container-count")
+        self.assertEqual(resp.status_code, 200)
+        self.assertRegex(
+            resp["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="[1-9]\d* queries", total;dur=[\d.]+$'
+        )
+
+    def test_disabled(self):
+        resp = self.client.get("/api/container-count")
+        self.assertNotIn("Server-Timing", resp)
+
+
+@skipUnless(redis_available(), "нужен Redis")
+@override_settings(REQUEST_METRICS=True, DEBUG=False)
+class RequestMetricsViewTests(APITestCase):
+
+    def setUp(self):
+        reset_request_stats()
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="password"
+        )
+
+    def test_aggregated_per_route(self):
+        building = Building.objects.create(address="ул. Тестовая 41")
+        container = Container.objects.create(
+            kind=Container.ECOBOX,
+            building=building,
+            floor=1,
+            status=Container.ACTIVE
+        )
+        for _ in range(3):
+            self.client.get(f"/api/containers/{container.pk}")
+        self.client.get("/api/container-count")
+
+        stats = {s["endpoint"]: s for s in request_stats()}
+        detail = stats["GET /api/containers/<int:pk>"]
+        self.assertEqual(detail["count"], 3)
+        self.assertGreater(detail["avg_bytes"], 0)
+        self.assertIsNotNone(detail["p95_ms"])
+        self.assertEqual(stats["GET /api/container-count"]["count"], 1)
+
+    def test_staff_only(self):
+        user = User.objects.create_user(
+            email="user@example.com", password="password"
+        )
+        self.client.force_authenticate(user)
+        resp = self.client.get("/api/stats/request-metrics")
+        self.assertEqual(resp.status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        resp = self.client.get("/api/stats/request-metrics", {"limit": 1})
+        self.assertEqual(resp.status_code, 200)
+        # Учтён предыдущий запрос
+        self.assertEqual(len(resp.data["by_latency"]), 1)
+        self.assertEqual(resp.data["by_queries"][0]["endpoint"],
+                         "GET /api/stats/request-metrics")
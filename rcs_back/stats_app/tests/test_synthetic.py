@@ -0,0 +1,56 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from rcs_back.containers_app.models import Container, FullContainerReport
+from rcs_back.stats_app.synthetic import generate_dataset
+from rcs_back.takeouts_app.models import (
+    ContainersTakeoutRequest,
+    TakeoutCondition,
+    TankTakeoutRequest,
+)
+
+
+class SyntheticDatasetTests(TestCase):
+
+    def generate(self, seed: int) -> list:
+        buildings = generate_dataset(seed=seed, buildings=2, parts=1,
+                                     containers=9, reports=4, years=2,
+                                     takeouts=8)
+        return list(Container.objects.filter(
+            building__in=buildings
+        ).order_by("pk").values_list(
+            "kind", "floor", "room", "status", "open_report_count"
+        ))
+
+    def test_dataset(self):
+        call_command("generate_synthetic_data", buildings=2, parts=1,
+                     containers=9, reports=4, takeouts=8, stdout=StringIO())
+        self.assertEqual(
+            set(Container.objects.values_list("kind", flat=True)),
+            {kind for kind, _ in Container.KIND_CHOICES}
+        )
+        self.assertEqual(TakeoutCondition.objects.count(), 4)
+        self.assertEqual(FullContainerReport.objects.count(), 36)
+        # Последнее сообщение каждого контейнера не закрыто
+        self.assertEqual(
+            Container.objects.filter(open_report__isnull=False).count(), 9
+        )
+        self.assertEqual(ContainersTakeoutRequest.objects.count(), 16)
+        self.assertEqual(TankTakeoutRequest.objects.count(), 4)
+        self.assertTrue(ContainersTakeoutRequest.objects.filter(
+            containers__isnull=False,
+            emptied_containers__isnull=False
+        ).exists())
+        # Текущее состояние и средние - как по истории сообщений
+        for container in Container.objects.with_current_state():
+            self.assertEqual(container._is_full, container.is_full())
+        self.assertTrue(Container.objects.filter(_is_full=True).exists())
+        out = StringIO()
+        call_command("verify_container_averages", stdout=out)
+        self.assertIn("с расхождениями: 0", out.getvalue())
+
+    def test_deterministic(self):
+        self.assertEqual(self.generate(seed=1), self.generate(seed=1))
+        self.assertNotEqual(self.generate(seed=1), self.generate(seed=2))
@@ -0,0 +1,113 @@
+from unittest import mock, skipUnless
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from config.celery_app import app
+from rcs_back.containers_app.models import Building
+from rcs_back.containers_app.tasks import (
+    building_check_conditions,
+    container_add_report,
+)
+from rcs_back.containers_app.tests.test_report_buffer import redis_available
+from rcs_back.notifications_app.tasks import send_outbox_emails
+from rcs_back.stats_app.task_metrics import (
+    TASK_BUCKETS_MS,
+    histogram_lines,
+    prometheus_metrics,
+    queue_names,
+    record_task,
+    reset_task_metrics,
+)
+
+
+class HistogramLinesTests(SimpleTestCase):
+
+    def test_cumulative_buckets_in_seconds(self):
+        lines = histogram_lines("m", 'task="t"', {"10": 2, "1000": 1, "+Inf": 1},
+                                TASK_BUCKETS_MS, 400000, 4)
+        self.assertIn('m_bucket{task="t",le="0.01"} 2', lines)
+        self.assertIn('m_bucket{task="t",le="0.5"} 2', lines)
+        self.assertIn('m_bucket{task="t",le="1.0"} 3', lines)
+        self.assertIn('m_bucket{task="t",le="+Inf"} 4', lines)
+        self.assertEqual(lines[-2:], ['m_sum{task="t"} 400.0',
+                                      'm_count{task="t"} 4'])
+
+
+class TaskRoutesTests(SimpleTestCase):
+
+    def route(self, task_name: str) -> str:
+        return app.amqp.router.route({}, task_name)["queue"].name
+
+    def test_project_tasks_routed_to_known_queues(self):
+        queues = set(queue_names())
+        self.assertEqual(queues, {"fullness", "notifications", "pdf",
+                                  "reports", "celery"})
+        # Задачи всех приложений, как при запуске worker
+        app.loader.import_default_modules()
+        names = [name for name in app.tasks if name.startswith("rcs_back.")]
+        self.assertIn("rcs_back.stats_app.tasks.build_stats_report", names)
+        for name in names:
+            self.assertIn(self.route(name), queues - {"celery"}, name)
+
+    def test_fullness_separated_from_notifications(self):
+        self.assertEqual(self.route(container_add_report.name), "fullness")
+        # PDF рисуется отдельно от отправки писем
+        self.assertEqual(self.route(building_check_conditions.name), "pdf")
+        self.assertEqual(self.route(send_outbox_emails.name), "notifications")
+
+
+@skipUnless(redis_available(), "нужен Redis")
+@mock.patch("rcs_back.stats_app.task_metrics.queue_depths",
+            return_value={"celery": 3})
+class TaskMetricsTests(TestCase):
+
+    def setUp(self):
+        reset_task_metrics()
+
+    def test_runtime_and_failures(self, _):
+        building = Building.objects.create(address="ул. Тестовая 50")
+        building_check_conditions.apply(args=[building.pk])
+        building_check_conditions.apply(args=[0])
+
+        metrics = prometheus_metrics()
+        name = building_check_conditions.name
+        self.assertIn(
+            f'celery_task_runtime_seconds_count{{task="{name}"}} 2', metrics
+        )
+        self.assertIn(f'celery_task_failures_total{{task="{name}"}} 1', metrics)
+        self.assertIn('celery_queue_length{queue="celery"} 3', metrics)
+        # Без брокера время ожидания неизвестно
+        self.assertNotIn("celery_task_wait_seconds_count", metrics)
+
+    def test_wait(self, _):
+        record_task("t", runtime_ms=20, wait_ms=1500)
+        metrics = prometheus_metrics()
+        self.assertIn('celery_task_wait_seconds_bucket{task="t",le="1.0"} 0',
+                      metrics)
+        self.assertIn('celery_task_wait_seconds_bucket{task="t",le="2.5"} 1',
+                      metrics)
+
+
+@override_settings(METRICS_TOKEN="secret")
+class CeleryMetricsViewTests(TestCase):
+
+    def test_token_required(self):
+        resp = self.client.get("/api/stats/celery-metrics")
+        self.assertEqual(resp.status_code, 403)
+        resp = self.client.get("/api/stats/celery-metrics",
+                               HTTP_AUTHORIZATION="Bearer other")
+        self.assertEqual(resp.status_code, 403)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_disabled_without_token(self):
+        resp = self.client.get("/api/stats/celery-metrics",
+                               HTTP_AUTHORIZATION="Bearer ")
+        self.assertEqual(resp.status_code, 404)
+
+    @mock.patch("rcs_back.stats_app.views.prometheus_metrics",
+                return_value="celery_queue_length 0\n")
+    def test_prometheus_content_type(self, _):
+        resp = self.client.get("/api/stats/celery-metrics",
+                               HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["Content-Type"].startswith("text/plain; version=0.0.4"))
@@ -0,0 +1,305 @@
+import datetime
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APITestCase
+
+from rcs_back.containers_app.models import Building, Container
+from rcs_back.stats_app.excel import (
+    container_row,
+    container_stats_queryset,
+    tank_takeout_row,
+)
+from rcs_back.stats_app.models import StatsReport
+from rcs_back.stats_app.queries import data_fingerprint
+from rcs_back.stats_app.tasks import REPORT_TIME_LIMIT, build_stats_report
+from rcs_back.stats_app.views import START_DATE
+from rcs_back.takeouts_app.models import ContainersTakeoutRequest, TankTakeoutRequest
+from rcs_back.users_app.models import User
+
+
+class PerBuildingStatsViewTests(APITestCase):
+    """Статистика по зданиям должна совпадать с подсчётом
+    через методы Building"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="eco@example.com", password="password"
+        )
+        self.client.force_authenticate(self.user)
+        self.year = timezone.now().year
+        self.buildings = [
+            Building.objects.create(address=f"ул. Тестовая {i}")
+            for i in range(3)
+        ]
+        for i, building in enumerate(self.buildings):
+            for month in range(1, timezone.now().month + 1, i + 1):
+                # Граница месяца по московскому времени
+                confirmed_at = timezone.make_aware(
+                    datetime.datetime(self.year, month, 1, 0, 30)
+                )
+                TankTakeoutRequest.objects.create(
+                    building=building,
+                    confirmed_at=confirmed_at,
+                    confirmed_mass=100 * month + i
+                )
+                container = Container.objects.create(
+                    kind=Container.ECOBOX,
+                    building=building,
+                    floor=1,
+                    status=Container.ACTIVE
+                )
+                Container.objects.filter(pk=container.pk).update(
+                    activated_at=confirmed_at
+                )
+
+    def test_monthly_mass(self):
+        resp = self.client.get(
+            "/api/stats/mass-per-building/monthly", {"year": self.year}
+        )
+        self.assertEqual(resp.status_code, 200)
+        for building_dict, building in zip(resp.data, Building.objects.all()):
+            self.assertEqual(building_dict["id"], building.pk)
+            for month_dict in building_dict["collected_mass"]:
+                self.assertEqual(
+                    month_dict["mass"],
+                    building.confirmed_collected_mass(
+                        start_date=datetime.date(self.year, month_dict["month"], 1)
+                    )
+                )
+
+    def test_yearly_mass(self):
+        resp = self.client.get("/api/stats/mass-per-building/yearly")
+        self.assertEqual(resp.status_code, 200)
+        for building_dict, building in zip(resp.data, Building.objects.all()):
+            years = [year_dict["year"] for year_dict in building_dict["collected_mass"]]
+            self.assertEqual(years, list(range(START_DATE.year, self.year + 1)))
+            for year_dict in building_dict["collected_mass"]:
+                self.assertEqual(
+                    year_dict["mass"],
+                    building.confirmed_collected_mass(
+                        start_date=datetime.date(year_dict["year"], 1, 1),
+                        yearly=True
+                    )
+                )
+
+    def test_monthly_activations(self):
+        resp = self.client.get(
+            "/api/stats/activations-per-building/monthly", {"year": self.year}
+        )
+        self.assertEqual(resp.status_code, 200)
+        for building_dict, building in zip(resp.data, Building.objects.all()):
+            for month_dict in building_dict["activations"]:
+                self.assertEqual(
+                    month_dict["activations"],
+                    building.activated_containers(
+                        datetime.date(self.year, month_dict["month"], 1)
+                    )
+                )
+
+    def test_query_count(self):
+        # SAVEPOINT, здания, один GROUP BY, RELEASE SAVEPOINT
+        with self.assertNumQueries(4):
+            self.client.get(
+                "/api/stats/mass-per-building/monthly", {"year": self.year}
+            )
+
+
+class StatsExcelViewTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="eco@example.com", password="password"
+        )
+        self.client.force_authenticate(self.user)
+        self.building = Building.objects.create(
+            address="ул. Тестовая 30"
+        )
+        self.container = Container.objects.create(
+            kind=Container.ECOBOX,
+            building=self.building,
+            floor=1,
+            description="Очень длинное описание контейнера",
+            status=Container.ACTIVE
+        )
+        self.container.add_report()
+        takeout = ContainersTakeoutRequest.objects.create(
+            building=self.building
+        )
+        takeout.containers.add(self.container)
+        TankTakeoutRequest.objects.create(
+            building=self.building,
+            confirmed_at=timezone.now(),
+            confirmed_mass=100
+        )
+
+    def test_all_stats(self):
+        resp = self.client.get("/api/stats")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("attachment", resp["Content-Disposition"])
+        workbook = load_workbook(BytesIO(b"".join(resp.streaming_content)))
+        self.assertEqual(
+            workbook.sheetnames,
+            ["Контейнеры", "Сборы", "Вывозы", "По зданиям"]
+        )
+
+        containers_ws = workbook["Контейнеры"]
+        self.assertEqual(containers_ws["J1"].value, "Время заполнения")
+        self.assertTrue(containers_ws["J1"].font.bold)
+        self.assertEqual(containers_ws["A3"].value, self.container.pk)
+        self.assertEqual(containers_ws["D3"].value, self.building.address)
+        self.assertEqual(containers_ws["J3"].value, "Уже заполнен")
+        # Длинные значения ограничиваются шириной 30 + отступ
+        self.assertEqual(containers_ws.column_dimensions["H"].width, 32)
+        self.assertEqual(containers_ws.column_dimensions["A"].width, 4)
+
+        buildings_ws = workbook["По зданиям"]
+        self.assertEqual(buildings_ws["A2"].value, self.building.address)
+        self.assertEqual(buildings_ws["C2"].value, 100)
+
+    def test_container_rows_in_one_query(self):
+        for _ in range(5):
+            Container.objects.create(
+                kind=Container.PUBLIC_ECOBOX,
+                building=self.building,
+                floor=2,
+                status=Container.ACTIVE
+            ).add_report()
+        self.container.handle_empty()
+        expected = [
+            container_row(container)
+            for container in Container.objects.order_by("pk")
+        ]
+        with self.assertNumQueries(1):
+            rows = [
+                container_row(container)
+                for container in container_stats_queryset()
+            ]
+        self.assertEqual(rows, expected)
+
+    def test_tank_takeout_rows_in_constant_queries(self):
+        TankTakeoutRequest.objects.all().delete()
+        now = timezone.now()
+        for i, building in enumerate([
+            self.building,
+            Building.objects.create(address="ул. Тестовая 31")
+        ]):
+            containers = [
+                Container.objects.create(
+                    kind=kind,
+                    building=building,
+                    floor=1,
+                    status=Container.ACTIVE
+                ) for kind, _ in Container.KIND_CHOICES
+            ]
+            for day in range(0, 60, 5):
+                takeout = ContainersTakeoutRequest.objects.create(
+                    building=building,
+                    archive_mass=50 if day % 20 == 0 else None
+                )
+                takeout.emptied_containers.add(*containers[:day % 3 + 1])
+                ContainersTakeoutRequest.objects.filter(pk=takeout.pk).update(
+                    created_at=now - datetime.timedelta(days=day + i)
+                )
+            for day in range(7, 60, 14):
+                tank_takeout = TankTakeoutRequest.objects.create(
+                    building=building,
+                    confirmed_mass=100 if day % 3 else None
+                )
+                TankTakeoutRequest.objects.filter(pk=tank_takeout.pk).update(
+                    created_at=now - datetime.timedelta(days=day),
+                    confirmed_at=(now - datetime.timedelta(days=day - 2)
+                                  if day % 3 else None)
+                )
+
+        takeouts = TankTakeoutRequest.objects.select_related(
+            "building"
+        ).order_by("pk")
+        expected = [tank_takeout_row(takeout) for takeout in takeouts]
+        # Вывозы, LAG по вывозам зданий, массы сборов
+        with self.assertNumQueries(3):
+            takeouts = list(takeouts.all())
+            TankTakeoutRequest.prefetch_stats(takeouts)
+            rows = [tank_takeout_row(takeout) for takeout in takeouts]
+        self.assertEqual(rows, expected)
+        self.assertTrue(any(row[4] for row in rows))
+
+    def test_async_report_is_cached(self):
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root), \
+                mock.patch.object(build_stats_report, "delay",
+                                  side_effect=build_stats_report) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.get("/api/stats?async")
+            self.assertEqual(resp.status_code, 202)
+            self.assertEqual(delay.call_count, 1)
+            report_id = resp.data["id"]
+
+            resp = self.client.get(f"/api/stats/reports/{report_id}")
+            self.assertEqual(resp.data["status"], StatsReport.DONE)
+
+            # Данные не изменились - повторно отчёт не строится
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.get("/api/stats?async")
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.data["id"], report_id)
+            self.assertEqual(delay.call_count, 1)
+
+            resp = self.client.get(resp.data["download"])
+            self.assertEqual(resp.status_code, 200)
+            workbook = load_workbook(BytesIO(b"".join(resp.streaming_content)))
+            self.assertIn("Контейнеры", workbook.sheetnames)
+
+            # После нового сообщения о заполненности нужен новый отчёт
+            self.container.add_report()
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.get("/api/stats?async")
+            self.assertEqual(resp.status_code, 202)
+            self.assertNotEqual(resp.data["id"], report_id)
+            # Прошлую версию ещё можно скачать
+            resp = self.client.get(f"/api/stats/reports/{report_id}")
+            self.assertEqual(resp.data["status"], StatsReport.DONE)
+
+            # Версии старше суток удаляются при построении новой
+            StatsReport.objects.update(
+                created_at=timezone.now() - datetime.timedelta(days=2)
+            )
+            self.container.add_report()
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.get("/api/stats?async")
+            self.assertEqual(resp.status_code, 202)
+            self.assertEqual(StatsReport.objects.get().pk, resp.data["id"])
+
+    def test_stuck_async_report_rebuilt(self):
+        stuck = StatsReport.objects.create(
+            kind=StatsReport.ALL,
+            fingerprint=data_fingerprint()
+        )
+        with mock.patch.object(build_stats_report, "delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            # Ещё может формироваться
+            resp = self.client.get("/api/stats?async")
+            self.assertEqual(resp.data["id"], stuck.pk)
+            delay.assert_not_called()
+
+            # Дольше REPORT_TIME_LIMIT - задача точно не выполняется
+            StatsReport.objects.filter(pk=stuck.pk).update(
+                created_at=timezone.now() - datetime.timedelta(
+                    seconds=REPORT_TIME_LIMIT + 1
+                )
+            )
+            resp = self.client.get("/api/stats?async")
+        self.assertEqual(resp.status_code, 202)
+        self.assertNotEqual(resp.data["id"], stuck.pk)
+        delay.assert_called_once_with(resp.data["id"])
+        stuck.refresh_from_db()
+        self.assertEqual(stuck.status, StatsReport.FAILED)
+
+        # Запоздавшая задача зависшего отчёта его не строит
+        build_stats_report(stuck.pk)
+        stuck.refresh_from_db()
+        self.assertEqual(stuck.status, StatsReport.FAILED)
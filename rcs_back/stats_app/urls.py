@@ -2,10 +2,14 @@ from django.urls import path
 
 from .views import (
     AllStatsExcelView,
+    CeleryMetricsView,
     ContainerStatsExcelView,
     ContainerTakeoutStatsExcelView,
     MonthlyActivationsPerBuildingView,
     MonthlyMassPerBuildingView,
+    RequestMetricsView,
+    StatsReportDetailView,
+    StatsReportDownloadView,
     TankTakeoutStatsExcelView,
     YearlyMassPerBuildingView,
 )
@@ -17,5 +21,9 @@ urlpatterns = [
     path("", AllStatsExcelView.as_view()),
     path("/mass-per-building/monthly", MonthlyMassPerBuildingView.as_view()),
     path("/mass-per-building/yearly", YearlyMassPerBuildingView.as_view()),
-    path("/activations-per-building/monthly", MonthlyActivationsPerBuildingView.as_view())
+    path("/activations-per-building/monthly", MonthlyActivationsPerBuildingView.as_view()),
+    path("/reports/<int:pk>", StatsReportDetailView.as_view()),
+    path("/reports/<int:pk>/download", StatsReportDownloadView.as_view()),
+    path("/request-metrics", RequestMetricsView.as_view()),
+    path("/celery-metrics", CeleryMetricsView.as_view()),
 ]
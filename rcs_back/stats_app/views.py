@@ -1,111 +1,148 @@
 import datetime
+import hmac
+import math
 from tempfile import NamedTemporaryFile
 
-from django.http.response import HttpResponse
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.http import Http404
+from django.http.response import FileResponse, HttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from rest_framework import permissions, views
+from django.views import View
+from openpyxl import Workbook
+from rest_framework import generics, permissions
+from rest_framework import status as drf_status
+from rest_framework import views
 from rest_framework.response import Response
 
 from rcs_back.containers_app.models import Building
-
-from .excel import (
-    get_all_stats_xl,
-    get_container_stats_xl,
-    get_container_takeout_stats_xl,
-    get_tank_takeout_stats_xl,
+from rcs_back.containers_app.utils.report_dedup import dropped_reports_count
+from rcs_back.utils.metrics import INF, request_stats
+from rcs_back.utils.transaction import delay_on_commit
+
+from .models import StatsReport
+from .queries import (
+    activations_per_month,
+    confirmed_mass_per_period,
+    data_fingerprint,
 )
-
-
-class ContainerStatsExcelView(views.APIView):
-    """Возвращает .xlsx файл со статистикой по контейнерам"""
+from .serializers import StatsReportSerializer
+from .task_metrics import prometheus_metrics
+from .tasks import REPORT_TIME_LIMIT, XL_BUILDERS, build_stats_report
+
+
+def xlsx_response(workbook: Workbook, fname: str) -> FileResponse:
+    """Сохраняет write-only Workbook во временный файл
+    и отдаёт его потоком, не читая целиком в память.
+    Временный файл удаляется при закрытии ответа"""
+    tmp = NamedTemporaryFile()  # pylint: disable=consider-using-with
+    workbook.save(tmp)
+    tmp.seek(0)
+    fname += timezone.now().strftime("%d.%m.%Y")
+    fname += ".xlsx"
+    return FileResponse(
+        tmp,
+        as_attachment=True,
+        filename=fname,
+        content_type="application/vnd.ms-excel",
+        headers={
+            "Content-Language": "ru-RU"
+        }
+    )
+
+
+class StatsExcelView(views.APIView):
+    """Возвращает .xlsx файл со статистикой.
+    С параметром async отчёт формируется в фоне: в ответе
+    id отчёта, по которому можно узнать статус и скачать файл.
+    Если данные не изменились, сразу возвращается готовый отчёт"""
+    report_kind: str = None  # Нужно задать
 
     def get(self, request, *args, **kwargs):
-        workbook = get_container_stats_xl()
-        with NamedTemporaryFile() as tmp:
-            fname = "recycle-starter-container-stats-"
-            fname += timezone.now().strftime("%d.%m.%Y")
-            fname += ".xlsx"
-            workbook.save(tmp.name)
-            file_data = tmp.read()
-            response = HttpResponse(
-                file_data,
-                headers={
-                    "Content-Type": "application/vnd.ms-excel",
-                    "Content-Disposition":
-                    f'attachment; filename={fname}',
-                    "Content-Language": "ru-RU"
-                }
+        if "async" in request.query_params:
+            return self.get_async()
+        return xlsx_response(
+            XL_BUILDERS[self.report_kind](),
+            StatsReport.FILE_PREFIXES[self.report_kind]
+        )
+
+    def get_async(self) -> Response:
+        fingerprint = data_fingerprint()
+        report = StatsReport.objects.filter(
+            kind=self.report_kind,
+            fingerprint=fingerprint
+        ).exclude(
+            status=StatsReport.FAILED
+        ).order_by("-pk").first()
+        if report and report.status == StatsReport.PENDING and (
+            report.created_at < timezone.now() - datetime.timedelta(
+                seconds=REPORT_TIME_LIMIT
             )
-            return response
+        ):
+            # Задача упала без записи статуса (убита по time_limit,
+            # потеряна воркером) - строим отчёт заново
+            report.status = StatsReport.FAILED
+            report.save(update_fields=["status"])
+            report = None
+        if not report:
+            report = StatsReport.objects.create(
+                kind=self.report_kind,
+                fingerprint=fingerprint
+            )
+            delay_on_commit(build_stats_report, report.pk)
 
+        if report.status == StatsReport.DONE:
+            status = drf_status.HTTP_200_OK
+        else:
+            status = drf_status.HTTP_202_ACCEPTED
+        return Response(StatsReportSerializer(report).data, status=status)
 
-class ContainerTakeoutStatsExcelView(views.APIView):
-    """Возвращает .xlsx файл со статистикой по сборам"""
 
-    def get(self, request, *args, **kwargs):
-        workbook = get_container_takeout_stats_xl()
-        with NamedTemporaryFile() as tmp:
-            fname = "recycle-starter-container-takeout-stats-"
-            fname += timezone.now().strftime("%d.%m.%Y")
-            fname += ".xlsx"
-            workbook.save(tmp.name)
-            file_data = tmp.read()
-            response = HttpResponse(
-                file_data,
-                headers={
-                    "Content-Type": "application/vnd.ms-excel",
-                    "Content-Disposition":
-                    f'attachment; filename={fname}',
-                    "Content-Language": "ru-RU"
-                }
-            )
-            return response
+class ContainerStatsExcelView(StatsExcelView):
+    """Возвращает .xlsx файл со статистикой по контейнерам"""
+    report_kind = StatsReport.CONTAINERS
 
 
-class TankTakeoutStatsExcelView(views.APIView):
+class ContainerTakeoutStatsExcelView(StatsExcelView):
     """Возвращает .xlsx файл со статистикой по сборам"""
+    report_kind = StatsReport.CONTAINER_TAKEOUTS
 
-    def get(self, request, *args, **kwargs):
-        workbook = get_tank_takeout_stats_xl()
-        with NamedTemporaryFile() as tmp:
-            fname = "recycle-starter-tank-takeout-stats-"
-            fname += timezone.now().strftime("%d.%m.%Y")
-            fname += ".xlsx"
-            workbook.save(tmp.name)
-            file_data = tmp.read()
-            response = HttpResponse(
-                file_data,
-                headers={
-                    "Content-Type": "application/vnd.ms-excel",
-                    "Content-Disposition":
-                    f'attachment; filename={fname}',
-                    "Content-Language": "ru-RU"
-                }
-            )
-            return response
+
+class TankTakeoutStatsExcelView(StatsExcelView):
+    """Возвращает .xlsx файл со статистикой по сборам"""
+    report_kind = StatsReport.TANK_TAKEOUTS
 
 
-class AllStatsExcelView(views.APIView):
+class AllStatsExcelView(StatsExcelView):
     """Возвращает .xlsx файл со статистикой по сборам"""
+    report_kind = StatsReport.ALL
+
+
+class StatsReportDetailView(generics.RetrieveAPIView):
+    """Статус фонового отчёта со статистикой"""
+    queryset = StatsReport.objects.all()
+    serializer_class = StatsReportSerializer
+
+
+class StatsReportDownloadView(views.APIView):
+    """Скачивание готового фонового отчёта"""
 
     def get(self, request, *args, **kwargs):
-        workbook = get_all_stats_xl()
-        with NamedTemporaryFile() as tmp:
-            fname = "recycle-starter-stats-"
-            fname += timezone.now().strftime("%d.%m.%Y")
-            fname += ".xlsx"
-            workbook.save(tmp.name)
-            file_data = tmp.read()
-            response = HttpResponse(
-                file_data,
-                headers={
-                    "Content-Type": "application/vnd.ms-excel",
-                    "Content-Disposition":
-                    f'attachment; filename={fname}',
-                    "Content-Language": "ru-RU"
-                }
-            )
-            return response
+        report: StatsReport = get_object_or_404(
+            StatsReport,
+            pk=self.kwargs["pk"],
+            status=StatsReport.DONE
+        )
+        return FileResponse(
+            report.file.open("rb"),
+            as_attachment=True,
+            filename=report.file_name(),
+            content_type="application/vnd.ms-excel",
+            headers={
+                "Content-Language": "ru-RU"
+            }
+        )
 
 
 # Дата запуска сервиса в прод
@@ -137,6 +174,11 @@ class MonthlyMassPerBuildingView(views.APIView):
         else:
             end_month = 12
 
+        stats = confirmed_mass_per_period(
+            datetime.date(year=year, month=start_month, day=1),
+            datetime.date(year=year, month=end_month, day=1) + relativedelta(months=1)
+        )
+
         building: Building
         for building in Building.objects.all():
             building_dict = {}
@@ -148,8 +190,9 @@ class MonthlyMassPerBuildingView(views.APIView):
             while current_month <= end_month:
                 month_dict = {}
                 month_dict["month"] = current_month
-                month_dict["mass"] = building.confirmed_collected_mass(
-                    start_date=datetime.date(year=year, month=current_month, day=1)
+                month_dict["mass"] = stats.get(
+                    (building.pk, datetime.date(year=year, month=current_month, day=1)),
+                    0
                 )
                 current_month += 1
                 months.append(month_dict)
@@ -166,6 +209,12 @@ class YearlyMassPerBuildingView(views.APIView):
 
     def get(self, request, *args, **kwargs):
         resp = []
+        end_year = timezone.now().date().year
+        stats = confirmed_mass_per_period(
+            datetime.date(year=START_DATE.year, month=1, day=1),
+            datetime.date(year=end_year + 1, month=1, day=1),
+            yearly=True
+        )
 
         building: Building
         for building in Building.objects.all():
@@ -174,14 +223,13 @@ class YearlyMassPerBuildingView(views.APIView):
             building_dict["address"] = building.address
 
             current_year = START_DATE.year
-            end_year = timezone.now().date().year
             years = []
             while current_year <= end_year:
                 year_dict = {}
                 year_dict["year"] = current_year
-                year_dict["mass"] = building.confirmed_collected_mass(
-                    start_date=datetime.date(year=current_year, month=1, day=1),
-                    yearly=True
+                year_dict["mass"] = stats.get(
+                    (building.pk, datetime.date(year=current_year, month=1, day=1)),
+                    0
                 )
                 current_year += 1
                 years.append(year_dict)
@@ -216,6 +264,11 @@ class MonthlyActivationsPerBuildingView(views.APIView):
         else:
             end_month = 12
 
+        stats = activations_per_month(
+            datetime.date(year=year, month=start_month, day=1),
+            datetime.date(year=year, month=end_month, day=1) + relativedelta(months=1)
+        )
+
         building: Building
         for building in Building.objects.all():
             building_dict = {}
@@ -227,8 +280,9 @@ class MonthlyActivationsPerBuildingView(views.APIView):
             while current_month <= end_month:
                 month_dict = {}
                 month_dict["month"] = current_month
-                month_dict["activations"] = building.activated_containers(
-                    datetime.date(year=year, month=current_month, day=1)
+                month_dict["activations"] = stats.get(
+                    (building.pk, datetime.date(year=year, month=current_month, day=1)),
+                    0
                 )
                 current_month += 1
                 months.append(month_dict)
@@ -236,3 +290,64 @@ class MonthlyActivationsPerBuildingView(views.APIView):
             building_dict["activations"] = months
             resp.append(building_dict)
         return Response(resp)
+
+
+class RequestMetricsView(views.APIView):
+    """Эндпоинты с наибольшим 95-м перцентилем времени ответа
+    и наибольшим кол-вом запросов к БД на запрос
+    (по метрикам RequestMetricsMiddleware)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    DEFAULT_LIMIT = 10
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get("limit", self.DEFAULT_LIMIT))
+        except ValueError:
+            return Response(
+                {"limit": "Должно быть целым числом"},
+                status=drf_status.HTTP_400_BAD_REQUEST
+            )
+        stats = request_stats()
+        by_latency = sorted(
+            stats, key=lambda s: (s["p95_ms"], s["avg_ms"]), reverse=True
+        )[:limit]
+        by_queries = sorted(
+            stats, key=lambda s: (s["avg_queries"], s["p95_queries"]),
+            reverse=True
+        )[:limit]
+        return Response({
+            "by_latency": [self.as_json(s) for s in by_latency],
+            "by_queries": [self.as_json(s) for s in by_queries],
+            "dropped_reports": dropped_reports_count(),
+        })
+
+    @staticmethod
+    def as_json(stats: dict) -> dict:
+        """Перцентиль за последней корзиной гистограммы -
+        бесконечность, в JSON она передаётся строкой +Inf"""
+        return {
+            key: INF if value == math.inf else value
+            for key, value in stats.items()
+        }
+
+
+class CeleryMetricsView(View):
+    """Метрики задач Celery в текстовом формате Prometheus:
+    время выполнения, ожидание в очереди, ошибки и длина очередей.
+    Доступны только с заголовком "Authorization: Bearer <METRICS_TOKEN>",
+    без METRICS_TOKEN отключены"""
+
+    def get(self, request, *args, **kwargs):
+        if not settings.METRICS_TOKEN:
+            raise Http404
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(
+            request.META.get("HTTP_AUTHORIZATION", "").encode(),
+            expected.encode()
+        ):
+            return HttpResponse(status=drf_status.HTTP_403_FORBIDDEN)
+        return HttpResponse(
+            prometheus_metrics(),
+            content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
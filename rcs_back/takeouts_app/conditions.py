@@ -0,0 +1,33 @@
+from typing import Set
+
+from rcs_back.containers_app.models import Building, BuildingPart, Container
+
+
+def time_condition_building_ids() -> Set[int]:
+    """Здания, в которых есть контейнеры, заполненные
+    дольше, чем позволяет условие для сбора по времени"""
+    return set(
+        Container.objects.overdue().values_list(
+            "building", flat=True
+        ).distinct()
+    )
+
+
+def mass_condition_building_ids() -> Set[int]:
+    """Здания, в которых (или в одном из корпусов которых)
+    накопилось не меньше бумаги, чем в условии для сбора по массе"""
+    return set(
+        Building.objects.with_mass_condition().filter(
+            mass_condition_met=True
+        ).values_list("pk", flat=True)
+    ) | set(
+        BuildingPart.objects.with_mass_condition().filter(
+            mass_condition_met=True
+        ).values_list("building", flat=True)
+    )
+
+
+def building_ids_to_notify() -> Set[int]:
+    """Здания, в которых выполнены условия для сбора
+    (как в Building.needs_takeout)"""
+    return time_condition_building_ids() | mass_condition_building_ids()
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.5 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('takeouts_app', '0036_containerstakeoutrequest_requesting_worker_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='containerstakeoutrequest',
+            index=models.Index(fields=['building', 'created_at'], name='ctakeout_building_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='containerstakeoutrequest',
+            index=models.Index(condition=models.Q(('confirmed_at__isnull', False)), fields=['building', 'confirmed_at'], name='ctakeout_bld_confirmed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tanktakeoutrequest',
+            index=models.Index(fields=['building', 'created_at'], name='tank_takeout_bld_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tanktakeoutrequest',
+            index=models.Index(fields=['building', 'confirmed_at'], name='tank_takeout_bld_confirmed_idx'),
+        ),
+    ]
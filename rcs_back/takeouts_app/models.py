@@ -1,8 +1,11 @@
+import bisect
 import datetime
-from typing import Union
+from collections import defaultdict
+from typing import List, Union
 
 from django.db import models
-from django.db.models.query import QuerySet
+from django.db.models import Case, F, Q, Sum, When, Window
+from django.db.models.functions import Coalesce, Lag
 from django.utils import timezone
 
 from rcs_back.containers_app.models import Building, BuildingPart, Container
@@ -10,6 +13,29 @@ from rcs_back.containers_app.models import Building, BuildingPart, Container
 tz = timezone.get_default_timezone()
 
 
+class ContainersTakeoutRequestQuerySet(models.QuerySet):
+    """QuerySet сборов контейнеров"""
+
+    def with_containers(self) -> "ContainersTakeoutRequestQuerySet":
+        """Подгружает выбранные и опустошённые контейнеры, чтобы
+        mass, unconfirmed_containers и emptied_containers_match
+        не обращались к БД для каждого сбора"""
+        return self.prefetch_related("containers", "emptied_containers")
+
+    def with_mass(self) -> "ContainersTakeoutRequestQuerySet":
+        """Добавляет массу сбора (как в ContainersTakeoutRequest.mass),
+        посчитанную на стороне БД"""
+        return self.annotate(
+            calculated_mass=Case(
+                When(archive_mass__gt=0, then=F("archive_mass")),
+                default=Coalesce(
+                    Sum(Container.mass_expression("emptied_containers__")), 0
+                ),
+                output_field=models.PositiveIntegerField()
+            )
+        )
+
+
 class ContainersTakeoutRequest(models.Model):
     """Модель отчёта о сборе контейнеров из здания"""
 
@@ -108,6 +134,8 @@ class ContainersTakeoutRequest(models.Model):
         blank=True
     )
 
+    objects = ContainersTakeoutRequestQuerySet.as_manager()
+
     def mass(self) -> int:
         """Возвращает массу бумаги в подтверждённых контейнерах
         или архиве"""
@@ -120,10 +148,13 @@ class ContainersTakeoutRequest(models.Model):
                     mass += container.mass()
             return mass
 
-    def unconfirmed_containers(self) -> QuerySet:
+    def unconfirmed_containers(self) -> List[Container]:
         """Контейнеры, которые добавили в сбор при создании,
-        но они не были опустошены"""
-        return self.containers.difference(self.emptied_containers.all())
+        но они не были опустошены. Со списками, подгруженными
+        через prefetch_related, не обращается к БД"""
+        emptied = {container.pk for container in self.emptied_containers.all()}
+        return [container for container in self.containers.all()
+                if container.pk not in emptied]
 
     def emptied_containers_match(self) -> float:
         """Соответствие (действительно собранных контейнеров /
@@ -140,6 +171,15 @@ class ContainersTakeoutRequest(models.Model):
     class Meta:
         verbose_name = "сбор контейнеров"
         verbose_name_plural = "сборы контейнеров"
+        indexes = [
+            # Сборы здания за период (масса вывоза бака)
+            models.Index(fields=["building", "created_at"],
+                         name="ctakeout_building_created_idx"),
+            # Подтверждённые сборы (calculated_collected_mass)
+            models.Index(fields=["building", "confirmed_at"],
+                         condition=Q(confirmed_at__isnull=False),
+                         name="ctakeout_bld_confirmed_idx"),
+        ]
 
 
 class TankTakeoutRequest(models.Model):
@@ -176,8 +216,20 @@ class TankTakeoutRequest(models.Model):
         else:
             return None
 
+    # Если предыдущий вывоз не подтверждён, масса
+    # считается по сборам за год до вывоза
+    MASS_DEFAULT_PERIOD = datetime.timedelta(days=365)
+    # Бак начинает заполняться через 3 дня после предыдущего вывоза
+    FILL_START_DELAY = datetime.timedelta(days=3)
+
     def fill_time(self) -> Union[datetime.timedelta, None]:
         """Время заполнения бака"""
+        if hasattr(self, "previous_created_at"):
+            # Посчитано в prefetch_stats
+            if self.previous_created_at:
+                return self.created_at - (self.previous_created_at +
+                                          self.FILL_START_DELAY)
+            return None
         requests = TankTakeoutRequest.objects.filter(
             building=self.building
         ).filter(
@@ -195,6 +247,9 @@ class TankTakeoutRequest(models.Model):
     def mass(self) -> int:
         """Рассчитанная масса вывоза как
         сумма масс выносов контейнеров"""
+        if hasattr(self, "calculated_mass"):
+            # Посчитано в prefetch_stats
+            return self.calculated_mass
         previous_tank_takeouts = TankTakeoutRequest.objects.filter(
             building=self.building,
             created_at__lt=self.created_at
@@ -216,6 +271,70 @@ class TankTakeoutRequest(models.Model):
             mass += takeout.mass()
         return mass
 
+    def mass_period_start(self) -> datetime.datetime:
+        """С какого момента сборы контейнеров попадают в этот вывоз
+        (нужен previous_confirmed_at из prefetch_stats)"""
+        if self.previous_created_at and self.previous_confirmed_at:
+            return self.previous_confirmed_at
+        return self.created_at - self.MASS_DEFAULT_PERIOD
+
+    @classmethod
+    def prefetch_stats(cls, takeouts: List["TankTakeoutRequest"]) -> None:
+        """Считает mass и fill_time для списка вывозов за два запроса:
+        предыдущий вывоз каждого - через LAG по вывозам здания,
+        массы сборов контейнеров - одной агрегацией.
+        После этого mass, fill_time, confirmed_mass_match и
+        mass_difference не обращаются к БД"""
+        if not takeouts:
+            return
+        building_ids = {takeout.building_id for takeout in takeouts}
+
+        previous = {}
+        window = {
+            "partition_by": [F("building")],
+            "order_by": F("created_at").asc(),
+        }
+        # Фильтр только по зданию, чтобы окно видело все вывозы здания
+        for pk, previous_created_at, previous_confirmed_at in cls.objects.filter(
+            building__in=building_ids
+        ).annotate(
+            previous_created_at=Window(Lag("created_at"), **window),
+            previous_confirmed_at=Window(Lag("confirmed_at"), **window),
+        ).values_list("pk", "previous_created_at", "previous_confirmed_at"):
+            previous[pk] = (previous_created_at, previous_confirmed_at)
+
+        for takeout in takeouts:
+            (takeout.previous_created_at,
+             takeout.previous_confirmed_at) = previous.get(takeout.pk, (None, None))
+
+        # Массы сборов контейнеров по зданиям в порядке создания
+        created = defaultdict(list)
+        masses = defaultdict(list)
+        for building_id, created_at, mass in ContainersTakeoutRequest.objects.filter(
+            building__in=building_ids,
+            created_at__gt=min(t.mass_period_start() for t in takeouts),
+            created_at__lt=max(t.created_at for t in takeouts),
+        ).with_mass().order_by(
+            "building", "created_at"
+        ).values_list("building", "created_at", "calculated_mass"):
+            created[building_id].append(created_at)
+            # Префиксные суммы для подсчёта массы за период
+            masses[building_id].append(
+                (masses[building_id][-1] if masses[building_id] else 0) + mass
+            )
+
+        for takeout in takeouts:
+            building_created = created[takeout.building_id]
+            building_masses = masses[takeout.building_id]
+            start = bisect.bisect_right(building_created, takeout.mass_period_start())
+            end = bisect.bisect_left(building_created, takeout.created_at)
+            if end > start:
+                takeout.calculated_mass = building_masses[end - 1] - (
+                    building_masses[start - 1] if start else 0
+                )
+            else:
+                takeout.calculated_mass = 0
+
     def confirmed_mass_match(self) -> Union[float, None]:
         """Соответствие (рассчитанная масса / подтверждённую"""
         if self.confirmed_mass:
@@ -238,6 +357,14 @@ class TankTakeoutRequest(models.Model):
     class Meta:
         verbose_name = "вывоз бака"
         verbose_name_plural = "вывозы баков"
+        indexes = [
+            # Предыдущий вывоз (fill_time, mass, avg_fill_speed)
+            models.Index(fields=["building", "created_at"],
+                         name="tank_takeout_bld_created_idx"),
+            # Подтверждённая масса за период (confirmed_collected_mass)
+            models.Index(fields=["building", "confirmed_at"],
+                         name="tank_takeout_bld_confirmed_idx"),
+        ]
 
 
 class TakeoutCondition(models.Model):
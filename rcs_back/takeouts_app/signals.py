@@ -1,12 +1,20 @@
 import datetime
 
 from django.core.mail import EmailMessage
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete
 from django.dispatch import receiver
 from django.template.loader import render_to_string
 from django.utils import timezone
 
-from rcs_back.takeouts_app.models import ContainersTakeoutRequest
+from rcs_back.containers_app.utils.takeout_conditions import (
+    invalidate_conditions,
+)
+from rcs_back.takeouts_app.models import (
+    ContainersTakeoutRequest,
+    TakeoutCondition,
+)
+from rcs_back.utils.mail import send_email
 
 
 @receiver(post_save, sender=ContainersTakeoutRequest)
@@ -30,4 +38,19 @@ def notify_about_archive(instance: ContainersTakeoutRequest, created: bool, **kw
             emails
         )
         email.content_subtype = "html"
-        email.send()
+        send_email(email)
+
+
+@receiver(post_save, sender=TakeoutCondition)
+@receiver(pre_delete, sender=TakeoutCondition)
+def invalidate_takeout_conditions(instance: TakeoutCondition, **kwargs) -> None:
+    """Сбрасываем закэшированные условия здания. Повторно - после
+    коммита, чтобы другой процесс не закэшировал старые условия"""
+    if instance.building_id:
+        building_id = instance.building_id
+    elif instance.building_part_id:
+        building_id = instance.building_part.building_id
+    else:
+        return
+    invalidate_conditions(building_id)
+    transaction.on_commit(lambda: invalidate_conditions(building_id))
@@ -10,15 +10,22 @@ from django.template.loader import render_to_string
 from django.utils import timezone
 
 from rcs_back.containers_app.models import Building, Container
+from rcs_back.takeouts_app.conditions import building_ids_to_notify
 from rcs_back.takeouts_app.models import TankTakeoutRequest
+from rcs_back.utils.mail import EmailDispatcher
 
 
 @shared_task
 def check_time_conditions() -> None:
-    '''Выполнены ли условия "не больше N дней"'''
+    '''Выполнены ли условия "не больше N дней".
+    Здания, которым нужен сбор, ищутся несколькими запросами
+    на все здания сразу, оповещаются только они'''
     building: Building
-    for building in Building.objects.all():
-        building.check_conditions_to_notify()
+    for building in Building.objects.filter(
+        _takeout_notified=False,
+        pk__in=building_ids_to_notify()
+    ):
+        building.takeout_needed_notify()
 
 
 def get_total_mass(start_date: datetime.date, end_date: datetime.date) -> int:
@@ -95,40 +102,42 @@ def collected_mass_mailing() -> None:
         end_date
     )
 
-    for user_email in emails:
-        containers = Container.objects.filter(
-            email=user_email
-        ).filter(
-            status=Container.ACTIVE
-        )
-        if len(containers) == 1:
-            container_ids = f"контейнера с ID {containers[0].pk}"
-        else:
-            container_ids = "контейнеров с ID "
-            for container in containers:
-                container_ids += f"{container.pk}, "
-            container_ids = container_ids[:len(container_ids)-2]
-        building_mass = containers[0].building.confirmed_collected_mass(
-            start_date=start_date, end_date=end_date
-        )
-        msg = render_to_string("collected_mass_mailing.html", {
-            "start_date": start_date,
-            "end_date": end_date,
-            "total_mass": total_mass,
-            "building_mass": building_mass,
-            "container_mass": collected_mass_per_owner[user_email],
-            "container_ids": container_ids,
-            "percentage": get_collected_mass_percentage(
-                user_email,
-                collected_mass_per_owner
+    # Одно соединение на пачку писем, а не на каждого владельца
+    with EmailDispatcher() as dispatcher:
+        for user_email in emails:
+            containers = Container.objects.filter(
+                email=user_email
+            ).filter(
+                status=Container.ACTIVE
             )
-        }
-        )
-        email = EmailMessage(
-            "Оповещение от сервиса RecycleStarter",
-            msg,
-            None,
-            [user_email]
-        )
-        email.content_subtype = "html"
-        email.send()
+            if len(containers) == 1:
+                container_ids = f"контейнера с ID {containers[0].pk}"
+            else:
+                container_ids = "контейнеров с ID "
+                for container in containers:
+                    container_ids += f"{container.pk}, "
+                container_ids = container_ids[:len(container_ids)-2]
+            building_mass = containers[0].building.confirmed_collected_mass(
+                start_date=start_date, end_date=end_date
+            )
+            msg = render_to_string("collected_mass_mailing.html", {
+                "start_date": start_date,
+                "end_date": end_date,
+                "total_mass": total_mass,
+                "building_mass": building_mass,
+                "container_mass": collected_mass_per_owner[user_email],
+                "container_ids": container_ids,
+                "percentage": get_collected_mass_percentage(
+                    user_email,
+                    collected_mass_per_owner
+                )
+            }
+            )
+            email = EmailMessage(
+                "Оповещение от сервиса RecycleStarter",
+                msg,
+                None,
+                [user_email]
+            )
+            email.content_subtype = "html"
+            dispatcher.add(email)
@@ -0,0 +1,78 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from rcs_back.containers_app.models import Building, BuildingPart, Container
+from rcs_back.takeouts_app.conditions import building_ids_to_notify
+from rcs_back.takeouts_app.models import TakeoutCondition
+from rcs_back.takeouts_app.tasks import check_time_conditions
+
+
+class TakeoutConditionsTests(TestCase):
+    """Условия для сбора по всем зданиям сразу должны
+    совпадать с проверкой каждого здания"""
+
+    def setUp(self):
+        now = timezone.now()
+        self.buildings = []
+        for i in range(6):
+            building = Building.objects.create(address=f"ул. Тестовая {i}")
+            part = BuildingPart.objects.create(building=building, num=1)
+            TakeoutCondition.objects.filter(building=building).update(
+                office_days=i % 3 + 1,
+                public_days=i % 2 + 2,
+                ignore_reports=i % 2,
+                mass=(i % 3) * 20
+            )
+            TakeoutCondition.objects.filter(building_part=part).update(
+                office_days=i % 2 * 5,
+                mass=15 if i == 4 else None
+            )
+            for j, (kind, _) in enumerate(Container.KIND_CHOICES):
+                container = Container.objects.create(
+                    kind=kind,
+                    building=building,
+                    building_part=part if j % 2 else None,
+                    floor=1,
+                    status=Container.ACTIVE
+                )
+                for _ in range((i + j) % 3):
+                    container.add_report()
+                Container.objects.filter(pk=container.pk).update(
+                    filled_at=now - datetime.timedelta(days=(i + j) % 4, hours=1)
+                )
+            self.buildings.append(building)
+
+    def test_matches_needs_takeout(self):
+        expected = {
+            building.pk for building in Building.objects.all()
+            if building.needs_takeout()
+        }
+        self.assertTrue(expected)
+        self.assertNotEqual(expected, {b.pk for b in self.buildings})
+        self.assertEqual(building_ids_to_notify(), expected)
+
+    def test_query_count_does_not_depend_on_buildings(self):
+        # Условия по дням, просроченные контейнеры,
+        # условия по массе для зданий и для корпусов
+        with self.assertNumQueries(4):
+            building_ids_to_notify()
+
+    def test_only_affected_buildings_notified(self):
+        expected = building_ids_to_notify()
+        Building.objects.filter(pk=self.buildings[0].pk).update(
+            _takeout_notified=True
+        )
+        with mock.patch.object(Building, "takeout_condition_met_notify",
+                               autospec=True) as notify:
+            check_time_conditions()
+        notified = {call.args[0].pk for call in notify.call_args_list}
+        self.assertEqual(notified, expected - {self.buildings[0].pk})
+        self.assertEqual(
+            set(Building.objects.filter(
+                _takeout_notified=True
+            ).values_list("pk", flat=True)),
+            expected | {self.buildings[0].pk}
+        )
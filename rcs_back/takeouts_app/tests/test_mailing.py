@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.test import TestCase, override_settings
+
+from rcs_back.containers_app.models import Building, Container
+from rcs_back.takeouts_app.tasks import collected_mass_mailing
+from rcs_back.utils.mail import EmailDispatcher, send_email, split_recipients
+
+
+def message(*to: str) -> EmailMessage:
+    return EmailMessage("Тема", "Текст", None, list(to))
+
+
+class EmailDispatcherTests(TestCase):
+
+    def test_batches_over_one_connection(self):
+        with mock.patch("rcs_back.utils.mail.get_connection",
+                        wraps=mail.get_connection) as get_connection, \
+                self.assertLogs("rcs_back.utils.mail", "INFO") as logs:
+            with EmailDispatcher(batch_size=2) as dispatcher:
+                for i in range(5):
+                    dispatcher.add(message(f"owner{i}@example.com"))
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual([b.messages for b in dispatcher.batches], [2, 2, 1])
+        self.assertEqual(dispatcher.sent_count, 5)
+        # Скорость отправки каждой пачки в логе
+        self.assertEqual(len(logs.output), 3)
+        self.assertIn("писем/с", logs.output[0])
+
+    def test_nothing_sent_on_error(self):
+        with self.assertRaises(ValueError):
+            with EmailDispatcher(batch_size=10) as dispatcher:
+                dispatcher.add(message("owner@example.com"))
+                raise ValueError
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(EMAIL_MAX_RECIPIENTS=2)
+    def test_long_recipient_list_split(self):
+        original = message("a@example.com", "b@example.com", "c@example.com")
+        original.bcc = ["eco@example.com"]
+        parts = split_recipients(original)
+        self.assertEqual([p.to for p in parts],
+                         [["a@example.com", "b@example.com"], ["c@example.com"]])
+        self.assertEqual([p.bcc for p in parts], [["eco@example.com"], []])
+
+        with self.assertLogs("rcs_back.utils.mail", "INFO"):
+            send_email(original)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(original.to, ["a@example.com", "b@example.com",
+                                       "c@example.com"])
+
+
+class CollectedMassMailingTests(TestCase):
+
+    def test_one_connection_for_all_owners(self):
+        building = Building.objects.create(address="ул. Тестовая 60")
+        for i in range(3):
+            Container.objects.create(
+                kind=Container.ECOBOX,
+                building=building,
+                floor=1,
+                status=Container.ACTIVE,
+                email=f"owner{i % 2}@example.com"
+            )
+        with mock.patch("rcs_back.utils.mail.get_connection",
+                        wraps=mail.get_connection) as get_connection, \
+                self.assertLogs("rcs_back.utils.mail", "INFO"):
+            collected_mass_mailing()
+        get_connection.assert_called_once()
+        self.assertEqual(
+            sorted(m.to[0] for m in mail.outbox),
+            ["owner0@example.com", "owner1@example.com"]
+        )
@@ -2,7 +2,7 @@ from datetime import timedelta
 
 import pdfkit
 from django.conf import settings
-from django.db.models import Q, Sum
+from django.db.models import Prefetch, Q, Sum
 from django.db.models.functions import Coalesce
 from django.http.response import HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
@@ -13,7 +13,7 @@ from rest_framework import status as drf_status
 from rest_framework import views
 from rest_framework.response import Response
 
-from rcs_back.containers_app.models import Building, EmailToken
+from rcs_back.containers_app.models import Building, Container, EmailToken
 from rcs_back.containers_app.tasks import (
     container_correct_fullness,
     handle_empty_container,
@@ -33,6 +33,7 @@ from rcs_back.takeouts_app.serializers import (
     TankTakeoutRequestSerializer,
 )
 from rcs_back.utils.mixins import UpdateThenRetrieveModelMixin
+from rcs_back.utils.transaction import delay_on_commit
 
 
 class ContainersTakeoutListView(generics.ListCreateAPIView):
@@ -41,7 +42,7 @@ class ContainersTakeoutListView(generics.ListCreateAPIView):
     permission_classes = [permissions.AllowAny]
 
     def get_queryset(self):
-        queryset = ContainersTakeoutRequest.objects.all()
+        queryset = ContainersTakeoutRequest.objects.with_containers()
         if (
             self.request.user.is_authenticated
             and
@@ -140,7 +141,10 @@ class ContainersTakeoutListView(generics.ListCreateAPIView):
 class ContainersTakeoutDetailView(generics.RetrieveUpdateAPIView):
     """View для создания подтверждения выноса контейнеров
     и для ретрива"""
-    queryset = ContainersTakeoutRequest.objects.all()
+    queryset = ContainersTakeoutRequest.objects.prefetch_related(
+        Prefetch("containers",
+                 queryset=Container.objects.with_current_state())
+    )
     serializer_class = ContainersTakeoutConfirmationSerializer
 
     def perform_update(self, serializer):
@@ -167,7 +171,7 @@ class ContainersTakeoutDetailView(generics.RetrieveUpdateAPIView):
                 emptied_containers -= already_empty_containers
 
                 for container in already_empty_containers:
-                    container_correct_fullness.delay(container.pk)
+                    delay_on_commit(container_correct_fullness, container.pk)
 
             if "unavailable_containers" in serializer.validated_data:
                 unavailable_containers = set(serializer.validated_data[
@@ -176,7 +180,7 @@ class ContainersTakeoutDetailView(generics.RetrieveUpdateAPIView):
                 emptied_containers -= unavailable_containers
 
         for container in emptied_containers:
-            handle_empty_container.delay(container.pk)
+            delay_on_commit(handle_empty_container, container.pk)
 
         serializer.save(
             confirmed_at=timezone.now(),
@@ -201,7 +205,9 @@ class ContainersForTakeoutView(views.APIView):
         )
         containers_html_s = render_to_string(
             "containers_for_takeout.html", {
-                "containers": takeout.containers.all(),
+                "containers": takeout.containers.select_related(
+                    "building_part"
+                ),
                 "has_building_parts": True,
             }
         )
@@ -237,6 +243,13 @@ class TankTakeoutRequestListView(generics.ListCreateAPIView):
         )
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """mass и fill_time считаются для всего списка сразу"""
+        takeouts = list(self.filter_queryset(self.get_queryset()))
+        TankTakeoutRequest.prefetch_stats(takeouts)
+        serializer = self.get_serializer(takeouts, many=True)
+        return Response(serializer.data)
+
     def perform_create(self, serializer):
         instance = serializer.save()
         instance.building.tank_takeout_notify()
@@ -0,0 +1,94 @@
+import copy
+import logging
+import time
+from typing import List, NamedTuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class BatchStats(NamedTuple):
+    messages: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        """Писем в секунду"""
+        return self.messages / self.seconds if self.seconds else 0
+
+
+def split_recipients(message: EmailMessage,
+                     max_recipients: int = None) -> List[EmailMessage]:
+    """Делит письмо с длинным списком получателей на несколько,
+    в каждом не больше max_recipients адресов в to
+    (копии и скрытые копии остаются в первом)"""
+    max_recipients = max_recipients or settings.EMAIL_MAX_RECIPIENTS
+    if len(message.to) <= max_recipients:
+        return [message]
+    parts = []
+    for start in range(0, len(message.to), max_recipients):
+        part = copy.copy(message)
+        part.to = message.to[start:start + max_recipients]
+        if start:
+            part.cc = []
+            part.bcc = []
+        parts.append(part)
+    return parts
+
+
+class EmailDispatcher:
+    """Копит письма и отправляет их пачками по batch_size через одно
+    соединение с почтовым бэкендом (get_connection/send_messages)
+    вместо отдельного соединения на каждое письмо. Оставшиеся
+    письма отправляются при выходе из with.
+
+    Время отправки каждой пачки пишется в лог и в batches"""
+
+    def __init__(self, batch_size: int = None, connection=None):
+        self.batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+        self.connection = connection or get_connection()
+        self.pending: List[EmailMessage] = []
+        self.batches: List[BatchStats] = []
+
+    def __enter__(self) -> "EmailDispatcher":
+        self.connection.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.connection.close()
+
+    def add(self, message: EmailMessage) -> None:
+        for part in split_recipients(message):
+            self.pending.append(part)
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> int:
+        """Отправляет накопленные письма, возвращает их кол-во"""
+        if not self.pending:
+            return 0
+        batch, self.pending = self.pending, []
+        start = time.perf_counter()
+        self.connection.send_messages(batch)
+        stats = BatchStats(len(batch), time.perf_counter() - start)
+        self.batches.append(stats)
+        logger.info("Отправлено писем: %d за %.2f с (%.1f писем/с)",
+                    stats.messages, stats.seconds, stats.rate)
+        return stats.messages
+
+    @property
+    def sent_count(self) -> int:
+        return sum(batch.messages for batch in self.batches)
+
+
+def send_email(message: EmailMessage) -> None:
+    """Отправка одного оповещения через EmailDispatcher
+    (длинный список получателей делится на несколько писем)"""
+    with EmailDispatcher() as dispatcher:
+        dispatcher.add(message)
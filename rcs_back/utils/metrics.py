@@ -0,0 +1,102 @@
+import math
+from typing import Dict, List, Sequence, Union
+
+from django_redis import get_redis_connection
+
+Number = Union[int, float]
+
+# Границы корзин гистограмм
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+INF = "+Inf"
+
+REQUEST_METRICS_PREFIX = "request-metrics"
+REQUEST_ENDPOINTS_KEY = f"{REQUEST_METRICS_PREFIX}:endpoints"
+
+
+def bucket(value: Number, buckets: Sequence[Number]) -> str:
+    """Верхняя граница корзины, в которую попадает value"""
+    for upper in buckets:
+        if value <= upper:
+            return str(upper)
+    return INF
+
+
+def percentile(histogram: Dict[str, int], buckets: Sequence[Number],
+               fraction: float) -> Union[float, None]:
+    """Оценка перцентиля по гистограмме {граница корзины: кол-во}:
+    верхняя граница корзины, в которой он находится"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    seen = 0
+    for upper in [str(b) for b in buckets] + [INF]:
+        seen += histogram.get(upper, 0)
+        if seen >= total * fraction:
+            return float(upper)
+    return math.inf
+
+
+def record_request(endpoint: str, time_ms: float, queries: int,
+                   sql_ms: float, size: int) -> None:
+    """Добавляет запрос к статистике эндпоинта в Redis
+    (одна отправка pipeline)"""
+    key = f"{REQUEST_METRICS_PREFIX}:{endpoint}"
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    pipe.sadd(REQUEST_ENDPOINTS_KEY, endpoint)
+    pipe.hincrby(key, "count", 1)
+    pipe.hincrbyfloat(key, "time_ms", time_ms)
+    pipe.hincrby(key, "queries", queries)
+    pipe.hincrbyfloat(key, "sql_ms", sql_ms)
+    pipe.hincrby(key, "bytes", size)
+    pipe.hincrby(key, f"latency:{bucket(time_ms, LATENCY_BUCKETS_MS)}", 1)
+    pipe.hincrby(key, f"queries:{bucket(queries, QUERY_BUCKETS)}", 1)
+    pipe.execute()
+
+
+def split_histograms(fields: Dict[str, str]) -> Dict[str, Dict[str, int]]:
+    """{"latency:50": "3", ...} -> {"latency": {"50": 3}, ...}"""
+    histograms: Dict[str, Dict[str, int]] = {}
+    for field, value in fields.items():
+        if ":" in field:
+            name, upper = field.split(":", 1)
+            histograms.setdefault(name, {})[upper] = int(value)
+    return histograms
+
+
+def request_stats() -> List[Dict]:
+    """Сводка по эндпоинтам: кол-во запросов, средние значения
+    и 95-й перцентиль времени ответа и кол-ва запросов к БД"""
+    redis = get_redis_connection("default")
+    endpoints = sorted(e.decode() for e in redis.smembers(REQUEST_ENDPOINTS_KEY))
+    pipe = redis.pipeline(transaction=False)
+    for endpoint in endpoints:
+        pipe.hgetall(f"{REQUEST_METRICS_PREFIX}:{endpoint}")
+
+    stats = []
+    for endpoint, raw in zip(endpoints, pipe.execute()):
+        fields = {k.decode(): v.decode() for k, v in raw.items()}
+        count = int(fields.get("count", 0))
+        if not count:
+            continue
+        histograms = split_histograms(fields)
+        stats.append({
+            "endpoint": endpoint,
+            "count": count,
+            "avg_ms": round(float(fields["time_ms"]) / count, 1),
+            "p95_ms": percentile(histograms.get("latency", {}),
+                                 LATENCY_BUCKETS_MS, 0.95),
+            "avg_queries": round(int(fields["queries"]) / count, 1),
+            "p95_queries": percentile(histograms.get("queries", {}),
+                                      QUERY_BUCKETS, 0.95),
+            "avg_sql_ms": round(float(fields["sql_ms"]) / count, 1),
+            "avg_bytes": int(fields["bytes"]) // count,
+        })
+    return stats
+
+
+def reset_request_stats() -> None:
+    redis = get_redis_connection("default")
+    endpoints = [e.decode() for e in redis.smembers(REQUEST_ENDPOINTS_KEY)]
+    redis.delete(REQUEST_ENDPOINTS_KEY,
+                 *[f"{REQUEST_METRICS_PREFIX}:{e}" for e in endpoints])
@@ -0,0 +1,70 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from redis.exceptions import RedisError
+
+from rcs_back.utils.metrics import record_request
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """execute_wrapper, который считает запросы к БД и их время"""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """Замеряет для каждого запроса время ответа, кол-во и время
+    запросов к БД и размер ответа (включается REQUEST_METRICS).
+    При DEBUG значения отдаются в заголовке Server-Timing,
+    иначе копятся в гистограммах в Redis по эндпоинтам
+    (метод и шаблон пути, а не сам путь)"""
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        time_ms = (time.perf_counter() - start) * 1000
+        sql_ms = counter.time * 1000
+
+        if settings.DEBUG:
+            response["Server-Timing"] = (
+                f'db;dur={sql_ms:.1f};desc="{counter.count} queries", '
+                f"total;dur={time_ms:.1f}"
+            )
+            return response
+
+        match = request.resolver_match
+        endpoint = f"{request.method} /{match.route if match else '<unresolved>'}"
+        if response.streaming:
+            size = int(response.get("Content-Length") or 0)
+        else:
+            size = len(response.content)
+        try:
+            record_request(endpoint, time_ms, counter.count, sql_ms, size)
+        except RedisError:
+            logger.warning("Не удалось записать метрики запроса", exc_info=True)
+        return response
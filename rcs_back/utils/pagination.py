@@ -0,0 +1,153 @@
+import base64
+import binascii
+import json
+from typing import Any, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Пагинация по ключу (keyset): следующая страница начинается
+    после (значение поля сортировки, id) последней записи, поэтому
+    глубокие страницы стоят столько же, сколько первая.
+    Сортировка берётся из order_by queryset'а (одно поле),
+    id добавляется для однозначного порядка.
+    Включается параметром page_size или cursor, без них
+    возвращается весь список, как раньше"""
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 50
+    max_page_size = 500
+    invalid_cursor_message = "Неверный курсор"
+
+    def __init__(self):
+        self.request = None
+        self.next_position = None
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request,
+                          view=None) -> Optional[List[Any]]:
+        if (self.cursor_query_param not in request.query_params and
+                self.page_size_query_param not in request.query_params):
+            return None
+        self.request = request
+        page_size = self.get_page_size(request)
+        field, desc = self.get_sort(queryset)
+
+        position = self.decode_cursor(request, queryset, field)
+        if position:
+            queryset = queryset.filter(
+                self.after_position(queryset, field, desc, *position)
+            )
+        if field:
+            sort = (F(field).desc(nulls_first=True) if desc
+                    else F(field).asc(nulls_last=True))
+            queryset = queryset.order_by(sort, "-pk" if desc else "pk")
+        else:
+            queryset = queryset.order_by("pk")
+
+        results = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            last = results[-1]
+            value = None
+            if field:
+                value = getattr(
+                    last, queryset.model._meta.get_field(field).attname
+                )
+            self.next_position = (value, last.pk)
+        return results
+
+    def get_page_size(self, request: Request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    @staticmethod
+    def get_sort(queryset: QuerySet) -> Tuple[Optional[str], bool]:
+        """Поле сортировки queryset'а и направление (убывание?)"""
+        if not queryset.query.order_by:
+            return None, False
+        sort = queryset.query.order_by[0]
+        if sort.startswith("-"):
+            return sort[1:], True
+        return sort, False
+
+    @staticmethod
+    def after_position(queryset: QuerySet, field: Optional[str], desc: bool,
+                       value: Any, pk: int) -> Q:
+        """Условие "после записи (value, pk)" для порядка
+        field ASC NULLS LAST, pk ASC (или обратного ему)"""
+        if not field:
+            return Q(pk__gt=pk)
+        nullable = queryset.model._meta.get_field(field).null
+        if desc:
+            if value is None:
+                return Q(**{f"{field}__isnull": True}, pk__lt=pk) | Q(
+                    **{f"{field}__isnull": False}
+                )
+            return Q(**{f"{field}__lt": value}) | Q(**{field: value},
+                                                    pk__lt=pk)
+        if value is None:
+            return Q(**{f"{field}__isnull": True}, pk__gt=pk)
+        after = Q(**{f"{field}__gt": value}) | Q(**{field: value}, pk__gt=pk)
+        if nullable:
+            after |= Q(**{f"{field}__isnull": True})
+        return after
+
+    def decode_cursor(self, request: Request, queryset: QuerySet,
+                      field: Optional[str]) -> Optional[Tuple[Any, int]]:
+        """Позиция из курсора. Значение приводится к типу поля
+        сортировки, чтобы подделанный курсор давал 404, а не ошибку
+        при построении запроса"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if field and value is not None:
+                value = queryset.model._meta.get_field(field).to_python(value)
+            return value, int(pk)
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position: Tuple[Any, int]) -> str:
+        return base64.urlsafe_b64encode(
+            json.dumps(position).encode()
+        ).decode()
+
+    def get_next_link(self) -> Optional[str]:
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {
+                    "type": "string",
+                    "nullable": True,
+                    "format": "uri",
+                },
+                "results": schema,
+            },
+        }
@@ -0,0 +1,10 @@
+from celery import Task
+from django.db import transaction
+
+
+def delay_on_commit(task: Task, *args, **kwargs) -> None:
+    """Ставит celery-задачу в очередь только после коммита
+    текущей транзакции (при ATOMIC_REQUESTS - после ответа на запрос),
+    чтобы воркер гарантированно видел сохранённые данные.
+    Вне транзакции задача ставится в очередь сразу"""
+    transaction.on_commit(lambda: task.delay(*args, **kwargs))